@@ -0,0 +1,66 @@
+""" Compare compiled AutoDecodable plans against the per-key setattr loop.
+
+Run from the repository root:
+
+    python benchmarks/bench_auto_decode.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from codable.formats.json import JSONCodec, JSONKeyedDecodingContainer
+from codable.serialization import AutoDecodable, KeyedDecodingContainer
+
+
+class Reading(AutoDecodable):
+    pass
+
+
+class LegacyReading(AutoDecodable):
+    """ Reading with the container + setattr loop AutoDecodable used before plans. """
+    @classmethod
+    def decode(cls, container: KeyedDecodingContainer):
+        instance = cls.__new__(cls)
+        for key, value in container.data.items():
+            if not key.startswith('_'):
+                setattr(instance, key, value)
+        return instance
+
+
+OBJECTS = 1000
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{label:<40} {seconds / number / OBJECTS * 1e9:10.1f} ns/object")
+    return seconds
+
+
+def record(cls_name, i):
+    return {"sensor": f"sensor-{i % 16}", "timestamp": 1700000000 + i, "value": i * 0.5,
+            "unit": "C", "ok": True, "__type__": cls_name}
+
+
+def main():
+    fast_docs = [json.dumps(record("Reading", i)) for i in range(OBJECTS)]
+    legacy_docs = [json.dumps(record("LegacyReading", i)) for i in range(OBJECTS)]
+
+    print("JSONCodec.decode end to end")
+    base = bench("  container + setattr loop", lambda: [JSONCodec.decode(d) for d in legacy_docs], 20)
+    fast = bench("  compiled plan", lambda: [JSONCodec.decode(d) for d in fast_docs], 20)
+    print(f"  speedup: {base / fast:.2f}x")
+
+    print("AutoDecodable.decode through a container")
+    records = [record("Reading", i) for i in range(OBJECTS)]
+    base = bench("  container + setattr loop",
+                 lambda: [LegacyReading.decode(JSONKeyedDecodingContainer(r)) for r in records], 20)
+    fast = bench("  compiled plan",
+                 lambda: [Reading.decode(JSONKeyedDecodingContainer(r)) for r in records], 20)
+    print(f"  speedup: {base / fast:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+""" Compare compiled AutoEncodable plans against the per-instance scan.
+
+Run from the repository root:
+
+    python benchmarks/bench_auto_encode.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from codable.formats.json import JSONCodec, JSONKeyedEncodingContainer
+from codable.serialization import AutoEncodable
+
+
+class Reading(AutoEncodable):
+    def __init__(self, i):
+        self.sensor = f"sensor-{i % 16}"
+        self.timestamp = 1700000000 + i
+        self.value = i * 0.5
+        self.unit = "C"
+        self.ok = True
+        self._raw = None
+
+
+class LegacyReading(Reading):
+    """ Reading with the per-instance ``__dict__`` scan AutoEncodable used before plans. """
+    def encode(self, container):
+        for k, v in self.__dict__.items():
+            if not k.startswith('_'):
+                container.encode(k, v)
+
+
+class NullContainer:
+    def encode(self, key, value):
+        pass
+
+
+OBJECTS = 1000
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{label:<40} {seconds / number / OBJECTS * 1e9:10.1f} ns/object")
+    return seconds
+
+
+def main():
+    objs = [Reading(i) for i in range(OBJECTS)]
+    legacy = [LegacyReading(i) for i in range(OBJECTS)]
+    null = NullContainer()
+
+    print("AutoEncodable.encode into a no-op container (isolates the encode step)")
+    base = bench("  per-instance __dict__ scan", lambda: [o.encode(null) for o in legacy], 200)
+    fast = bench("  compiled plan", lambda: [o.encode(null) for o in objs], 200)
+    print(f"  speedup: {base / fast:.2f}x")
+
+    print("JSONKeyedEncodingContainer")
+    base = bench("  per-instance __dict__ scan", lambda: [o.encode(JSONKeyedEncodingContainer()) for o in legacy], 20)
+    fast = bench("  compiled plan", lambda: [o.encode(JSONKeyedEncodingContainer()) for o in objs], 20)
+    print(f"  speedup: {base / fast:.2f}x")
+
+    print("JSONCodec.encode end to end")
+    base = bench("  per-instance __dict__ scan", lambda: [JSONCodec.encode(o) for o in legacy], 20)
+    fast = bench("  compiled plan", lambda: [JSONCodec.encode(o) for o in objs], 20)
+    print(f"  speedup: {base / fast:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
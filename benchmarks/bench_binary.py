@@ -0,0 +1,60 @@
+""" Compare BinaryCodec with JSONCodec on size and speed.
+
+Run from the repository root:
+
+    python benchmarks/bench_binary.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoCodable
+
+
+class Sample(AutoCodable):
+    def __init__(self, sensor, timestamp, value, tags):
+        self.sensor = sensor
+        self.timestamp = timestamp
+        self.value = value
+        self.tags = tags
+
+
+class Batch(AutoCodable):
+    def __init__(self, samples):
+        self.samples = samples
+
+
+OBJECTS = 1000
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{label:<40} {seconds / number * 1e3:10.2f} ms")
+    return seconds
+
+
+def main():
+    batch = Batch([Sample(f"sensor-{i % 16}", 1700000000 + i, i * 0.5, ["a", "b"]) for i in range(OBJECTS)])
+    binary = BinaryCodec.encode(batch)
+    text = JSONCodec.encode(batch)
+
+    print(f"Size of {OBJECTS} samples")
+    print(f"  {'JSONCodec':<38} {len(text.encode()):10d} bytes")
+    print(f"  {'BinaryCodec':<38} {len(binary):10d} bytes")
+    print(f"  ratio: {len(binary) / len(text.encode()):.2f}")
+
+    print("Encode")
+    bench("  JSONCodec.encode", lambda: JSONCodec.encode(batch), 20)
+    bench("  BinaryCodec.encode", lambda: BinaryCodec.encode(batch), 20)
+
+    print("Decode")
+    bench("  JSONCodec.decode", lambda: JSONCodec.decode(text), 20)
+    bench("  BinaryCodec.decode", lambda: BinaryCodec.decode(binary), 20)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+""" Compare row and columnar encoding of a long list of small objects.
+
+Run from the repository root:
+
+    python benchmarks/bench_columnar.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoCodable
+
+
+class Sample(AutoCodable):
+    def __init__(self, sensor, timestamp, value, ok):
+        self.sensor = sensor
+        self.timestamp = timestamp
+        self.value = value
+        self.ok = ok
+
+
+class Export(AutoCodable):
+    def __init__(self, samples):
+        self.samples = samples
+
+
+OBJECTS = 10000
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{label:<40} {seconds / number * 1e3:10.2f} ms")
+    return seconds
+
+
+def main():
+    export = Export([Sample(f"sensor-{i % 16}", 1700000000 + i, i * 0.5, True) for i in range(OBJECTS)])
+    rows = JSONCodec.encode(export)
+    columns = JSONCodec.encode(export, columnar=True)
+
+    print(f"Size of {OBJECTS} samples")
+    print(f"  {'rows':<38} {len(rows):10d} bytes")
+    print(f"  {'columns':<38} {len(columns):10d} bytes")
+    print(f"  ratio: {len(rows) / len(columns):.2f}x")
+
+    print("Encode")
+    base = bench("  rows", lambda: JSONCodec.encode(export), 5)
+    fast = bench("  columns", lambda: JSONCodec.encode(export, columnar=True), 5)
+    print(f"  speedup: {base / fast:.2f}x")
+
+    print("Decode")
+    base = bench("  rows", lambda: JSONCodec.decode(rows), 5)
+    fast = bench("  columns", lambda: JSONCodec.decode(columns), 5)
+    print(f"  speedup: {base / fast:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+""" Time and peak memory of JSONCodec.encode on a large document.
+
+The reference point is json.dumps on the same data already built as plain
+dicts and lists, i.e. the cost of the final serialisation step alone.
+JSONCodec.dump streams to a null file, so its peak should stay flat as the
+document grows.
+
+Run from the repository root:
+
+    python benchmarks/bench_json_encode.py
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoEncodable
+
+
+class Sample(AutoEncodable):
+    def __init__(self, i):
+        self.index = i
+        self.name = f"sample-{i}"
+        self.values = [i, i + 1, i + 2]
+        self.tags = {"even": i % 2 == 0}
+
+
+class Batch(AutoEncodable):
+    def __init__(self, count):
+        self.samples = [Sample(i) for i in range(count)]
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<36} {elapsed * 1e3:9.1f} ms  peak {peak / 2**20:8.1f} MiB")
+
+
+def main(count=50000):
+    batch = Batch(count)
+    plain = JSONCodec.encode_object(batch)
+    measure("json.dumps of prebuilt dicts", lambda: json.dumps(plain))
+    del plain
+    measure("JSONCodec.encode_object", lambda: JSONCodec.encode_object(batch))
+    measure("JSONCodec.encode", lambda: JSONCodec.encode(batch))
+    with open(os.devnull, 'w') as devnull:
+        measure("JSONCodec.dump", lambda: JSONCodec.dump(batch, devnull))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+""" Compare decoding a large archive whole with reading one record lazily.
+
+Run from the repository root:
+
+    python benchmarks/bench_lazy.py [records]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoCodable
+
+
+class Record(AutoCodable):
+    def __init__(self, id, name, values):
+        self.id = id
+        self.name = name
+        self.values = values
+
+
+class Archive(AutoCodable):
+    def __init__(self, title, records):
+        self.title = title
+        self.records = records
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1e3:10.2f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    archive = Archive("archive", [Record(i, f"record-{i}", [i * 0.5] * 8) for i in range(count)])
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'archive.json')
+        with open(path, 'w') as fp:
+            JSONCodec.dump(archive, fp)
+        print(f"{count} records, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        with open(path) as fp:
+            timed("  decode whole, read record 10", lambda: JSONCodec.decode(fp.read()).records[10].name)
+        timed("  lazy open, read record 10", lambda: JSONCodec.decode_lazy(path).records[10].name)
+        lazy = JSONCodec.decode_lazy(path)
+        timed("  lazy, read last record", lambda: lazy.records[-1].name)
+        timed("  lazy, read it again", lambda: lazy.records[-1].name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+""" Compare encoding a numpy array as a typed buffer with encoding it as a list.
+
+Requires numpy. Run from the repository root:
+
+    python benchmarks/bench_numpy.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoCodable
+
+
+class Signal(AutoCodable):
+    def __init__(self, name, samples):
+        self.name = name
+        self.samples = samples
+
+
+SAMPLES = 100000
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    print(f"{label:<40} {seconds / number * 1e3:10.2f} ms")
+    return seconds
+
+
+def main():
+    array = np.random.default_rng(0).standard_normal(SAMPLES)
+    typed = Signal("typed", array)
+    listed = Signal("listed", array.tolist())
+
+    for codec in (JSONCodec, BinaryCodec):
+        name = codec.__name__
+        typed_data = codec.encode(typed)
+        listed_data = codec.encode(listed)
+        print(f"{name}, {SAMPLES} float64 samples")
+        print(f"  {'list size':<38} {len(listed_data):10d} bytes")
+        print(f"  {'array size':<38} {len(typed_data):10d} bytes")
+
+        base = bench("  encode list", lambda: codec.encode(Signal("listed", array.tolist())), 5)
+        fast = bench("  encode array", lambda: codec.encode(typed), 5)
+        print(f"  speedup: {base / fast:.2f}x")
+
+        base = bench("  decode list", lambda: np.array(codec.decode(listed_data).samples), 5)
+        fast = bench("  decode array", lambda: codec.decode(typed_data).samples, 5)
+        print(f"  speedup: {base / fast:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
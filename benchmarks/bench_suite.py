@@ -0,0 +1,290 @@
+""" Benchmark suite: codecs, class styles and document shapes.
+
+Measures encode and decode with JSONCodec and JSONFooCodec for classes
+written by hand (Codable), with AutoCodable and with the auto_codable
+decorator, over documents that vary in nesting depth, list width and object
+count. For every case it records throughput, latency percentiles and the
+peak memory tracemalloc sees during one call, and writes the results as
+JSON. ``compare`` reads two result files and flags regressions.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py run [-o results.json] [--quick] [-k FILTER]
+    python benchmarks/bench_suite.py compare base.json new.json [--threshold 0.10]
+
+``compare`` exits with status 1 when a case got slower by more than the
+threshold (median latency) or uses more memory by more than the memory
+threshold. Cases that fail, such as a codec that cannot decode a style,
+are recorded with their error and left out of the comparison.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from codable.decorators import auto_codable
+from codable.formats.json import JSONCodec
+from codable.formats.sample_json import JSONFooCodec
+from codable.serialization import AutoCodable, Codable
+
+
+# Three ways of writing the same two classes: a record holding a list of
+# floats and an optional nested record, and a batch holding records.
+
+class HandRecord(Codable):
+    def __init__(self, name, values, child=None):
+        self.name = name
+        self.values = values
+        self.child = child
+
+    def encode(self, container):
+        container.encode("name", self.name)
+        container.encode("values", self.values)
+        container.encode("child", self.child)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode("name"), container.decode("values"), container.decode("child"))
+
+
+class HandBatch(Codable):
+    def __init__(self, records):
+        self.records = records
+
+    def encode(self, container):
+        container.encode("records", self.records)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode("records"))
+
+
+class AutoRecord(AutoCodable):
+    def __init__(self, name, values, child=None):
+        self.name = name
+        self.values = values
+        self.child = child
+
+
+class AutoBatch(AutoCodable):
+    def __init__(self, records):
+        self.records = records
+
+
+@auto_codable
+class DecoratedRecord:
+    def __init__(self, name, values, child=None):
+        self.name = name
+        self.values = values
+        self.child = child
+
+
+@auto_codable
+class DecoratedBatch:
+    def __init__(self, records):
+        self.records = records
+
+
+STYLES = {
+    'hand': (HandRecord, HandBatch),
+    'auto': (AutoRecord, AutoBatch),
+    'decorated': (DecoratedRecord, DecoratedBatch),
+}
+
+CODECS = {
+    'json': JSONCodec,
+    'foo': JSONFooCodec,
+}
+
+# Each axis is varied with the others at the base value.
+BASE_SHAPE = {'depth': 1, 'width': 8, 'count': 100}
+AXES = {
+    'depth': [1, 8, 32],
+    'width': [8, 128, 1024],
+    'count': [1, 100, 1000],
+}
+
+
+def shapes():
+    seen = []
+    for axis, values in AXES.items():
+        for value in values:
+            shape = dict(BASE_SHAPE, **{axis: value})
+            if shape not in seen:
+                seen.append(shape)
+    return seen
+
+
+def build(style, depth, width, count):
+    """ A batch of ``count`` records, each a chain of ``depth`` records with
+    ``width`` floats apiece. """
+    record_cls, batch_cls = STYLES[style]
+
+    def record(i):
+        node = None
+        for level in range(depth):
+            node = record_cls(f"r{i}.{level}", [i + j * 0.25 for j in range(width)], node)
+        return node
+
+    return batch_cls([record(i) for i in range(count)])
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, budget, min_calls=5, max_calls=10000):
+    """ Call ``fn`` until ``budget`` seconds are spent (within the call
+    bounds) and return the latencies in seconds, after one warm-up call. """
+    fn()
+    latencies = []
+    clock = time.perf_counter
+    deadline = clock() + budget
+    while len(latencies) < max_calls and (len(latencies) < min_calls or clock() < deadline):
+        start = clock()
+        fn()
+        latencies.append(clock() - start)
+    return latencies
+
+
+def peak_memory(fn):
+    # Bytes allocated at the peak of one call, above what was live before.
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(codec_name, op, style, shape, budget):
+    codec = CODECS[codec_name]
+    name = f"{codec_name}/{op}/{style}/" + ",".join(f"{k}={v}" for k, v in shape.items())
+    result = {'name': name, 'codec': codec_name, 'op': op, 'style': style, 'shape': shape, 'error': None}
+    try:
+        obj = build(style, **shape)
+        text = JSONCodec.encode(obj)
+        fn = (lambda: codec.encode(obj)) if op == 'encode' else (lambda: codec.decode(text))
+        latencies = sorted(measure(fn, budget))
+        memory = peak_memory(fn)
+    except Exception as e:
+        result['error'] = f"{e.__class__.__name__}: {e}"
+        return result
+    mean = sum(latencies) / len(latencies)
+    result.update({
+        'calls': len(latencies),
+        'bytes': len(text),
+        'ops_per_s': 1 / mean,
+        'mb_per_s': len(text) / mean / 1e6,
+        'latency_us': {
+            'mean': mean * 1e6,
+            'min': latencies[0] * 1e6,
+            'p50': percentile(latencies, 0.50) * 1e6,
+            'p90': percentile(latencies, 0.90) * 1e6,
+            'p99': percentile(latencies, 0.99) * 1e6,
+        },
+        'peak_bytes': memory,
+    })
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    budget = 0.05 if args.quick else args.budget
+    results = []
+    for shape in shapes():
+        for style in STYLES:
+            for codec_name in CODECS:
+                for op in ('encode', 'decode'):
+                    name = f"{codec_name}/{op}/{style}/" + ",".join(f"{k}={v}" for k, v in shape.items())
+                    if args.filter and args.filter not in name:
+                        continue
+                    result = run_case(codec_name, op, style, shape, budget)
+                    results.append(result)
+                    if result['error']:
+                        print(f"{name:<52} {'error: ' + result['error'][:60]}")
+                    else:
+                        latency = result['latency_us']
+                        print(f"{name:<52} p50 {latency['p50']:10.1f} us  p99 {latency['p99']:10.1f} us  "
+                              f"{result['mb_per_s']:7.1f} MB/s  peak {result['peak_bytes'] / 1024:9.1f} KiB")
+    document = {
+        'meta': {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'budget_s': budget,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(document, fp, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+
+def compare(args):
+    with open(args.base) as fp:
+        base = {r['name']: r for r in json.load(fp)['results'] if not r['error']}
+    with open(args.new) as fp:
+        new = {r['name']: r for r in json.load(fp)['results'] if not r['error']}
+    regressions = 0
+    for name in sorted(base.keys() & new.keys()):
+        before, after = base[name], new[name]
+        time_ratio = after['latency_us']['p50'] / before['latency_us']['p50']
+        memory_ratio = after['peak_bytes'] / max(before['peak_bytes'], 1)
+        flags = []
+        if time_ratio > 1 + args.threshold:
+            flags.append('SLOWER')
+        if memory_ratio > 1 + args.memory_threshold:
+            flags.append('MORE MEMORY')
+        regressions += bool(flags)
+        print(f"{name:<52} time {time_ratio:6.2f}x  memory {memory_ratio:6.2f}x  {' '.join(flags)}")
+    for name in sorted(base.keys() - new.keys()):
+        print(f"{name:<52} missing from {args.new}")
+    print(f"{regressions} regression(s) in {len(base.keys() & new.keys())} common cases")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the suite")
+    run_parser.add_argument('-o', '--output', help="write the results as JSON to this file")
+    run_parser.add_argument('-k', '--filter', help="only run cases whose name contains this")
+    run_parser.add_argument('--budget', type=float, default=0.25, help="seconds spent timing each case")
+    run_parser.add_argument('--quick', action='store_true', help="time each case for 0.05 s")
+    compare_parser = commands.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help="flag cases whose median latency grew by more than this fraction")
+    compare_parser.add_argument('--memory-threshold', type=float, default=0.10,
+                                help="flag cases whose peak memory grew by more than this fraction")
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+""" Columnar form for lists of objects of one class.
+
+With ``columnar=True`` an encoder writes a list whose items are all
+instances of the same class, with the same fields, as one object::
+
+    {"__columnar__": "Sample", "__keys__": ["t", "value"],
+     "__values__": [[1, 2, 3], [0.5, 0.7, 0.9]]}
+
+``__columnar__`` holds the type tag the items would have had (None when
+encoding without tags), and ``__values__`` one column per key. A column may
+itself be in columnar form. Decoders turn it back into a list, building
+instances of classes with the stock AutoDecodable.decode column by column
+through a compiled plan.
+"""
+from keyword import iskeyword
+
+from codable.plans import MAX_PLANS, NESTED_TYPES, _compile, public_fields
+
+COLUMNAR_KEY = '__columnar__'
+KEYS_KEY = '__keys__'
+VALUES_KEY = '__values__'
+
+# Shorter lists are not worth a header.
+COLUMNAR_MIN_ITEMS = 4
+
+_plans = {}
+
+
+def columnar_parts(value, keypath):
+    """ Return ``(tag, keys, columns)`` of a columnar dict after checking its shape. """
+    from codable.serialization import DecodingError
+    tag = value.get(COLUMNAR_KEY)
+    keys = value.get(KEYS_KEY)
+    columns = value.get(VALUES_KEY)
+    if (keys.__class__ is not list or columns.__class__ is not list or not keys
+            or len(keys) != len(columns) or len(set(map(_column_length, columns)) | {-1}) != 2):
+        raise DecodingError("Malformed columnar list", keypath)
+    return tag, keys, columns
+
+
+def _column_length(column):
+    if column.__class__ is list:
+        return len(column)
+    if column.__class__ is dict and COLUMNAR_KEY in column:
+        values = column.get(VALUES_KEY)
+        return len(values[0]) if values.__class__ is list and values and values[0].__class__ is list else -1
+    return -1
+
+
+def expand_columnar(value, keypath=None):
+    """ Turn a columnar dict back into the list of tagged dicts it stands for,
+    without decoding anything. """
+    tag, keys, columns = columnar_parts(value, keypath)
+    columns = [expand_columnar(c, keypath) if c.__class__ is dict else c for c in columns]
+    rows = [dict(zip(keys, row)) for row in zip(*columns)]
+    if tag is not None:
+        for row in rows:
+            row['__type__'] = tag
+    return rows
+
+
+def compile_columnar_plan(cls, keys):
+    """ Generate a decoder building a list of ``cls`` from columns in ``keys`` order.
+
+    It is called as ``decode(columns, decode_value, keypath)``, like the
+    decode plans. Columns that are themselves columnar are decoded whole
+    first; values of other columns are decoded one by one when they are
+    dicts or lists.
+    """
+    from codable.serialization import KeyPath
+    fields = public_fields(keys)
+    indices = [keys.index(field) for field in fields]
+    lines = ['def decode(columns, decode_value, keypath):', '    new = cls.__new__', '    out = []']
+    for i, (field, index) in enumerate(zip(fields, indices)):
+        lines += [
+            f'    c{i} = columns[{index}]',
+            f'    raw{i} = c{i}.__class__ is not dict',
+            f'    if not raw{i}:',
+            f'        c{i} = decode_value(c{i}, KeyPath(keypath, {field!r}))',
+        ]
+    if fields:
+        names = ', '.join(f'v{i}' for i in range(len(fields)))
+        columns = ', '.join(f'c{i}' for i in range(len(fields)))
+        lines.append(f'    for i, ({names},) in enumerate(zip({columns})):')
+    else:
+        lines.append('    for i in range(column_length(columns[0])):')
+    lines.append('        obj = new(cls)')
+    for i, field in enumerate(fields):
+        lines += [
+            f'        if raw{i} and v{i}.__class__ in NESTED_TYPES:',
+            f'            v{i} = decode_value(v{i}, KeyPath(KeyPath(keypath, i), {field!r}))',
+        ]
+        if field.isidentifier() and not iskeyword(field):
+            lines.append(f'        obj.{field} = v{i}')
+        else:
+            lines.append(f'        setattr(obj, {field!r}, v{i})')
+    lines += ['        out.append(obj)', '    return out']
+    return _compile('decode', lines, {'cls': cls, 'KeyPath': KeyPath, 'NESTED_TYPES': NESTED_TYPES,
+                                      'column_length': _column_length})
+
+
+def columnar_plan(cls, keys):
+    """ Return the cached columnar decoder for ``cls`` and ``keys``, or None
+    once MAX_PLANS have been compiled. """
+    key = (cls, tuple(keys))
+    plan = _plans.get(key)
+    if plan is None:
+        if len(_plans) >= MAX_PLANS:
+            return None
+        plan = _plans[key] = compile_columnar_plan(cls, key[1])
+    return plan
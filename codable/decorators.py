@@ -1,43 +1,41 @@
+import types
+
 from codable.serialization import Codable, Encodable, Decodable, AutoEncodable, AutoDecodable, AutoCodable
 
-def encodable(cls):
-    class NewClass(cls, Encodable):
-        pass
-    NewClass.__name__ = cls.__name__
-    NewClass.__module__ = cls.__module__
-    return NewClass
-
-def decodable(cls):
-    class NewClass(cls, Decodable):
-        pass
-    NewClass.__name__ = cls.__name__
-    NewClass.__module__ = cls.__module__
-    return NewClass
-
-def codable(cls):
-    class NewClass(cls, Codable):
-        pass
-    NewClass.__name__ = cls.__name__
-    NewClass.__module__ = cls.__module__
-    return NewClass
-
-def auto_encodable(cls):
-    class NewClass(cls, AutoEncodable):
-        pass
-    NewClass.__name__ = cls.__name__
-    NewClass.__module__ = cls.__module__
-    return NewClass
-
-def auto_decodable(cls):
-    class NewClass(cls, AutoDecodable):
-        pass
-    NewClass.__name__ = cls.__name__
-    NewClass.__module__ = cls.__module__
-    return NewClass
-
-def auto_codable(cls):
-    class NewClass(cls, AutoCodable):
-        pass
-    NewClass.__name__ = cls.__name__
-    NewClass.__module__ = cls.__module__
-    return NewClass
\ No newline at end of file
+
+def _derive(cls, base, frozen=False):
+    # Create the subclass under the decorated class's own name, so it
+    # registers (and pickles) as that class rather than as a local helper.
+    # Empty slots keep slotted classes free of a per-instance __dict__.
+    # Called without a class, as in ``@auto_codable(frozen=True)``, it
+    # returns the decorator.
+    if cls is None:
+        return lambda cls: _derive(cls, base, frozen)
+
+    def body(namespace):
+        namespace['__module__'] = cls.__module__
+        namespace['__qualname__'] = cls.__qualname__
+        namespace['__slots__'] = ()
+        if frozen:
+            namespace['__frozen__'] = True
+        if cls.__doc__ is not None:
+            namespace['__doc__'] = cls.__doc__
+    return types.new_class(cls.__name__, (cls, base), exec_body=body)
+
+def encodable(cls=None, *, frozen=False):
+    return _derive(cls, Encodable, frozen)
+
+def decodable(cls=None, *, frozen=False):
+    return _derive(cls, Decodable, frozen)
+
+def codable(cls=None, *, frozen=False):
+    return _derive(cls, Codable, frozen)
+
+def auto_encodable(cls=None, *, frozen=False):
+    return _derive(cls, AutoEncodable, frozen)
+
+def auto_decodable(cls=None, *, frozen=False):
+    return _derive(cls, AutoDecodable, frozen)
+
+def auto_codable(cls=None, *, frozen=False):
+    return _derive(cls, AutoCodable, frozen)
@@ -0,0 +1,126 @@
+""" asyncio front end for JSONCodec.
+
+AsyncJSONCodec writes documents to an ``asyncio.StreamWriter`` and reads
+them from an ``asyncio.StreamReader``. Data moves in chunks of about
+``chunk_size`` bytes. After each chunk the writer awaits ``drain()``, which
+waits while the transport's buffer is above its high-water mark, and both
+directions yield to the event loop, so other tasks run between chunks.
+
+Encoding and decoding are CPU work and block the loop while a chunk is
+processed. Once more than ``offload_threshold`` bytes of one document (or,
+for ``iterdecode``, of one array element) have been handled, the rest of
+the work runs in ``executor``, the loop's default executor when None. Pass
+``offload_threshold=None`` to keep everything on the loop. Encoding hands a
+generator to the executor, so it must be a thread pool.
+"""
+import asyncio
+import codecs
+
+from codable.formats.json import JSONCodec, _JSONArrayStreamParser, _decode_element
+from codable.serialization import Decodable, Encodable
+
+CHUNK_SIZE = 65536
+OFFLOAD_THRESHOLD = 1 << 20
+
+
+def _chunks(parts, chunk_size):
+    # Join the pieces of iterencode into byte chunks of chunk_size, splitting
+    # pieces that are longer; the text is ASCII, so any cut is safe.
+    buffer = []
+    size = 0
+    for part in parts:
+        start = 0
+        while len(part) - start >= chunk_size - size:
+            end = start + chunk_size - size
+            buffer.append(part[start:end])
+            yield ''.join(buffer).encode('ascii')
+            buffer.clear()
+            size = 0
+            start = end
+        if start < len(part):
+            buffer.append(part[start:] if start else part)
+            size += len(part) - start
+    if buffer:
+        yield ''.join(buffer).encode('ascii')
+
+
+def _feed(parser, text, final, index, schema):
+    # Parse what ``text`` completes and decode it; returns the new objects.
+    elements = parser.feed(text)
+    if final:
+        elements += parser.close()
+    return [_decode_element(element, parser, index + i, schema) for i, element in enumerate(elements)]
+
+
+class AsyncJSONCodec:
+    @staticmethod
+    async def encode(obj: Encodable, writer: asyncio.StreamWriter, type_tags: str = 'name',
+                     columnar: bool = False, references: bool = False, chunk_size: int = CHUNK_SIZE,
+                     offload_threshold: int = OFFLOAD_THRESHOLD, executor=None):
+        """ Write ``obj`` to ``writer``; the options are as for JSONCodec.encode.
+        Does not close the writer. """
+        loop = asyncio.get_running_loop()
+        chunks = _chunks(JSONCodec.iterencode(obj, type_tags, columnar, references), chunk_size)
+        written = 0
+        while True:
+            if offload_threshold is not None and written >= offload_threshold:
+                chunk = await loop.run_in_executor(executor, next, chunks, None)
+            else:
+                chunk = next(chunks, None)
+                await asyncio.sleep(0)
+            if chunk is None:
+                return
+            writer.write(chunk)
+            written += len(chunk)
+            await writer.drain()
+
+    @staticmethod
+    async def decode(reader: asyncio.StreamReader, schema=None, chunk_size: int = CHUNK_SIZE,
+                     offload_threshold: int = OFFLOAD_THRESHOLD, executor=None) -> Decodable:
+        """ Read ``reader`` to the end and decode the document; ``schema`` is
+        as for JSONCodec.decode. """
+        decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        pieces = []
+        size = 0
+        while True:
+            data = await reader.read(chunk_size)
+            if not data:
+                break
+            pieces.append(decoder.decode(data))
+            size += len(data)
+            await asyncio.sleep(0)
+        pieces.append(decoder.decode(b'', final=True))
+        text = ''.join(pieces)
+        if offload_threshold is not None and size > offload_threshold:
+            return await asyncio.get_running_loop().run_in_executor(executor, JSONCodec.decode, text, schema)
+        return JSONCodec.decode(text, schema)
+
+    @staticmethod
+    async def iterdecode(reader: asyncio.StreamReader, schema=None, chunk_size: int = CHUNK_SIZE,
+                         offload_threshold: int = OFFLOAD_THRESHOLD, executor=None):
+        """ Decode the elements of a top-level JSON array as they arrive, like
+        JSONCodec.iterdecode. Elements that took more than
+        ``offload_threshold`` bytes are parsed and decoded in ``executor``. """
+        loop = asyncio.get_running_loop()
+        parser = _JSONArrayStreamParser()
+        decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        index = 0
+        # Bytes read since the last element was completed.
+        pending = 0
+        while True:
+            data = await reader.read(chunk_size)
+            final = not data
+            text = decoder.decode(data, final=final)
+            pending += len(data)
+            if offload_threshold is not None and pending > offload_threshold:
+                objs = await loop.run_in_executor(executor, _feed, parser, text, final, index, schema)
+            else:
+                objs = _feed(parser, text, final, index, schema)
+            if objs:
+                pending = 0
+            for obj in objs:
+                yield obj
+            index += len(objs)
+            if final:
+                return
+            await asyncio.sleep(0)
@@ -0,0 +1,546 @@
+""" Compact binary format, in the spirit of MessagePack/CBOR.
+
+Layout of an encoded document::
+
+    magic      b'CDB\x01'
+    symbols    varint count, then each symbol as varint length + UTF-8
+    value      the encoded top-level object
+
+Every value starts with a one-byte tag. Numbers are stored as native
+little-endian binary, strings and bytes are length-prefixed, and lists are
+terminated by an END tag. Type names and object/dict keys are written once
+in the symbol table and referred to by index: inside an object or dict each
+field starts with ``varint(index + 1)`` and a zero varint ends it. Objects
+encoded with numeric type IDs store the ID in place of the symbol.
+
+This codec is about size, not speed. Documents are typically a third the
+size of their JSON text, and ``bytes`` values, such as the buffers of numpy
+arrays, are carried raw rather than as base64. The format is read and
+written by Python code, though, while JSONCodec has the json module's C
+parser and writer. Expect encoding to be somewhat slower than JSONCodec
+and decoding about as fast or slower; use JSONCodec when speed matters.
+
+Encoding goes through BinaryKeyedEncodingContainer and
+BinaryUnkeyedEncodingContainer, which write straight into one shared buffer.
+Decoding reads the bytes in one loop and builds objects as soon as their
+fields are read, the way ``iterative`` JSON decoding does, with the same
+results as JSONCodec, so every document JSONCodec round-trips also
+round-trips here. Documents with shared references, schema decoding and
+profiling go through plain dicts and lists and JSONCodec.decode_object.
+"""
+import struct
+from functools import partial
+
+from codable import profiling
+from codable.columnar import COLUMNAR_KEY, expand_columnar
+from codable.formats.iterative import _build_columnar, _builders
+from codable.formats.json import JSONCodec, _columnar, _stream_scalar
+from codable.literal import LITERAL_KEY, needs_literal
+from codable.references import ID_KEY, REF_KEY, resolve_reference, track_object
+from codable.serialization import (
+    CodingError,
+    DEFAULT_ENCODE_CONTEXT,
+    Decodable,
+    DecodingError,
+    DispatchTable,
+    EncodeContext,
+    Encodable,
+    EncodingError,
+    KeyedEncodingContainer,
+    KeyPath,
+    RegistryEntry,
+    UnkeyedEncodingContainer,
+    encode_kind,
+    keypath_list,
+    keypath_node,
+)
+
+MAGIC = b'CDB\x01'
+
+NULL = 0x00
+FALSE = 0x01
+TRUE = 0x02
+INT8 = 0x03
+INT16 = 0x04
+INT32 = 0x05
+INT64 = 0x06
+BIGINT = 0x07
+FLOAT64 = 0x08
+STR = 0x09
+BYTES = 0x0A
+LIST = 0x0B
+DICT = 0x0C
+OBJECT = 0x0D
+OBJECT_ID = 0x0E
+END = 0x0F
+
+_int16 = struct.Struct('<h')
+_int32 = struct.Struct('<i')
+_int64 = struct.Struct('<q')
+_float64 = struct.Struct('<d')
+
+
+def _write_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class _BinaryWriter:
+    # Output buffer, symbol table and options shared by every container of
+    # one encode.
+    __slots__ = ('out', 'symbols', 'keys', 'context')
+
+    def __init__(self, context=DEFAULT_ENCODE_CONTEXT):
+        self.out = bytearray()
+        self.symbols = {}
+        # The bytes starting a field, for each str key seen so far.
+        self.keys = {}
+        self.context = context
+
+    def symbol(self, name):
+        index = self.symbols.get(name)
+        if index is None:
+            index = self.symbols[name] = len(self.symbols)
+        return index
+
+    def key(self, key, keypath):
+        prefix = bytearray()
+        _write_varint(prefix, self.symbol(_key_string(key, keypath)) + 1)
+        prefix = bytes(prefix)
+        if key.__class__ is str:
+            self.keys[key] = prefix
+        return prefix
+
+    def getvalue(self):
+        header = bytearray(MAGIC)
+        _write_varint(header, len(self.symbols))
+        for name in self.symbols:
+            encoded = name.encode('utf-8')
+            _write_varint(header, len(encoded))
+            header += encoded
+        return bytes(header + self.out)
+
+
+class _BinaryContainer:
+    __slots__ = ()
+
+    @property
+    def keypath(self):
+        return keypath_list(self._keypath)
+
+
+class BinaryKeyedEncodingContainer(_BinaryContainer, KeyedEncodingContainer):
+    """ Writes ``key, value`` fields of one object or dict into the shared buffer. """
+    __slots__ = ('_writer', '_keypath')
+
+    def __init__(self, writer, keypath=None):
+        self._writer = writer
+        self._keypath = keypath_node(keypath)
+
+    def encode(self, key, value):
+        writer = self._writer
+        # Non-str keys are not cached: 1, 1.0 and True are equal dict keys.
+        prefix = writer.keys.get(key) if key.__class__ is str else None
+        writer.out += prefix or writer.key(key, self._keypath)
+        _writers[value.__class__](writer, value, self._keypath, key)
+
+
+class BinaryUnkeyedEncodingContainer(_BinaryContainer, UnkeyedEncodingContainer):
+    """ Writes the elements of one list into the shared buffer. """
+    __slots__ = ('_writer', '_keypath', '_count')
+
+    def __init__(self, writer, keypath=None):
+        self._writer = writer
+        self._keypath = keypath_node(keypath)
+        self._count = 0
+
+    def encode(self, value):
+        _writers[value.__class__](self._writer, value, self._keypath, self._count)
+        self._count += 1
+
+
+def _key_string(key, keypath):
+    # Same key conversions as json.dumps, so both codecs decode to equal dicts.
+    if key.__class__ is str:
+        return key
+    if isinstance(key, (int, float, bool)) or key is None:
+        return _stream_scalar(key, keypath)
+    if isinstance(key, str):
+        return str(key)
+    raise EncodingError(f"Keys must be str, int, float, bool or None, not {key.__class__.__name__}", keypath)
+
+
+def _write_null(writer, value, keypath, key):
+    writer.out.append(NULL)
+
+
+def _write_bool(writer, value, keypath, key):
+    writer.out.append(TRUE if value else FALSE)
+
+
+def _write_int(writer, value, keypath, key):
+    out = writer.out
+    if -0x80 <= value < 0x80:
+        out.append(INT8)
+        out.append(value & 0xFF)
+    elif -0x8000 <= value < 0x8000:
+        out.append(INT16)
+        out += _int16.pack(value)
+    elif -0x80000000 <= value < 0x80000000:
+        out.append(INT32)
+        out += _int32.pack(value)
+    elif -0x8000000000000000 <= value < 0x8000000000000000:
+        out.append(INT64)
+        out += _int64.pack(value)
+    else:
+        encoded = int(value).to_bytes(value.bit_length() // 8 + 1, 'little', signed=True)
+        out.append(BIGINT)
+        _write_varint(out, len(encoded))
+        out += encoded
+
+
+def _write_float(writer, value, keypath, key):
+    out = writer.out
+    out.append(FLOAT64)
+    out += _float64.pack(value)
+
+
+def _write_str(writer, value, keypath, key):
+    out = writer.out
+    encoded = value.encode('utf-8', 'surrogatepass')
+    out.append(STR)
+    if len(encoded) < 0x80:
+        out.append(len(encoded))
+    else:
+        _write_varint(out, len(encoded))
+    out += encoded
+
+
+def _write_bytes(writer, value, keypath, key):
+    out = writer.out
+    data = memoryview(value).cast('B')
+    out.append(BYTES)
+    _write_varint(out, data.nbytes)
+    out += data
+
+
+def _write_object(writer, obj, keypath, entry=None):
+    # ``entry`` is the registry entry of a type encoded by a registered
+    # function rather than its own ``encode``.
+    out = writer.out
+    references = writer.context.references
+    if references is not None:
+        ref_id, seen = track_object(references, obj)
+        if seen:
+            out.append(DICT)
+            BinaryKeyedEncodingContainer(writer, keypath).encode(REF_KEY, ref_id)
+            out.append(0)
+            return
+    tag = writer.context.tags[obj.__class__ if entry is None else entry.cls]
+    if tag.__class__ is int:
+        out.append(OBJECT_ID)
+        _write_varint(out, tag)
+    elif tag is None:
+        out.append(DICT)
+    else:
+        out.append(OBJECT)
+        _write_varint(out, writer.symbol(tag))
+    container = BinaryKeyedEncodingContainer(writer, keypath)
+    if references is not None:
+        container.encode(ID_KEY, ref_id)
+    try:
+        if entry is None:
+            obj.encode(container)
+        else:
+            entry.encoder(obj, container)
+    except CodingError:
+        raise
+    except Exception as e:
+        raise EncodingError(f"Failed to encode {obj.__class__.__name__}: {e!r}", keypath) from e
+    out.append(0)
+
+
+def _write_encodable(writer, value, keypath, key):
+    _write_object(writer, value, KeyPath(keypath, key))
+
+
+def _write_foreign(entry, writer, value, keypath, key):
+    _write_object(writer, value, KeyPath(keypath, key), entry)
+
+
+def _write_dict(writer, value, keypath, key):
+    if not needs_literal(value):
+        _write_items(writer, value, keypath, key)
+        return
+    out = writer.out
+    out.append(DICT)
+    out += writer.keys.get(LITERAL_KEY) or writer.key(LITERAL_KEY, keypath)
+    _write_items(writer, value, keypath, key)
+    out.append(0)
+
+
+def _write_items(writer, value, keypath, key):
+    writer.out.append(DICT)
+    container = BinaryKeyedEncodingContainer(writer, KeyPath(keypath, key))
+    for k, v in value.items():
+        container.encode(k, v)
+    writer.out.append(0)
+
+
+def _write_list(writer, value, keypath, key):
+    if writer.context.columnar:
+        columnar = _columnar(value, KeyPath(keypath, key), writer.context)
+        if columnar is not None:
+            _write_items(writer, columnar, keypath, key)
+            return
+    writer.out.append(LIST)
+    container = BinaryUnkeyedEncodingContainer(writer, KeyPath(keypath, key))
+    for v in value:
+        container.encode(v)
+    writer.out.append(END)
+
+
+def _write_unsupported(writer, value, keypath, key):
+    raise EncodingError(f"Object of type {value.__class__.__name__} is not serializable", KeyPath(keypath, key))
+
+
+def _resolve_writer(cls):
+    if issubclass(cls, (bytes, bytearray, memoryview)):
+        return _write_bytes
+    kind = encode_kind(cls)
+    if kind.__class__ is RegistryEntry:
+        return partial(_write_foreign, kind)
+    if kind == 'scalar':
+        if cls is bool:
+            return _write_bool
+        if cls is type(None):
+            return _write_null
+        if issubclass(cls, str):
+            return _write_str
+        if issubclass(cls, int):
+            return _write_int
+        return _write_float
+    return {
+        'object': _write_encodable,
+        'dict': _write_dict,
+        'list': _write_list,
+        None: _write_unsupported,
+    }[kind]
+
+
+_writers = DispatchTable(_resolve_writer)
+
+
+def _read_varint(data, pos):
+    # A varint of more than one byte; the first is at ``pos``.
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _take(data, pos, size):
+    end = pos + size
+    if end > len(data):
+        raise IndexError("read past the end of the data")
+    return data[pos:end], end
+
+
+def _read_symbols(data, pos):
+    symbols = []
+    count, pos = _read_varint(data, pos)
+    for _ in range(count):
+        size, pos = _read_varint(data, pos)
+        name, pos = _take(data, pos, size)
+        symbols.append(name.decode('utf-8'))
+    return symbols, pos
+
+
+def _finish_dict(data, keypath):
+    # What a plain dict, columnar list or reference settles into once its
+    # values are decoded.
+    if COLUMNAR_KEY in data:
+        tag = data[COLUMNAR_KEY]
+        if tag is not None and _builders[tag] is None:
+            return expand_columnar(data, keypath)
+        return _build_columnar(data, keypath)
+    if REF_KEY in data:
+        return resolve_reference(data, keypath)
+    return data
+
+
+_CLOSE = -1
+
+
+def _read(data, pos, symbols, build):
+    """ Parse the value at ``pos``; returns it and the position after it.
+
+    One loop with an explicit stack reads every value. Scalars are read in
+    line and stored straight into the list or dict being filled. With
+    ``build``, tagged dicts are built into objects as soon as they are
+    complete, from values decoded already, so there is no second walk over
+    plain data. Without it they keep their ``__type__`` key.
+    """
+    stack = []
+    items = None
+    keyed = False
+    key = None
+    type_tag = None
+    keypath = None
+    end_of_data = len(data)
+    while True:
+        if keyed:
+            index = data[pos]
+            pos += 1
+            if index & 0x80:
+                index, pos = _read_varint(data, pos - 1)
+            if index:
+                key = symbols[index - 1]
+                tag = data[pos]
+                pos += 1
+            else:
+                tag = _CLOSE
+        else:
+            tag = data[pos]
+            pos += 1
+        if tag == STR:
+            size = data[pos]
+            pos += 1
+            if size & 0x80:
+                size, pos = _read_varint(data, pos - 1)
+            end = pos + size
+            if end > end_of_data:
+                raise IndexError("read past the end of the data")
+            value = data[pos:end].decode('utf-8', 'surrogatepass')
+            pos = end
+        elif tag == INT8:
+            value = data[pos]
+            pos += 1
+            if value & 0x80:
+                value -= 0x100
+        elif tag == FLOAT64:
+            value = _float64.unpack_from(data, pos)[0]
+            pos += 8
+        elif tag <= TRUE and tag >= NULL:
+            value = (None, False, True)[tag]
+        elif tag == INT16:
+            value = _int16.unpack_from(data, pos)[0]
+            pos += 2
+        elif tag == INT32:
+            value = _int32.unpack_from(data, pos)[0]
+            pos += 4
+        elif tag == INT64:
+            value = _int64.unpack_from(data, pos)[0]
+            pos += 8
+        elif tag == BIGINT:
+            size, pos = _read_varint(data, pos)
+            value, pos = _take(data, pos, size)
+            value = int.from_bytes(value, 'little', signed=True)
+        elif tag == BYTES:
+            size, pos = _read_varint(data, pos)
+            value, pos = _take(data, pos, size)
+        elif LIST <= tag <= OBJECT_ID:
+            stack.append((items, keyed, key, type_tag, keypath))
+            if items is not None:
+                keypath = KeyPath(keypath, key if keyed else len(items))
+            if tag == LIST:
+                items = []
+                keyed = False
+                type_tag = None
+                continue
+            if tag == OBJECT:
+                type_tag, pos = _read_varint(data, pos)
+                type_tag = symbols[type_tag]
+            elif tag == OBJECT_ID:
+                type_tag, pos = _read_varint(data, pos)
+            else:
+                type_tag = None
+            items = {}
+            keyed = True
+            continue
+        elif (tag == _CLOSE) if keyed else (tag == END and items is not None):
+            value = items
+            if type_tag is not None:
+                value['__type__'] = type_tag
+                if build:
+                    builder = _builders[type_tag]
+                    if builder is not None:
+                        value = builder(value, keypath)
+            elif build and keyed:
+                value = _finish_dict(value, keypath)
+            items, keyed, key, type_tag, keypath = stack.pop()
+        else:
+            raise DecodingError(f"Unknown tag 0x{tag:02x} at offset {pos - 1}")
+        if items is None:
+            return value, pos
+        if keyed:
+            items[key] = value
+        else:
+            items.append(value)
+
+
+class BinaryCodec:
+    @staticmethod
+    def encode(obj: Encodable, type_tags: str = 'name', columnar: bool = False, references: bool = False) -> bytes:
+        """ Encode ``obj``; the options are as for JSONCodec.encode. With
+        ``'id'`` tags, objects carry their type ID instead of a symbol. """
+        if not isinstance(obj, Encodable):
+            raise TypeError(f"Object of type {obj.__class__.__name__} is not Encodable")
+        writer = _BinaryWriter(EncodeContext(type_tags, columnar, references))
+        _write_object(writer, obj, None)
+        return writer.getvalue()
+
+    @staticmethod
+    def decode(data: bytes, schema=None) -> Decodable:
+        """ Decode a document; ``schema`` is as for JSONCodec.decode.
+
+        Objects are built while the bytes are read, bottom-up. Documents
+        with shared references, which may be cycles, or with literal dicts,
+        as well as schema decoding and profiling, parse into plain data
+        first and decode it as JSONCodec does. """
+        data, pos, symbols = BinaryCodec._open(data)
+        if schema is not None or profiling.active is not None or ID_KEY in symbols or REF_KEY in symbols \
+                or LITERAL_KEY in symbols:
+            return JSONCodec.decode_object(BinaryCodec._parse(data, pos, symbols, False), schema)
+        result = BinaryCodec._parse(data, pos, symbols, True)
+        if result.__class__ is dict:
+            if "__type__" in result and _builders[result["__type__"]] is None:
+                raise DecodingError("JSON string does not contain a valid Decodable type")
+        elif result.__class__ is not list and not isinstance(result, Decodable):
+            raise DecodingError("JSON string does not contain a valid Decodable type")
+        return result
+
+    @staticmethod
+    def loads(data: bytes):
+        """ Parse an encoded document into plain dicts and lists without
+        building any Decodable; tagged objects keep their ``__type__`` key. """
+        return BinaryCodec._parse(*BinaryCodec._open(data), False)
+
+    @staticmethod
+    def _open(data):
+        if data.__class__ is not bytes:
+            data = bytes(data)
+        if data[:len(MAGIC)] != MAGIC:
+            raise DecodingError("Not a codable binary document")
+        try:
+            symbols, pos = _read_symbols(data, len(MAGIC))
+        except (IndexError, UnicodeDecodeError) as e:
+            raise DecodingError(f"Truncated or corrupt binary document: {e}") from e
+        return data, pos, symbols
+
+    @staticmethod
+    def _parse(data, pos, symbols, build):
+        try:
+            result, pos = _read(data, pos, symbols, build)
+        except (IndexError, UnicodeDecodeError, struct.error) as e:
+            raise DecodingError(f"Truncated or corrupt binary document: {e}") from e
+        if pos != len(data):
+            raise DecodingError("Extra data after binary document")
+        return result
@@ -0,0 +1,449 @@
+""" Encoding and decoding with an explicit stack, for documents of any depth.
+
+The JSON codec normally walks a document by recursion: every nested object
+is a nested ``encode`` or ``decode`` call, and so are the dicts and lists
+between them, which puts a chain of a few hundred objects past Python's
+recursion limit. With ``iterative=True`` JSONCodec walks documents with an
+explicit stack instead:
+
+* encoding runs each object's ``encode`` into a container that only
+  collects its fields, and the stack then visits the fields, so no
+  ``encode`` call is ever nested in another;
+* decoding settles a document bottom-up: the items of a dict or list are
+  decoded before it, and tagged dicts are then built from data whose
+  nested values are decoded already.
+
+The text itself is written and parsed by the json module, which is much
+faster than Python code, and only when that runs out of recursion depth
+by the stack-based writer and parser here. The result is what the
+recursive path gives, with one exception: a reference to an object that
+encloses it (a cycle) cannot be decoded, since an object is only built
+once its contents are. Cycles encode fine. Schema decoding and per-class
+profiling are not supported in this mode.
+"""
+import json
+import re
+from functools import partial
+from json.decoder import WHITESPACE, scanstring
+
+from codable.columnar import COLUMNAR_KEY, columnar_parts, columnar_plan, expand_columnar
+from codable.formats.json import (
+    JSONKeyedDecodingContainer,
+    _JSONStreamingKeyedEncodingContainer,
+    _columnar,
+    _columnar_classes,
+    _encode_object,
+    _not_serializable,
+    _scalar_text,
+    _stream_key,
+)
+from codable.literal import LITERAL_KEY, literal_dict, needs_literal
+from codable.plans import NESTED_TYPES, decode_plan
+from codable.references import ID_KEY, REF_KEY, register_object, resolve_reference
+from codable.serialization import (
+    CodingError,
+    Decodable,
+    DecodingError,
+    DispatchTable,
+    KeyPath,
+    RegistryEntry,
+    custom_type_registry,
+    encode_kind,
+    has_default_decode,
+)
+
+
+# Encoding: objects to plain dicts and lists.
+#
+# Openers are called as ``opener(value, keypath, context)`` for every value
+# that is not a scalar. They return what stands for it in its parent, the
+# empty dict or list to fill, which is the same unless a literal dict is
+# wrapped, and the (key, value) pairs still to be put into it.
+
+def _open_object(value, keypath, context, entry=None):
+    container = _JSONStreamingKeyedEncodingContainer(keypath, context)
+    _encode_object(value, container, entry)
+    data = {}
+    return data, data, iter(container.data.items())
+
+
+def _open_dict(value, keypath, context):
+    data = {}
+    if needs_literal(value):
+        return {LITERAL_KEY: data}, data, iter(value.items())
+    return data, data, iter(value.items())
+
+
+def _open_list(value, keypath, context):
+    if context.columnar:
+        columnar = _columnar(value, keypath, context)
+        if columnar is not None:
+            data = {}
+            return data, data, iter(columnar.items())
+    data = []
+    return data, data, enumerate(value)
+
+
+def _open_unsupported(value, keypath, context):
+    _not_serializable(value, keypath)
+
+
+def _resolve_opener(cls):
+    # None stores the value as is.
+    kind = encode_kind(cls)
+    if kind.__class__ is RegistryEntry:
+        return partial(_open_object, entry=kind)
+    return {
+        'scalar': None,
+        'object': _open_object,
+        'dict': _open_dict,
+        'list': _open_list,
+        None: _open_unsupported,
+    }[kind]
+
+
+_openers = DispatchTable(_resolve_opener)
+
+
+def encode_object(obj, context):
+    """ The plain dict JSONCodec.encode_object returns for ``obj``. """
+    root, _, items = _open_object(obj, None, context)
+    stack = [(root, items, None)]
+    openers = _openers
+    while stack:
+        data, items, keypath = stack[-1]
+        keyed = data.__class__ is dict
+        for key, value in items:
+            opener = openers[value.__class__]
+            if opener is not None:
+                path = KeyPath(keypath, key)
+                value, target, nested = opener(value, path, context)
+            if keyed:
+                data[key] = value
+            else:
+                data.append(value)
+            if opener is not None:
+                stack.append((target, nested, path))
+                break
+        else:
+            stack.pop()
+    return root
+
+
+def dumps(data):
+    """ ``json.dumps(data)`` for plain data nested to any depth. """
+    try:
+        return json.dumps(data)
+    except RecursionError:
+        return ''.join(_write(data))
+
+
+def _write(data):
+    # The fragments of json.dumps(data). Each frame holds the items of a
+    # dict or list still to be written and the text to put before the next.
+    parts = []
+    append = parts.append
+    scalar_text = _scalar_text
+    stack = []
+    value = data
+    while True:
+        if value.__class__ is dict and value:
+            stack.append([iter(value.items()), True, '{'])
+        elif value.__class__ is list and value:
+            stack.append([enumerate(value), False, '['])
+        elif value.__class__ is dict:
+            append('{}')
+        elif value.__class__ is list:
+            append('[]')
+        else:
+            text = scalar_text[value.__class__]
+            if text is None:
+                _not_serializable(value, None)
+            append(text(value))
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], None)
+            if item is None:
+                append('}' if frame[1] else ']')
+                stack.pop()
+                continue
+            key, value = item
+            append(frame[2] + _stream_key(key, None) + ': ' if frame[1] else frame[2])
+            frame[2] = ', '
+            break
+        else:
+            return parts
+
+
+# Decoding: text to plain data, and plain data to objects.
+
+_whitespace = WHITESPACE.match
+# The common tokens, after optional whitespace: a value starting with {, [,
+# a string without escapes or a number; a key without escapes and its
+# colon; what may follow a value. Anything else takes the slower path,
+# which also reports errors.
+_value = re.compile(r'[ \t\n\r]*(?:(\{)|(\[)|"([^"\\\x00-\x1f]*)"|(-?(?:0|[1-9][0-9]*))(\.[0-9]+)?([eE][-+]?[0-9]+)?)').match
+_key = re.compile(r'[ \t\n\r]*"([^"\\\x00-\x1f]*)"[ \t\n\r]*:').match
+_after = re.compile(r'[ \t\n\r]*([,\]}])').match
+_CONSTANTS = (('null', None), ('true', True), ('false', False),
+              ('NaN', float('nan')), ('Infinity', float('inf')), ('-Infinity', float('-inf')))
+
+
+def loads(text):
+    """ ``json.loads(text)`` for documents nested to any depth. """
+    try:
+        return json.loads(text)
+    except RecursionError:
+        pass
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode(json.detect_encoding(text), 'surrogatepass')
+    return _parse(text)
+
+
+def _parse_key(s, pos):
+    match = _key(s, pos)
+    if match is not None:
+        return match.group(1), match.end()
+    pos = _whitespace(s, pos).end()
+    if s[pos:pos + 1] != '"':
+        raise json.JSONDecodeError("Expecting property name enclosed in double quotes", s, pos)
+    key, pos = scanstring(s, pos + 1)
+    pos = _whitespace(s, pos).end()
+    if s[pos:pos + 1] != ':':
+        raise json.JSONDecodeError("Expecting ':' delimiter", s, pos)
+    return key, pos + 1
+
+
+def _parse_scalar(s, pos):
+    # Strings with escapes and the constants.
+    pos = _whitespace(s, pos).end()
+    if s[pos:pos + 1] == '"':
+        return scanstring(s, pos + 1)
+    for name, value in _CONSTANTS:
+        if s.startswith(name, pos):
+            return value, pos + len(name)
+    raise json.JSONDecodeError("Expecting value", s, pos)
+
+
+def _parse(s):
+    # Accepts what json.loads accepts and fails with the same messages. Each
+    # frame is [dict or list being filled, key of the value being parsed],
+    # where the key of a list is None.
+    stack = []
+    pos = 0
+    while True:
+        match = _value(s, pos)
+        if match is None:
+            value, pos = _parse_scalar(s, pos)
+        else:
+            kind = match.lastindex
+            pos = match.end()
+            if kind == 3:
+                value = match.group(3)
+            elif kind == 4:
+                value = int(match.group(4))
+            elif kind > 4:
+                value = float(match.group(0))
+            elif kind == 1:
+                pos = _whitespace(s, pos).end()
+                if s[pos:pos + 1] != '}':
+                    key, pos = _parse_key(s, pos)
+                    stack.append([{}, key])
+                    continue
+                value = {}
+                pos += 1
+            else:
+                pos = _whitespace(s, pos).end()
+                if s[pos:pos + 1] != ']':
+                    stack.append([[], None])
+                    continue
+                value = []
+                pos += 1
+        # Store the value, closing every dict and list it completes.
+        while stack:
+            frame = stack[-1]
+            data, key = frame
+            if key is None:
+                data.append(value)
+            else:
+                data[key] = value
+            match = _after(s, pos)
+            if match is None:
+                raise json.JSONDecodeError("Expecting ',' delimiter", s, _whitespace(s, pos).end())
+            pos = match.end()
+            char = match.group(1)
+            if char == ',':
+                if key is not None:
+                    frame[1], pos = _parse_key(s, pos)
+                break
+            if char != (']' if key is None else '}'):
+                raise json.JSONDecodeError("Expecting ',' delimiter", s, pos - 1)
+            stack.pop()
+            value = data
+        else:
+            end = _whitespace(s, pos).end()
+            if end != len(s):
+                raise json.JSONDecodeError("Extra data", s, end)
+            return value
+
+
+class _DecodedKeyedDecodingContainer(JSONKeyedDecodingContainer):
+    # Data whose nested values have been decoded already.
+    __slots__ = ()
+
+    def decode(self, key, default=None):
+        data = self.data
+        if key in data:
+            return data[key]
+        return super().decode(key, default)
+
+
+def _keep(value, keypath):
+    return value
+
+
+def _build_object(cls, data, keypath):
+    # _decode_object for data whose nested values are decoded.
+    try:
+        if has_default_decode(cls):
+            return decode_plan(cls)(data, _keep, keypath)
+        obj = cls.decode(_DecodedKeyedDecodingContainer(data, keypath))
+    except CodingError:
+        raise
+    except Exception as e:
+        raise DecodingError(f"Failed to decode {cls.__name__}: {e!r}", keypath) from e
+    if ID_KEY in data:
+        register_object(data[ID_KEY], obj)
+    return obj
+
+
+def _build_foreign(entry, data, keypath):
+    try:
+        obj = entry.decoder(_DecodedKeyedDecodingContainer(data, keypath))
+    except CodingError:
+        raise
+    except Exception as e:
+        raise DecodingError(f"Failed to decode {entry.cls.__name__}: {e!r}", keypath) from e
+    if ID_KEY in data:
+        register_object(data[ID_KEY], obj)
+    return obj
+
+
+def _resolve_builder(cls_name):
+    # Keyed by type tag, like the decoders of the JSON codec; None leaves
+    # the tagged dict as it is, undecoded.
+    entry = custom_type_registry.get_entry(cls_name)
+    if entry is None:
+        return None
+    if issubclass(entry.cls, Decodable):
+        return partial(_build_object, entry.cls)
+    if entry.decoder is not None:
+        return partial(_build_foreign, entry)
+    return None
+
+
+_builders = DispatchTable(_resolve_builder)
+
+
+def _build_columnar(data, keypath):
+    # _decode_columnar for columns whose values are decoded.
+    tag, keys, columns = columnar_parts(data, keypath)
+    cls = _columnar_classes[tag] if tag is not None else None
+    plan = columnar_plan(cls, keys) if cls is not None else None
+    if plan is None:
+        builder = _builders[tag] if tag is not None else _same
+        return [builder(row, KeyPath(keypath, index)) for index, row in enumerate(expand_columnar(data, keypath))]
+    try:
+        return plan(columns, _keep, keypath)
+    except CodingError:
+        raise
+    except Exception as e:
+        raise DecodingError(f"Failed to decode {cls.__name__}: {e!r}", keypath) from e
+
+
+def _same(data, keypath):
+    return data
+
+
+class _Frame:
+    # A dict or list being decoded: its items still to visit, the decoded
+    # ones so far, and how to turn those into the decoded value.
+    __slots__ = ('items', 'data', 'store', 'keypath', 'build', 'key')
+
+    def __init__(self, items, data, keypath, build):
+        self.items = items
+        self.data = data
+        self.store = data.__setitem__
+        self.keypath = keypath
+        self.build = build
+
+
+_is_nested = NESTED_TYPES.__contains__
+
+
+def _start(value, keypath):
+    # A frame for ``value``, a dict or list at ``keypath``, or the decoded
+    # value itself when nothing inside it is to be decoded; the choices
+    # are those of _decode_value. Values holding no dicts or lists are
+    # settled at once.
+    if value.__class__ is list:
+        if not any(map(_is_nested, map(type, value))):
+            return list(value)
+        return _Frame(enumerate(value), [None] * len(value), keypath, _same)
+    tag = value.get('__type__')
+    if tag is not None:
+        build = _builders[tag]
+        if build is None:
+            return value
+        if not any(map(_is_nested, map(type, value.values()))):
+            return build(value, keypath)
+        return _Frame(iter(value.items()), {}, keypath, build)
+    if COLUMNAR_KEY in value:
+        tag = value[COLUMNAR_KEY]
+        if tag is not None and _builders[tag] is None:
+            return expand_columnar(value, keypath)
+        return _Frame(iter(value.items()), {}, keypath, _build_columnar)
+    if REF_KEY in value:
+        return resolve_reference(value, keypath)
+    if LITERAL_KEY in value:
+        value = literal_dict(value, keypath)
+    if not any(map(_is_nested, map(type, value.values()))):
+        return dict(value)
+    return _Frame(iter(value.items()), {}, keypath, _same)
+
+
+def decode_value(value, keypath=None):
+    """ What the JSON codec decodes ``value``, a dict or list, into. """
+    stack = []
+    result = _start(value, keypath)
+    while True:
+        if result.__class__ is _Frame:
+            frame = result
+            stack.append(frame)
+        elif stack:
+            frame = stack[-1]
+            frame.store(frame.key, result)
+        else:
+            return result
+        store = frame.store
+        for key, item in frame.items:
+            if item.__class__ in NESTED_TYPES:
+                frame.key = key
+                result = _start(item, KeyPath(frame.keypath, key))
+                break
+            store(key, item)
+        else:
+            stack.pop()
+            result = frame.build(frame.data, frame.keypath)
+
+
+def decode_document(data):
+    """ _decode_document, with an explicit stack. """
+    if isinstance(data, dict):
+        if "__type__" in data and _builders[data["__type__"]] is None:
+            raise DecodingError("JSON string does not contain a valid Decodable type")
+        return decode_value(data)
+    elif isinstance(data, list):
+        return decode_value(data)
+    else:
+        raise DecodingError("JSON string does not contain a valid Decodable type")
@@ -1,7 +1,48 @@
+import base64
+import codecs
+import io
 import json
+from functools import partial
+from json.encoder import encode_basestring_ascii
 
-from codable.serialization import CustomTypeRegistry, Decodable, custom_type_registry, Encodable
+from codable import profiling
+from codable.parallel import map_batch
+from codable.columnar import (
+    COLUMNAR_KEY,
+    COLUMNAR_MIN_ITEMS,
+    KEYS_KEY,
+    VALUES_KEY,
+    columnar_parts,
+    columnar_plan,
+    expand_columnar,
+)
+from codable.literal import LITERAL_KEY, literal_dict, needs_literal
+from codable.memo import EncodeMemo
+from codable.plans import NESTED_TYPES, decode_plan
+from codable.references import (
+    ID_KEY,
+    REF_KEY,
+    begin_scope,
+    end_scope,
+    register_object,
+    resolve_reference,
+    track_object,
+)
+from codable.schema import decode_schema
+from codable.serialization import CustomTypeRegistry, Decodable, custom_type_registry, Encodable, has_default_decode
 from codable.serialization import (
+    CodingError,
+    DecodingError,
+    DEFAULT_ENCODE_CONTEXT,
+    DispatchTable,
+    EncodeContext,
+    RegistryEntry,
+    encode_kind,
+    EncodingError,
+    KeyPath,
+    keypath_list,
+    keypath_node,
+    qualified_name,
     SingleValueEncodingContainer,
     SingleValueDecodingContainer,
     KeyedEncodingContainer,
@@ -10,190 +51,927 @@ from codable.serialization import (
     UnkeyedDecodingContainer
 )
 
+class _JSONContainer:
+    # Containers keep their path as a KeyPath node; the list form is only
+    # built when asked for. One container is allocated per encoded object,
+    # dict and list, so they all use slots.
+    __slots__ = ()
 
-class JSONKeyedEncodingContainer(KeyedEncodingContainer):
-    def __init__(self, keypath=None):
-        self.data = {}
+    @property
+    def keypath(self):
+        return keypath_list(self._keypath)
 
-        if keypath is None:
-            keypath = []
-        self.keypath = keypath
+
+class JSONKeyedEncodingContainer(_JSONContainer, KeyedEncodingContainer):
+    __slots__ = ('data', '_keypath', '_context')
+
+    def __init__(self, keypath=None, context=DEFAULT_ENCODE_CONTEXT):
+        self.data = {}
+        self._keypath = keypath_node(keypath)
+        self._context = context
 
     def encode(self, key, value):
-        new_keypath = self.keypath + [key]
-        if isinstance(value, Encodable):
-            container = JSONKeyedEncodingContainer(keypath=new_keypath)
-            value.encode(container)
-            container.encode("__type__", value.__class__.__name__)
-        elif isinstance(value, dict):
-            container = JSONKeyedEncodingContainer(keypath=new_keypath)
-            for k, v in value.items():
-                container.encode(k, v)
-        elif isinstance(value, list):
-            container = JSONUnkeyedEncodingContainer(keypath=new_keypath)
-            for v in value:
-                container.encode(v)
+        handler = _encoders[value.__class__]
+        self.data[key] = value if handler is None else handler(value, self, key)
 
-        else:
-            container = JSONSingleValueEncodingContainer(value, keypath=new_keypath)
-        self.data[key] = container
+class JSONKeyedDecodingContainer(_JSONContainer, KeyedDecodingContainer):
+    __slots__ = ('data', '_keypath')
 
-class JSONKeyedDecodingContainer(KeyedDecodingContainer):
     def __init__(self, data, keypath=None):
         self.data = data
-
-        if keypath is None:
-            keypath = []
-        self.keypath = keypath
+        self._keypath = keypath_node(keypath)
 
     def decode(self, key, default=None):
         value = self.data.get(key, default)
-        if isinstance(value, dict):
-            cls_name = value.get('__type__')
-            if cls_name:
-                cls = custom_type_registry.get_class(cls_name)
-                if cls:
-                    container = JSONKeyedDecodingContainer(value)
-                    return cls.decode(container) # decode_from
-            else:
-                container = JSONKeyedDecodingContainer(value)
-                return {k: container.decode(k) for k in value}
+        if value.__class__ in NESTED_TYPES:
+            return _decode_value(value, KeyPath(self._keypath, key))
         return value
 
-class JSONUnkeyedEncodingContainer(UnkeyedEncodingContainer):
-    def __init__(self, keypath=None):
-        self.data = []
+class JSONUnkeyedEncodingContainer(_JSONContainer, UnkeyedEncodingContainer):
+    __slots__ = ('data', '_keypath', '_context')
 
-        if keypath is None:
-            keypath = []
-        self.keypath = keypath
+    def __init__(self, keypath=None, context=DEFAULT_ENCODE_CONTEXT):
+        self.data = []
+        self._keypath = keypath_node(keypath)
+        self._context = context
 
     def encode(self, value):
-        new_keypath = self.keypath + [len(self.data)]
-        if isinstance(value, Encodable):
-            container = JSONKeyedEncodingContainer(keypath=new_keypath)
-            value.encode(container)
-        elif isinstance(value, list):
-            container = JSONUnkeyedEncodingContainer(keypath=new_keypath)
-            for item in value:
-                container.encode(item)
-        else:
-            container = JSONSingleValueEncodingContainer(value, keypath=new_keypath)
-        self.data.append(container)
+        handler = _encoders[value.__class__]
+        self.data.append(value if handler is None else handler(value, self, len(self.data)))
+
+class JSONUnkeyedDecodingContainer(_JSONContainer, UnkeyedDecodingContainer):
+    __slots__ = ('data', '_keypath')
 
-class JSONUnkeyedDecodingContainer(UnkeyedDecodingContainer):
     def __init__(self, data, keypath=None):
         self.data = data
-
-        if keypath is None:
-            keypath = []
-        self.keypath = keypath
-
+        self._keypath = keypath_node(keypath)
 
     def decode(self, index, default=None):
         value = self.data[index] if index < len(self.data) else default
-        if isinstance(value, dict):
-            cls_name = value.get('__type__')
-            if cls_name:
-                cls = custom_type_registry.get_class(cls_name)
-                if cls:
-                    container = JSONKeyedDecodingContainer(value)
-                    value.pop('__type__')
-                    return cls.decode(container)
-            else:
-                container = JSONKeyedDecodingContainer(value)
-                for k, v in value.items():
-                    container.decode(k, v)
-                return container
-        elif isinstance(value, list):
-            container = JSONUnkeyedDecodingContainer(value)
-            return [container.decode(i) for i in range(len(value))]
+        if value.__class__ in NESTED_TYPES:
+            return _decode_value(value, KeyPath(self._keypath, index))
         return value
 
-class JSONSingleValueEncodingContainer(SingleValueEncodingContainer):
+class JSONSingleValueEncodingContainer(_JSONContainer, SingleValueEncodingContainer):
+    __slots__ = ('value', '_keypath')
+
     def __init__(self, value, keypath=None):
-        self.value= value
+        self.value = value
+        self._keypath = keypath_node(keypath)
 
-        if keypath is None:
-            keypath = []
-        self.keypath = keypath
+class JSONSingleValueDecodingContainer(_JSONContainer, SingleValueDecodingContainer):
+    __slots__ = ('value', '_keypath')
 
-class JSONSingleValueDecodingContainer(SingleValueDecodingContainer):
     def __init__(self, value, keypath=None):
         self.value = value
+        self._keypath = keypath_node(keypath)
 
-        if keypath is None:
-            keypath = []
-        self.keypath = keypath
+# Encoders are called as ``handler(value, parent, key)`` with the container
+# ``value`` is being stored in, and return the plain JSON value to store.
+# Containers store plain JSON values, so the finished top-level container
+# already holds the document json.dumps needs.
 
-class JSONCodec:
-    @staticmethod
-    def encode(obj: Encodable) -> str:
-        if isinstance(obj, Encodable):
-            container = JSONKeyedEncodingContainer()
+def _encode_encodable(value, parent, key):
+    container = JSONKeyedEncodingContainer(KeyPath(parent._keypath, key), parent._context)
+    _encode_object(value, container)
+    return container.data
+
+
+def _encode_memoized(value, parent, key):
+    # Frozen classes; see codable.memo.
+    context = parent._context
+    if context.references is None:
+        try:
+            form, text = encode_memo.lookup(value.__class__, context.type_tags, context.columnar, value)
+        except TypeError:
+            # Not fingerprintable, or not encodable: an error is raised
+            # again below with the full key path.
+            pass
+        else:
+            return form if context.share_forms else _copy_form(form)
+    return _encode_encodable(value, parent, key)
+
+
+def _copy_form(form):
+    # A memoized form for a document the caller gets, with its own dicts and lists.
+    if form.__class__ is dict:
+        return {k: v if v.__class__ not in NESTED_TYPES else _copy_form(v) for k, v in form.items()}
+    return [v if v.__class__ not in NESTED_TYPES else _copy_form(v) for v in form]
+
+
+def _encode_fresh(cls, type_tags, columnar, obj):
+    container = JSONKeyedEncodingContainer(None, EncodeContext(type_tags, columnar))
+    _encode_object(obj, container)
+    return container.data, json.dumps(container.data)
+
+
+encode_memo = EncodeMemo(_encode_fresh)
+
+
+def _encode_foreign(entry, value, parent, key):
+    container = JSONKeyedEncodingContainer(KeyPath(parent._keypath, key), parent._context)
+    _encode_object(value, container, entry)
+    return container.data
+
+
+def _encode_dict(value, parent, key):
+    data = _encode_items(value, parent, key)
+    return data if not needs_literal(value) else {LITERAL_KEY: data}
+
+
+def _encode_items(value, parent, key):
+    container = JSONKeyedEncodingContainer(KeyPath(parent._keypath, key), parent._context)
+    for k, v in value.items():
+        container.encode(k, v)
+    return container.data
+
+
+def _encode_list(value, parent, key):
+    if parent._context.columnar:
+        columnar = _columnar(value, KeyPath(parent._keypath, key), parent._context)
+        if columnar is not None:
+            return _encode_items(columnar, parent, key)
+    container = JSONUnkeyedEncodingContainer(KeyPath(parent._keypath, key), parent._context)
+    for v in value:
+        container.encode(v)
+    return container.data
+
+
+def _encode_unsupported(value, parent, key):
+    _not_serializable(value, KeyPath(parent._keypath, key))
+
+
+def _not_serializable(value, keypath):
+    raise EncodingError(f"Object of type {value.__class__.__name__} is not JSON serializable", keypath)
+
+
+def _resolve_encoder(cls):
+    # None stores the value as is.
+    kind = encode_kind(cls)
+    if kind.__class__ is RegistryEntry:
+        handler = partial(_encode_foreign, kind)
+    elif kind == 'object':
+        handler = _encode_memoized if cls.__frozen__ else _encode_encodable
+    else:
+        return {
+            'scalar': None,
+            'dict': _encode_dict,
+            'list': _encode_list,
+            None: _encode_unsupported,
+        }[kind]
+    return handler if profiling.active is None else _profiled_encoder(handler, cls)
+
+
+_encoders = DispatchTable(_resolve_encoder)
+
+
+# JSON has no bytes type, so bytes-like values are written as tagged objects
+# holding base64 text. The binary format writes them raw and never gets here.
+
+def _encode_bytes(value, container):
+    container.encode('base64', base64.b64encode(value).decode('ascii'))
+
+
+def _decode_bytes(container):
+    return base64.b64decode(container.decode('base64'), validate=True)
+
+
+custom_type_registry.register(bytes, _encode_bytes, _decode_bytes)
+custom_type_registry.register(bytearray, _encode_bytes, lambda container: bytearray(_decode_bytes(container)))
+custom_type_registry.register(memoryview, _encode_bytes, _decode_bytes)
+
+
+def _encode_object(obj, container, entry=None):
+    if container._context.references is not None:
+        ref_id, seen = track_object(container._context.references, obj)
+        if seen:
+            container.encode(REF_KEY, ref_id)
+            return
+        container.encode(ID_KEY, ref_id)
+    _run_encoder(obj, container, entry)
+    tag = container._context.tags[obj.__class__ if entry is None else entry.cls]
+    if tag is not None:
+        container.encode("__type__", tag)
+
+
+def _run_encoder(obj, container, entry=None):
+    # ``entry`` is the registry entry of a type encoded by a registered
+    # function rather than its own ``encode``.
+    try:
+        if entry is None:
             obj.encode(container)
-            container.encode("__type__", obj.__class__.__name__)
-            def get_dict(container):
-                result = {}
-                for key, value in container.data.items():
-                    if isinstance(value, JSONKeyedEncodingContainer):
-                            result[key] = get_dict(value)
-                    elif isinstance(value, JSONUnkeyedEncodingContainer):
-                        result[key] = get_list(value)
-                    elif isinstance(value, JSONSingleValueEncodingContainer):
-                        result[key] = value.value
-                    else:
-                        raise Exception(f"type {type(value)} should not get here.")
-                return result
-
-            def get_list(container):
-                result = []
-                for value in container.data:
-                    if isinstance(value, JSONKeyedEncodingContainer):
-                        result.append(get_dict(value))
-                    elif isinstance(value, JSONUnkeyedEncodingContainer):
-                        result.append(get_list(value))
-                    elif isinstance(value, JSONSingleValueEncodingContainer):
-                        result.append(value.value)
-                    else:
-                        raise Exception(f"type {type(value)} should not get here.")
-                return result
-
-            encoded_data = get_dict(container)
-            return json.dumps(encoded_data)
-        raise TypeError(f"Object of type {obj.__class__.__name__} is not Encodable")
+        else:
+            entry.encoder(obj, container)
+    except CodingError:
+        raise
+    except Exception as e:
+        raise EncodingError(f"Failed to encode {obj.__class__.__name__}: {e!r}", container._keypath) from e
 
-    @staticmethod
-    def decode(json_str: str) -> Decodable:
-        data = json.loads(json_str)
-
-        def decode_dict(data):
-            if "__type__" in data:  # Check if the dictionary has a __type__ field
-                cls_name = data["__type__"]  # Get the class name from the __type__ field
-                cls = custom_type_registry.get_class(cls_name)  # Retrieve the class from the registry
-                if cls and issubclass(cls, Decodable):  # Check if the class is a subclass of Decodable
-                    container = JSONKeyedDecodingContainer(data)  # Create a decoding container
-                    return cls.decode(container)  # Decode the object using the class's decode method
+
+def _columnar(values, keypath, context):
+    # The columnar dict for ``values`` (the list at ``keypath``), or None
+    # when they are not all objects of one class with the same fields. The
+    # fields are collected unencoded and the columns encoded afterwards.
+    if len(values) < COLUMNAR_MIN_ITEMS:
+        return None
+    cls = values[0].__class__
+    handler = _encoders[cls]
+    handler = getattr(handler, '__wrapped__', handler)
+    if handler is _encode_encodable or handler is _encode_memoized:
+        entry = None
+    elif handler.__class__ is partial and handler.func is _encode_foreign:
+        entry = handler.args[0]
+    else:
+        return None
+    for value in values:
+        if value.__class__ is not cls:
+            return None
+    rows = []
+    layout = None
+    for index, value in enumerate(values):
+        container = _JSONStreamingKeyedEncodingContainer(KeyPath(keypath, index), context)
+        _run_encoder(value, container, entry)
+        if layout is None:
+            layout = tuple(container.data)
+            if not layout:
+                return None
+        elif tuple(container.data) != layout:
+            return None
+        rows.append(container.data.values())
+    return {
+        COLUMNAR_KEY: context.tags[cls if entry is None else entry.cls],
+        KEYS_KEY: list(layout),
+        VALUES_KEY: [list(column) for column in zip(*rows)],
+    }
+
+
+# The stream writer hands back control every time this many fragments have
+# been buffered, so a chunk is typically a few tens of kilobytes.
+STREAM_FLUSH_FRAGMENTS = 4096
+
+_INFINITY = float('inf')
+
+
+class _JSONStreamingKeyedEncodingContainer(_JSONContainer, KeyedEncodingContainer):
+    # Collects the fields of one object without encoding them, so the stream
+    # writer can walk nested values only when it reaches them.
+    __slots__ = ('data', '_keypath', '_context')
+
+    def __init__(self, keypath=None, context=DEFAULT_ENCODE_CONTEXT):
+        self.data = {}
+        self._keypath = keypath_node(keypath)
+        self._context = context
+
+    def encode(self, key, value):
+        self.data[key] = value
+
+
+def _float_text(value):
+    if value != value:
+        return 'NaN'
+    if value == _INFINITY:
+        return 'Infinity'
+    if value == -_INFINITY:
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def _resolve_scalar_text(cls):
+    # Mirrors json.dumps with its default settings.
+    if cls is bool:
+        return lambda value: 'true' if value else 'false'
+    if cls is type(None):
+        return lambda value: 'null'
+    if issubclass(cls, str):
+        return encode_basestring_ascii
+    if issubclass(cls, int):
+        return int.__repr__
+    if issubclass(cls, float):
+        return _float_text
+    return None
+
+
+_scalar_text = DispatchTable(_resolve_scalar_text)
+
+
+def _stream_scalar(value, keypath):
+    text = _scalar_text[value.__class__]
+    if text is None:
+        _not_serializable(value, keypath)
+    return text(value)
+
+
+def _stream_key(key, keypath):
+    if key.__class__ is str:
+        return encode_basestring_ascii(key)
+    if isinstance(key, (int, float, bool)) or key is None:
+        return '"' + _stream_scalar(key, keypath) + '"'
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    raise EncodingError(f"Keys must be str, int, float, bool or None, not {key.__class__.__name__}", keypath)
+
+
+def _stream_value(value, keypath, parts, context):
+    # ``keypath`` is the path of ``value``. Yields (without a value) whenever
+    # enough fragments are buffered in ``parts`` for the caller to flush.
+    handler = _stream_encoders[value.__class__]
+    if handler is None:
+        parts.append(_stream_scalar(value, keypath))
+    else:
+        yield from handler(value, keypath, parts, context)
+
+
+def _stream_encodable(value, keypath, parts, context, entry=None):
+    container = _JSONStreamingKeyedEncodingContainer(keypath, context)
+    _encode_object(value, container, entry)
+    yield from _stream_items(container.data.items(), keypath, parts, context)
+
+
+def _stream_memoized(value, keypath, parts, context):
+    if context.references is None:
+        try:
+            _, text = encode_memo.lookup(value.__class__, context.type_tags, context.columnar, value)
+        except TypeError:
+            pass
+        else:
+            parts.append(text)
+            return
+    yield from _stream_encodable(value, keypath, parts, context)
+
+
+def _stream_dict(value, keypath, parts, context):
+    if needs_literal(value):
+        return _stream_literal(value, keypath, parts, context)
+    return _stream_items(value.items(), keypath, parts, context)
+
+
+def _stream_literal(value, keypath, parts, context):
+    parts.append('{' + _stream_key(LITERAL_KEY, keypath) + ': ')
+    yield from _stream_items(value.items(), keypath, parts, context)
+    parts.append('}')
+
+
+def _resolve_stream_encoder(cls):
+    # None writes the value as a scalar, or reports it as unserialisable.
+    kind = encode_kind(cls)
+    if kind.__class__ is RegistryEntry:
+        handler = partial(_stream_encodable, entry=kind)
+    elif kind == 'object':
+        handler = _stream_memoized if cls.__frozen__ else _stream_encodable
+    else:
+        return {
+            'scalar': None,
+            'dict': _stream_dict,
+            'list': _stream_list,
+            None: None,
+        }[kind]
+    return handler if profiling.active is None else _profiled_stream_encoder(handler, cls)
+
+
+_stream_encoders = DispatchTable(_resolve_stream_encoder)
+
+
+def _stream_items(items, keypath, parts, context):
+    append = parts.append
+    stream_encoders = _stream_encoders
+    scalar_text = _scalar_text
+    separator = '{'
+    for key, value in items:
+        append(separator)
+        append(_stream_key(key, keypath))
+        append(': ')
+        separator = ', '
+        handler = stream_encoders[value.__class__]
+        if handler is None:
+            text = scalar_text[value.__class__]
+            if text is None:
+                _not_serializable(value, KeyPath(keypath, key))
+            append(text(value))
+        else:
+            yield from handler(value, KeyPath(keypath, key), parts, context)
+        if len(parts) >= STREAM_FLUSH_FRAGMENTS:
+            yield
+    append('{}' if separator == '{' else '}')
+
+
+def _stream_list(values, keypath, parts, context):
+    if context.columnar:
+        columnar = _columnar(values, keypath, context)
+        if columnar is not None:
+            yield from _stream_items(columnar.items(), keypath, parts, context)
+            return
+    append = parts.append
+    stream_encoders = _stream_encoders
+    scalar_text = _scalar_text
+    separator = '['
+    for index, value in enumerate(values):
+        append(separator)
+        separator = ', '
+        handler = stream_encoders[value.__class__]
+        if handler is None:
+            text = scalar_text[value.__class__]
+            if text is None:
+                _not_serializable(value, KeyPath(keypath, index))
+            append(text(value))
+        else:
+            yield from handler(value, KeyPath(keypath, index), parts, context)
+        if len(parts) >= STREAM_FLUSH_FRAGMENTS:
+            yield
+    append('[]' if separator == '[' else ']')
+
+
+def _is_binary_stream(fp):
+    return isinstance(fp, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(fp, 'mode', '')
+
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_START = '-0123456789'
+# What may follow a complete top-level element.
+_ELEMENT_END = _WHITESPACE + ',]'
+
+
+class _JSONArrayStreamParser:
+    """ Incremental parser for a document whose top level is an array.
+
+    Text is fed in arbitrary pieces and each complete top-level element is
+    returned as soon as it has been seen, parsed with json's own decoder.
+    Only the unconsumed tail of the input is kept. Documents that are not
+    arrays are collected whole and returned as a single element by close().
+    """
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        # Pieces fed since the buffer was last joined, and their length.
+        # They are joined only when there is something to parse, so an
+        # element spread over many pieces is copied a bounded number of
+        # times rather than once per piece.
+        self._pieces = []
+        self._pieces_size = 0
+        self._state = 'start'
+        self._count = 0
+        # Size of the pending text the last time an element failed to
+        # parse; avoids re-parsing a huge element on every small feed.
+        self._retry_at = 0
+
+    @property
+    def is_array(self):
+        return self._state != 'document'
+
+    def feed(self, text):
+        self._pieces.append(text)
+        self._pieces_size += len(text)
+        pending = len(self._buffer) - self._pos + self._pieces_size
+        if self._state == 'document' or pending < self._retry_at:
+            return []
+        self._join()
+        return self._parse(final=False)
+
+    def _join(self):
+        self._pieces.insert(0, self._buffer[self._pos:])
+        self._buffer = ''.join(self._pieces)
+        self._pos = 0
+        self._pieces.clear()
+        self._pieces_size = 0
+
+    def close(self):
+        self._join()
+        elements = self._parse(final=True)
+        if self._state == 'document':
+            try:
+                elements.append(self._decoder.decode(self._buffer))
+            except ValueError as e:
+                raise DecodingError(f"Invalid JSON document: {e}") from e
+        elif self._state != 'done':
+            raise DecodingError("Unexpected end of JSON array", [self._count])
+        self._buffer = ''
+        self._pos = 0
+        return elements
+
+    def _skip_whitespace(self):
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos < len(buffer)
+
+    def _parse(self, final):
+        elements = []
+        while True:
+            if self._state in ('document', 'done'):
+                if self._state == 'done' and self._skip_whitespace():
+                    raise DecodingError("Extra data after JSON array")
+                return elements
+            if not self._skip_whitespace():
+                return elements
+            char = self._buffer[self._pos]
+            if self._state == 'start':
+                if char == '[':
+                    self._pos += 1
+                    self._state = 'first'
                 else:
-                    raise TypeError("JSON string does not contain a valid Decodable type")  # Raise error if not decodable
-            else:
-                return data  # Return the dictionary as is if no __type__ field
-
-        def decode_list(data):
-            result = []
-            for item in data:
-                if isinstance(item, dict):
-                    result.append(decode_dict(item))
-                elif isinstance(item, list):
-                    result.append(decode_list(item))
+                    self._state = 'document'
+            elif self._state == 'separator':
+                if char == ',':
+                    self._pos += 1
+                    self._state = 'value'
+                elif char == ']':
+                    self._pos += 1
+                    self._state = 'done'
                 else:
-                    result.append(item)
-            return result
+                    raise DecodingError(f"Expecting ',' or ']' in JSON array, found {char!r}", [self._count])
+            elif char == ']' and self._state == 'first':
+                self._pos += 1
+                self._state = 'done'
+            else:
+                pending = len(self._buffer) - self._pos
+                if not final and pending < self._retry_at:
+                    return elements
+                try:
+                    value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                except ValueError as e:
+                    if final:
+                        raise DecodingError(f"Invalid JSON array element: {e}", [self._count]) from e
+                    self._retry_at = 2 * pending
+                    return elements
+                if char in _NUMBER_START and not final and (
+                        end == len(self._buffer) or self._buffer[end] not in _ELEMENT_END):
+                    # The number may go on in the next piece: raw_decode takes
+                    # the 1 of "1." or the 1.5 of "1.5e" for a whole number.
+                    return elements
+                self._pos = end
+                self._retry_at = 0
+                self._count += 1
+                self._state = 'separator'
+                elements.append(value)
+
+
+def _read_text(fp, chunk_size):
+    decoder = None
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            if decoder is not None:
+                tail = decoder.decode(b'', final=True)
+                if tail:
+                    yield tail
+            return
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8-sig')()
+            chunk = decoder.decode(chunk)
+        yield chunk
+
+
+class JSONCodec:
+    @staticmethod
+    @profiling.entry_point('JSONCodec.encode')
+    def encode(obj: Encodable, type_tags: str = 'name', columnar: bool = False,
+               references: bool = False, iterative: bool = False) -> str:
+        """ Encode ``obj`` as a JSON string.
+
+        ``type_tags`` chooses the ``__type__`` tags: ``'name'``,
+        ``'qualified'``, ``'id'`` or ``'none'``. ``columnar`` writes lists of
+        objects of one class as columns. ``references`` writes shared objects
+        once and cycles as back-references. See EncodeContext.
+        ``iterative`` walks the document with an explicit stack rather than
+        by recursion, for documents of any depth; see
+        ``codable.formats.iterative``.
+        """
+        if iterative:
+            from codable.formats.iterative import dumps
+            return dumps(JSONCodec.encode_object(obj, type_tags, columnar, references, iterative))
+        # The document is only serialised, so memoized forms go into it as they are.
+        return json.dumps(_encode_document(obj, EncodeContext(type_tags, columnar, references, share_forms=True)))
+
+    @staticmethod
+    def iterencode(obj: Encodable, type_tags: str = 'name', columnar: bool = False, references: bool = False):
+        """ Encode ``obj`` as a sequence of string chunks.
+
+        Joining the chunks gives exactly what ``encode`` returns, but nested
+        objects are only encoded when the writer reaches them, so memory use
+        depends on nesting depth and object width, not on document size.
+        Lists written in columnar form are collected whole before writing.
+        """
+        if not isinstance(obj, Encodable):
+            raise TypeError(f"Object of type {obj.__class__.__name__} is not Encodable")
+        context = EncodeContext(type_tags, columnar, references)
+        parts = []
+        for _ in _stream_value(obj, None, parts, context):
+            yield ''.join(parts)
+            parts.clear()
+        if parts:
+            yield ''.join(parts)
+
+    @staticmethod
+    @profiling.entry_point('JSONCodec.dump')
+    def dump(obj: Encodable, fp, type_tags: str = 'name', columnar: bool = False, references: bool = False):
+        """ Write ``obj`` to a text or binary file object chunk by chunk. """
+        if _is_binary_stream(fp):
+            for chunk in JSONCodec.iterencode(obj, type_tags, columnar, references):
+                fp.write(chunk.encode('ascii'))
+        else:
+            for chunk in JSONCodec.iterencode(obj, type_tags, columnar, references):
+                fp.write(chunk)
+
+    @staticmethod
+    @profiling.entry_point('JSONCodec.encode_object')
+    def encode_object(obj: Encodable, type_tags: str = 'name', columnar: bool = False,
+                      references: bool = False, iterative: bool = False) -> dict:
+        """ Encode ``obj`` into the plain dict that ``encode`` serialises. """
+        if iterative and isinstance(obj, Encodable):
+            from codable.formats.iterative import encode_object
+            return encode_object(obj, EncodeContext(type_tags, columnar, references))
+        return _encode_document(obj, EncodeContext(type_tags, columnar, references))
+
+    @staticmethod
+    def encode_batch(objs, workers: int = None, executor=None, chunksize: int = None,
+                     type_tags: str = 'name') -> list:
+        """ Encode many objects, spreading the work over worker processes.
+
+        Returns the encoded strings in input order. Small batches, or
+        ``workers=1``, are encoded in this process. See ``codable.parallel``.
+        """
+        encode = JSONCodec.encode if type_tags == 'name' else partial(JSONCodec.encode, type_tags=type_tags)
+        return map_batch(encode, objs, workers=workers, executor=executor, chunksize=chunksize)
+
+    @staticmethod
+    def decode_batch(json_strs, workers: int = None, executor=None, chunksize: int = None) -> list:
+        """ Decode many documents, spreading the work over worker processes.
+
+        Decoded objects are pickled back to this process, so their classes
+        must be importable by module path.
+        """
+        return map_batch(JSONCodec.decode, json_strs, workers=workers, executor=executor, chunksize=chunksize)
+
+    @staticmethod
+    @profiling.entry_point('JSONCodec.decode')
+    def decode(json_str: str, schema=None, iterative: bool = False, select=None) -> Decodable:
+        """ Decode a JSON document.
 
-        if isinstance(data, dict):
-            return decode_dict(data)
-        elif isinstance(data, list):
-            return decode_list(data)
+        Objects are normally found through their ``__type__`` tags. With a
+        ``schema`` (a class or type expression such as ``list[Point]``) the
+        document is instead checked against the annotations and built without
+        needing tags; see ``codable.schema``. ``iterative`` decodes with an
+        explicit stack, as for ``encode``. ``select``, a list of key paths
+        such as ``'orders[*].total'``, decodes only the values at those paths
+        and leaves the rest of the document raw; see
+        ``codable.formats.projection``.
+        """
+        if iterative:
+            from codable.formats.iterative import loads
+            return JSONCodec.decode_object(loads(json_str), schema, iterative, select)
+        return JSONCodec.decode_object(json.loads(json_str), schema, select=select)
+
+    @staticmethod
+    def decode_lazy(source):
+        """ Decode a document lazily, from a path, a real file or bytes.
+
+        The file is memory-mapped and only the parts that are read get
+        parsed: objects come back as proxies that decode each field on first
+        access, lists and dicts as LazyList and LazyDict. See
+        ``codable.formats.lazy``.
+        """
+        from codable.formats.lazy import decode_lazy
+        return decode_lazy(source)
+
+    @staticmethod
+    def iterdecode(fp, chunk_size: int = 65536, schema=None):
+        """ Decode the elements of a top-level JSON array one at a time.
+
+        ``fp`` is a text or binary file object read ``chunk_size`` at a time;
+        each element is decoded and yielded as soon as it is complete, so
+        memory use does not grow with the number of elements. A document
+        that is not an array is decoded whole and yielded once. ``schema``,
+        if given, is the type of each element.
+        """
+        parser = _JSONArrayStreamParser()
+        index = 0
+        for text in _read_text(fp, chunk_size):
+            for element in parser.feed(text):
+                yield _decode_element(element, parser, index, schema)
+                index += 1
+        for element in parser.close():
+            yield _decode_element(element, parser, index, schema)
+            index += 1
+
+    @staticmethod
+    @profiling.entry_point('JSONCodec.decode_object')
+    def decode_object(data, schema=None, iterative: bool = False, select=None) -> Decodable:
+        """ Decode an already parsed JSON document. """
+        if schema is not None:
+            if iterative or select is not None:
+                raise ValueError("schema cannot be combined with iterative or select")
+            return decode_schema(schema, data)
+        if select is not None:
+            if iterative:
+                raise ValueError("select and iterative cannot be combined")
+            from codable.formats.projection import decode_selected
+            decode_document = partial(decode_selected, select=select)
+        elif iterative:
+            from codable.formats.iterative import decode_document
         else:
-            raise TypeError("JSON string does not contain a valid Decodable type")
+            decode_document = _decode_document
+        token = begin_scope()
+        try:
+            return decode_document(data)
+        finally:
+            end_scope(token)
+
+
+def _decode_document(data):
+    if isinstance(data, dict):
+        if "__type__" in data:  # Check if the dictionary has a __type__ field
+            decoder = _decoders[data["__type__"]]  # Look up the decoder registered for the tag
+            if decoder is not None:
+                return decoder(data, None)
+            raise DecodingError("JSON string does not contain a valid Decodable type")
+        return _decode_value(data, None)
+    elif isinstance(data, list):
+        return _decode_value(data, None)
+    else:
+        raise DecodingError("JSON string does not contain a valid Decodable type")
+
+
+def _encode_document(obj, context):
+    # JSONCodec.encode_object, with the context made by the caller.
+    if not isinstance(obj, Encodable):
+        raise TypeError(f"Object of type {obj.__class__.__name__} is not Encodable")
+    profile = profiling.active
+    if profile is not None:
+        return profile.call(('encode', qualified_name(obj.__class__)), _encode_root, (obj, context), _json_size)
+    return _encode_root(obj, context)
+
+
+def _encode_root(obj, context):
+    container = JSONKeyedEncodingContainer(None, context)
+    _encode_object(obj, container)
+    return container.data
+
+
+def _decode_element(element, parser, index, schema):
+    if not parser.is_array:
+        return JSONCodec.decode_object(element, schema)
+    if schema is not None:
+        return decode_schema(schema, element, None, index)
+    if element.__class__ in NESTED_TYPES:
+        token = begin_scope()
+        try:
+            return _decode_value(element, KeyPath(None, index))
+        finally:
+            end_scope(token)
+    return element
+
+
+def _decode_object(cls, data, keypath):
+    # Classes using the stock AutoDecodable.decode are filled straight from
+    # the data by a compiled plan; everything else goes through a container.
+    try:
+        if has_default_decode(cls):
+            return decode_plan(cls)(data, _decode_value, keypath)
+        obj = cls.decode(JSONKeyedDecodingContainer(data, keypath))
+    except CodingError:
+        raise
+    except Exception as e:
+        raise DecodingError(f"Failed to decode {cls.__name__}: {e!r}", keypath) from e
+    if ID_KEY in data:
+        register_object(data[ID_KEY], obj)
+    return obj
+
+
+def _decode_foreign(entry, data, keypath):
+    try:
+        obj = entry.decoder(JSONKeyedDecodingContainer(data, keypath))
+    except CodingError:
+        raise
+    except Exception as e:
+        raise DecodingError(f"Failed to decode {entry.cls.__name__}: {e!r}", keypath) from e
+    if ID_KEY in data:
+        register_object(data[ID_KEY], obj)
+    return obj
+
+
+def _resolve_decoder(cls_name):
+    # Keyed by type tag; None leaves the tagged dict as it is.
+    entry = custom_type_registry.get_entry(cls_name)
+    if entry is None:
+        return None
+    if issubclass(entry.cls, Decodable):
+        handler = partial(_decode_object, entry.cls)
+    elif entry.decoder is not None:
+        handler = partial(_decode_foreign, entry)
+    else:
+        return None
+    return handler if profiling.active is None else _profiled_decoder(handler, entry.cls)
+
+
+_decoders = DispatchTable(_resolve_decoder)
+
+
+# Profiling wraps the object handlers of the dispatch tables, which are
+# emptied whenever it is switched on or off; see codable.profiling.
+
+def _profiled_encoder(handler, cls):
+    name = ('encode', qualified_name(cls))
+
+    def encode(value, parent, key):
+        profile = profiling.active
+        if profile is None:
+            return handler(value, parent, key)
+        return profile.call(name, handler, (value, parent, key), _json_size)
+    encode.__wrapped__ = handler
+    return encode
+
+
+def _profiled_stream_encoder(handler, cls):
+    name = ('encode', qualified_name(cls))
+
+    def encode(value, keypath, parts, context):
+        profile = profiling.active
+        if profile is None:
+            return handler(value, keypath, parts, context)
+        return profile.stream(name, handler, (value, keypath, parts, context), parts)
+    encode.__wrapped__ = handler
+    return encode
+
+
+def _profiled_decoder(handler, cls):
+    name = ('decode', qualified_name(cls))
+
+    def decode(data, keypath):
+        profile = profiling.active
+        if profile is None:
+            return handler(data, keypath)
+        return profile.call(name, handler, (data, keypath))
+    decode.__wrapped__ = handler
+    return decode
+
+
+def _json_size(value, sizes):
+    # Length of json.dumps(value), reusing the sizes of nested values that
+    # were measured already, by id().
+    size = sizes.get(id(value))
+    if size is not None:
+        return size
+    if value.__class__ is dict:
+        if not value:
+            return 2
+        return 4 * len(value) + sum(len(_stream_key(k, None)) + _json_size(v, sizes) for k, v in value.items())
+    if value.__class__ is list:
+        if not value:
+            return 2
+        return 2 * len(value) + sum(_json_size(v, sizes) for v in value)
+    return len(_stream_scalar(value, None))
+
+
+for _table in (_encoders, _stream_encoders, _decoders):
+    profiling.add_listener(_table.clear)
+
+
+def _resolve_columnar_class(cls_name):
+    # Classes whose columns can be decoded by a columnar plan.
+    cls = custom_type_registry.get_class(cls_name)
+    if cls is not None and issubclass(cls, Decodable) and has_default_decode(cls):
+        return cls
+    return None
+
+
+_columnar_classes = DispatchTable(_resolve_columnar_class)
+
+
+def _decode_columnar(value, keypath):
+    tag, keys, columns = columnar_parts(value, keypath)
+    cls = _columnar_classes[tag] if tag is not None else None
+    plan = columnar_plan(cls, keys) if cls is not None else None
+    if plan is None:
+        return [_decode_value(row, KeyPath(keypath, index))
+                for index, row in enumerate(expand_columnar(value, keypath))]
+    try:
+        return plan(columns, _decode_value, keypath)
+    except CodingError:
+        raise
+    except Exception as e:
+        raise DecodingError(f"Failed to decode {cls.__name__}: {e!r}", keypath) from e
+
 
+def _decode_value(value, keypath):
+    # ``keypath`` is the path of ``value`` itself. Only dicts and lists reach
+    # this function; callers keep scalars without a call.
+    if value.__class__ is dict:
+        cls_name = value.get('__type__')
+        if cls_name is not None:
+            decoder = _decoders[cls_name]
+            return value if decoder is None else decoder(value, keypath)
+        if COLUMNAR_KEY in value:
+            return _decode_columnar(value, keypath)
+        if REF_KEY in value:
+            return resolve_reference(value, keypath)
+        if LITERAL_KEY in value:
+            value = literal_dict(value, keypath)
+        return {k: v if v.__class__ not in NESTED_TYPES else _decode_value(v, KeyPath(keypath, k))
+                for k, v in value.items()}
+    if value.__class__ is list:
+        return [v if v.__class__ not in NESTED_TYPES else _decode_value(v, KeyPath(keypath, i))
+                for i, v in enumerate(value)]
+    return value
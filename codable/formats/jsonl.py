@@ -0,0 +1,76 @@
+""" JSON Lines: one encoded object per line.
+
+encode_many and decode_many stream records, so neither side holds more
+than one batch of lines in memory. Both reuse one json encoder/decoder and
+the per-class encode/decode plans for the whole run, and errors carry the
+line number of the record that failed.
+"""
+import io
+import json
+
+from codable.formats.json import JSONCodec, _is_binary_stream
+from codable.serialization import CodingError, DecodingError, EncodingError
+
+
+class JSONLinesCodec:
+    @staticmethod
+    def encode_many(objs, fp, batch_size: int = 1000, type_tags: str = 'name', columnar: bool = False,
+                    references: bool = False) -> int:
+        """ Write each Encodable in ``objs`` as one line of ``fp``.
+
+        Lines are collected and written ``batch_size`` at a time. Returns the
+        number of records written. The options are as for JSONCodec.encode.
+        """
+        dumps = json.JSONEncoder().encode
+        binary = _is_binary_stream(fp)
+        batch = []
+        count = 0
+        for count, obj in enumerate(objs, 1):
+            try:
+                batch.append(dumps(JSONCodec.encode_object(obj, type_tags, columnar, references)))
+            except CodingError as e:
+                raise EncodingError(e.message, e.keypath, lineno=count) from e
+            except (TypeError, ValueError) as e:
+                raise EncodingError(str(e), lineno=count) from e
+            if len(batch) >= batch_size:
+                _write_lines(fp, batch, binary)
+                batch = []
+        if batch:
+            _write_lines(fp, batch, binary)
+        return count
+
+    @staticmethod
+    def decode_many(fp, schema=None):
+        """ Yield the decoded object of every non-blank line of ``fp``.
+
+        ``schema``, if given, is the type of every record; see JSONCodec.decode.
+        """
+        loads = json.JSONDecoder().decode
+        for lineno, line in enumerate(fp, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            try:
+                data = loads(line)
+                yield JSONCodec.decode_object(data, schema)
+            except CodingError as e:
+                raise DecodingError(e.message, e.keypath, lineno=lineno) from e
+            except ValueError as e:
+                raise DecodingError(f"Invalid JSON: {e}", lineno=lineno) from e
+
+    @staticmethod
+    def encode(objs, type_tags: str = 'name', columnar: bool = False, references: bool = False) -> str:
+        out = io.StringIO()
+        JSONLinesCodec.encode_many(objs, out, type_tags=type_tags, columnar=columnar, references=references)
+        return out.getvalue()
+
+    @staticmethod
+    def decode(text: str, schema=None) -> list:
+        return list(JSONLinesCodec.decode_many(io.StringIO(text), schema))
+
+
+def _write_lines(fp, lines, binary):
+    text = '\n'.join(lines) + '\n'
+    fp.write(text.encode('ascii') if binary else text)
+
@@ -0,0 +1,505 @@
+""" Lazy decoding of large JSON documents.
+
+``decode_lazy(source)`` memory-maps a file (or takes bytes) and returns the
+top-level value without parsing the rest of the document. Objects and arrays
+are indexed only as far as they are read:
+
+* objects of classes using the stock AutoDecodable.decode become proxies,
+  instances of a subclass of the same name that decode a field the first
+  time it is read and then keep it as an ordinary attribute;
+* lists become LazyList and untagged dicts LazyDict, read-only sequences and
+  mappings that decode an item on first access and cache it;
+* everything else (scalars, classes with their own ``decode``, foreign types
+  and columnar lists) is decoded in one go when reached, exactly as
+  JSONCodec.decode would.
+
+Offsets of values and members are remembered, so the structure of each byte
+is scanned at most once, and the parts of the document that are never
+reached are neither scanned nor validated. Type tags are looked for where
+the codecs write them: ``__type__`` as the last (or first) member of an
+object and ``__columnar__`` as the first.
+
+Proxies keep the mapping alive; it is released once the last of them is
+gone. Comparing, hashing, encoding or pickling a proxy loads all its fields.
+"""
+import json
+import mmap
+import re
+import sys
+import types
+from array import array
+from collections.abc import Mapping, Sequence
+from json.scanner import make_scanner
+
+from codable.formats.json import _decode_value
+from codable.plans import _MISSING, NESTED_TYPES, generic_eq, public_items
+from codable.serialization import (
+    AutoDecodable,
+    AutoEncodable,
+    Decodable,
+    DecodingError,
+    Encodable,
+    KeyPath,
+    custom_type_registry,
+    has_default_decode,
+)
+
+_QUOTE, _LBRACE, _RBRACE, _LBRACKET, _RBRACKET = b'"{}[]'
+_WHITESPACE_BYTES = b' \t\n\r'
+_FOLLOWERS = frozenset(' \t\n\r,:]}')
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_SCALAR = re.compile(rb'[^ \t\n\r,:\]}]+')
+_KEY_END = re.compile(rb'[ \t\n\r]*:[ \t\n\r]*')
+_ITEM_END = re.compile(rb'[ \t\n\r]*(?:,[ \t\n\r]*|(\]))')
+_MEMBER_END = re.compile(rb'[ \t\n\r]*(?:,[ \t\n\r]*|(\}))')
+_TAG = rb'("[^"\\]*(?:\\.[^"\\]*)*"|-?[0-9]+)'
+_HEAD_TAG = re.compile(rb'\{[ \t\n\r]*"__type__"[ \t\n\r]*:[ \t\n\r]*' + _TAG)
+_HEAD_MARKUP = re.compile(rb'\{[ \t\n\r]*"(?:__columnar__|__literal__)"[ \t\n\r]*:')
+_TAIL_TAG = re.compile(rb'[{,][ \t\n\r]*"__type__"[ \t\n\r]*:[ \t\n\r]*' + _TAG + rb'[ \t\n\r]*\}\Z')
+
+# How far back from the end of an object its tag is looked for.
+_TAIL_WINDOW = 1024
+
+# Values are skipped by letting the C scanner of the json module parse them
+# in a window of the document decoded as Latin-1, which maps every byte to
+# one character so offsets carry over. Larger values are walked item by item.
+_WINDOW = 1 << 20
+_scan_once = make_scanner(json.JSONDecoder(strict=False))
+
+
+class _Document:
+    # The mapped bytes, the extents of the values looked at so far and the
+    # current scanning window.
+    __slots__ = ('buf', 'ends', 'window', 'window_start')
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.ends = {}
+        self.window = ''
+        self.window_start = 0
+
+    def byte(self, pos):
+        if pos >= len(self.buf):
+            raise DecodingError("Unexpected end of document")
+        return self.buf[pos]
+
+    def error(self, expected, pos, keypath=None):
+        return DecodingError(f"Expected {expected} at offset {pos}", keypath)
+
+    def skip_whitespace(self, pos):
+        return _WHITESPACE.match(self.buf, pos).end()
+
+    def string_end(self, pos):
+        match = _STRING.match(self.buf, pos)
+        if match is None:
+            raise self.error('a string', pos)
+        return match.end()
+
+    def end(self, start):
+        end = self.ends.get(start)
+        if end is None:
+            end = self.ends[start] = self.skip(start)
+        return end
+
+    def skip(self, pos):
+        """ Return the end of the value at ``pos`` without keeping it. """
+        end = self._scan(pos, False)
+        if end is None and pos != self.window_start:
+            # The value may run past the window; try again from its start.
+            end = self._scan(pos, True)
+        return end if end is not None else self._walk(pos)
+
+    def _scan(self, pos, move):
+        window = self.window
+        offset = pos - self.window_start
+        if move or not 0 <= offset < len(window):
+            window = self.window = str(self.buf[pos:pos + _WINDOW], 'latin-1')
+            self.window_start = pos
+            offset = 0
+        try:
+            end = _scan_once(window, offset)[1]
+        except (StopIteration, ValueError):
+            return None
+        if end < len(window):
+            # A number cut off by the window parses too, but is not followed
+            # by what may follow a value.
+            return self.window_start + end if window[end] in _FOLLOWERS else None
+        return self.window_start + end if self.window_start + end == len(self.buf) else None
+
+    def _walk(self, pos):
+        # Values larger than a window, or malformed ones, which raise here.
+        c = self.byte(pos)
+        if c == _LBRACKET:
+            for _ in self.items(pos):
+                pass
+            return self.ends[pos]
+        if c == _LBRACE:
+            for _ in self.members(pos):
+                pass
+            return self.ends[pos]
+        if c == _QUOTE:
+            return self.string_end(pos)
+        match = _SCALAR.match(self.buf, pos)
+        if match is None:
+            raise self.error('a value', pos)
+        return match.end()
+
+    def items(self, start, keypath=None):
+        """ Yield the offsets of the items of the array at ``start``. """
+        buf = self.buf
+        ends = self.ends
+        pos = self.skip_whitespace(start + 1)
+        if self.byte(pos) == _RBRACKET:
+            ends[start] = pos + 1
+            return
+        while True:
+            yield pos
+            end = ends.get(pos) or self.skip(pos)
+            match = _ITEM_END.match(buf, end)
+            if match is None:
+                raise self.error("',' or ']'", self.skip_whitespace(end), keypath)
+            pos = match.end()
+            if match.group(1):
+                ends[start] = pos
+                return
+
+    def members(self, start, keypath=None):
+        """ Yield ``(key, offset)`` for the members of the object at ``start``. """
+        buf = self.buf
+        ends = self.ends
+        pos = self.skip_whitespace(start + 1)
+        if self.byte(pos) == _RBRACE:
+            ends[start] = pos + 1
+            return
+        while True:
+            if self.byte(pos) != _QUOTE:
+                raise self.error('a key', pos, keypath)
+            end = self.string_end(pos)
+            raw = buf[pos + 1:end - 1]
+            key = str(raw, 'utf-8') if b'\\' not in raw else json.loads(buf[pos:end])
+            match = _KEY_END.match(buf, end)
+            if match is None:
+                raise self.error("':'", self.skip_whitespace(end), keypath)
+            pos = match.end()
+            yield key, pos
+            end = ends.get(pos) or self.skip(pos)
+            match = _MEMBER_END.match(buf, end)
+            if match is None:
+                raise self.error("',' or '}'", self.skip_whitespace(end), keypath)
+            pos = match.end()
+            if match.group(1):
+                ends[start] = pos
+                return
+
+    def parse(self, start, keypath):
+        try:
+            return json.loads(bytes(self.buf[start:self.end(start)]))
+        except ValueError as e:
+            raise DecodingError(f"Invalid JSON at offset {start}: {e}", keypath) from e
+
+    def value(self, start, keypath):
+        c = self.byte(start)
+        if c == _LBRACKET:
+            return LazyList(self, start, keypath)
+        if c == _LBRACE:
+            return self._object(start, keypath)
+        return self.parse(start, keypath)
+
+    def _object(self, start, keypath):
+        buf = self.buf
+        match = _HEAD_TAG.match(buf, start)
+        if match is None:
+            if _HEAD_MARKUP.match(buf, start):
+                return self.decode(start, keypath)
+            end = self.end(start)
+            match = _TAIL_TAG.search(buf, max(start, end - _TAIL_WINDOW), end)
+            if match is None:
+                return LazyDict(self, start, keypath)
+        entry = custom_type_registry.get_entry(json.loads(match.group(1)))
+        if entry is not None and issubclass(entry.cls, Decodable) and has_default_decode(entry.cls):
+            obj = object.__new__(proxy_class(entry.cls))
+            obj._lazy_members = _Members(self, start, keypath)
+            obj._lazy_keypath = keypath
+            return obj
+        return self.decode(start, keypath)
+
+    def decode(self, start, keypath):
+        value = self.parse(start, keypath)
+        return _decode_value(value, keypath) if value.__class__ in NESTED_TYPES else value
+
+
+class _Members:
+    # Member offsets of one object, scanned as far as they were asked for.
+    __slots__ = ('document', 'keypath', 'offsets', 'scanner')
+
+    def __init__(self, document, start, keypath):
+        self.document = document
+        self.keypath = keypath
+        self.offsets = {}
+        self.scanner = document.members(start, keypath)
+
+    def find(self, key):
+        offsets = self.offsets
+        scanner = self.scanner
+        while key not in offsets and scanner is not None:
+            for name, offset in scanner:
+                offsets[name] = offset
+                if name == key:
+                    break
+            else:
+                self.scanner = scanner = None
+        return offsets.get(key)
+
+    def all(self):
+        if self.scanner is not None:
+            self.offsets.update(self.scanner)
+            self.scanner = None
+        return self.offsets
+
+
+class LazyList(Sequence):
+    """ A read-only list whose items are decoded the first time they are read. """
+    __slots__ = ('_document', '_keypath', '_offsets', '_scanner', '_values')
+
+    def __init__(self, document, start, keypath=None):
+        self._document = document
+        self._keypath = keypath
+        # Offsets of a long list take 8 bytes each instead of an int object.
+        self._offsets = array('q')
+        self._scanner = document.items(start, keypath)
+        self._values = {}
+
+    def _index(self, count):
+        # Scan until ``count`` items are indexed or the list ends.
+        offsets = self._offsets
+        scanner = self._scanner
+        if scanner is not None and len(offsets) < count:
+            append = offsets.append
+            for offset in scanner:
+                append(offset)
+                if len(offsets) >= count:
+                    return
+            self._scanner = None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        try:
+            return self._values[index]
+        except KeyError:
+            pass
+        self._index(index + 1)
+        if not 0 <= index < len(self._offsets):
+            raise IndexError("list index out of range")
+        value = self._values[index] = self._document.value(self._offsets[index], KeyPath(self._keypath, index))
+        return value
+
+    def __len__(self):
+        self._index(sys.maxsize)
+        return len(self._offsets)
+
+    def __iter__(self):
+        index = 0
+        while True:
+            try:
+                yield self[index]
+            except IndexError:
+                return
+            index += 1
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, LazyList)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        more = '' if self._scanner is None else '+'
+        return f"<LazyList, {len(self._offsets)}{more} items indexed>"
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+class LazyDict(Mapping):
+    """ A read-only dict whose values are decoded the first time they are read. """
+    __slots__ = ('_members', '_values')
+
+    def __init__(self, document, start, keypath=None):
+        self._members = _Members(document, start, keypath)
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        members = self._members
+        offset = members.find(key)
+        if offset is None:
+            raise KeyError(key)
+        value = self._values[key] = members.document.value(offset, KeyPath(members.keypath, key))
+        return value
+
+    def __contains__(self, key):
+        return self._members.find(key) is not None
+
+    def __iter__(self):
+        return iter(list(self._members.all()))
+
+    def __len__(self):
+        return len(self._members.all())
+
+    def __repr__(self):
+        more = '' if self._members.scanner is None else '+'
+        return f"<LazyDict, {len(self._members.offsets)}{more} keys indexed>"
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def _load(obj, name, default):
+    members = obj._lazy_members
+    offset = members.find(name)
+    if offset is None:
+        return default
+    value = members.document.value(offset, KeyPath(obj._lazy_keypath, name))
+    object.__setattr__(obj, name, value)
+    return value
+
+
+def _load_all(obj):
+    for name in list(obj._lazy_members.all()):
+        if not name.startswith('_'):
+            getattr(obj, name)
+
+
+def _proxy_getattr(self, name):
+    # Only reached for attributes that are not set yet.
+    value = _MISSING if name.startswith('_') else _load(self, name, _MISSING)
+    if value is _MISSING:
+        raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
+    return value
+
+
+def _proxy_eq(self, other):
+    _load_all(self)
+    cls = self.__proxy_for__
+    if cls.__eq__ in (AutoEncodable.__eq__, AutoDecodable.__eq__):
+        return generic_eq(cls, self, other)
+    return cls.__eq__(self, other)
+
+
+def _proxy_hash(self):
+    _load_all(self)
+    return self.__proxy_for__.__hash__(self)
+
+
+def _proxy_encode(self, container):
+    _load_all(self)
+    self.__proxy_for__.encode(self, container)
+
+
+def _proxy_reduce(self, protocol):
+    _load_all(self)
+    return _rebuild, (self.__proxy_for__, public_items(self))
+
+
+def _rebuild(cls, items):
+    obj = cls.__new__(cls)
+    for name, value in items:
+        object.__setattr__(obj, name, value)
+    return obj
+
+
+class _LazyDefault:
+    # Class attributes double as field defaults, so they would shadow
+    # ``__getattr__``; look in the document before falling back to them.
+    __slots__ = ('name', 'default')
+
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self.default
+        return _load(obj, self.name, self.default)
+
+
+def _class_defaults(cls):
+    defaults = {}
+    for base in reversed(cls.__mro__):
+        for name, value in vars(base).items():
+            if name.startswith('_'):
+                continue
+            if hasattr(type(value), '__get__'):
+                defaults.pop(name, None)
+            else:
+                defaults[name] = value
+    return defaults
+
+
+_proxies = {}
+
+
+def proxy_class(cls):
+    """ The proxy class standing in for ``cls``: a subclass with the same
+    name and type tag whose fields are loaded from the document on first
+    access. Proxies are never registered. """
+    proxy = _proxies.get(cls)
+    if proxy is None:
+        namespace = {
+            '__module__': cls.__module__,
+            '__qualname__': cls.__qualname__,
+            '__doc__': cls.__doc__,
+            '__slots__': ('_lazy_members', '_lazy_keypath'),
+            '__proxy_for__': cls,
+            '__getattr__': _proxy_getattr,
+            '__eq__': _proxy_eq,
+            '__hash__': _proxy_hash if cls.__hash__ is not None else None,
+            '__reduce_ex__': _proxy_reduce,
+        }
+        if issubclass(cls, Encodable):
+            namespace['encode'] = _proxy_encode
+        if cls.__dictoffset__:
+            namespace.update((name, _LazyDefault(name, default)) for name, default in _class_defaults(cls).items())
+        proxy = _proxies[cls] = types.new_class(cls.__name__, (cls,), exec_body=lambda ns: ns.update(namespace))
+    return proxy
+
+
+def _map(fileno):
+    try:
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except ValueError as e:
+        # Empty files cannot be mapped.
+        raise DecodingError(f"Cannot map document: {e}") from e
+
+
+def decode_lazy(source):
+    """ Lazily decode a JSON document from a path, a file object backed by a
+    real file, or a bytes-like object. """
+    if isinstance(source, (bytes, bytearray)):
+        buf = source
+    elif isinstance(source, memoryview):
+        buf = source.tobytes()
+    elif hasattr(source, 'fileno'):
+        buf = _map(source.fileno())
+    else:
+        with open(source, 'rb') as fp:
+            buf = _map(fp.fileno())
+    document = _Document(buf)
+    start = document.skip_whitespace(0)
+    end = len(buf)
+    while end > start and buf[end - 1] in _WHITESPACE_BYTES:
+        end -= 1
+    if start == end:
+        raise DecodingError("Empty document")
+    # The top-level value runs to the end of the data; this is not checked.
+    document.ends[start] = end
+    return document.value(start, None)
@@ -0,0 +1,144 @@
+""" Decoding only the selected parts of a document.
+
+    JSONCodec.decode(text, select=['customer.name', 'orders[*].total'])
+
+decodes the values at the given key paths, and the objects along the way
+to them, as a plain decode would. Everything else is left as the json
+module parsed it: a field that is not selected holds its raw JSON value,
+``__type__`` tags and all, and nothing inside it is decoded. Objects on a
+selected path are built by their own decoders, which see the raw values of
+the fields that are not selected.
+
+A key path is a list of keys and list indexes, or a string in the form of
+error messages, such as ``'orders[0].customer.name'``. ``'*'`` (``[*]`` in
+a string) stands for every key or index at its level. A path that ends at
+a value selects all of it; the empty path selects the whole document.
+
+References resolve only to objects that have been decoded, that is to
+objects on a selected path, and, as with ``iterative``, not to an object
+that encloses them.
+"""
+import re
+
+from codable.columnar import COLUMNAR_KEY, expand_columnar
+from codable.formats.iterative import _builders
+from codable.formats.json import _decode_value
+from codable.literal import LITERAL_KEY, literal_dict
+from codable.plans import NESTED_TYPES
+from codable.references import REF_KEY, resolve_reference
+from codable.serialization import DecodingError, KeyPath
+
+WILDCARD = '*'
+
+# A selection is a tree of dicts keyed by the keys and indexes on the
+# selected paths; ALL stands for a value selected as a whole.
+ALL = True
+
+_token = re.compile(r'\[([0-9]+|\*)\]|(\.?)([^.\[\]]+)').match
+
+
+def parse_keypath(keypath):
+    """ The keys of ``keypath``: a KeyPath, a list of keys, or a string. """
+    if isinstance(keypath, KeyPath):
+        return keypath.to_list()
+    if not isinstance(keypath, str):
+        return list(keypath)
+    keys = []
+    pos = 0
+    while pos < len(keypath):
+        match = _token(keypath, pos)
+        # Keys after the first are preceded by a dot.
+        if match is None or match.group(2) == ('' if pos else '.'):
+            raise ValueError(f"Malformed key path {keypath!r} at position {pos}")
+        index, _, key = match.groups()
+        if key is not None:
+            keys.append(key)
+        else:
+            keys.append(index if index == WILDCARD else int(index))
+        pos = match.end()
+    return keys
+
+
+def selection(keypaths):
+    """ The selection tree for an iterable of key paths. """
+    if isinstance(keypaths, (str, KeyPath)):
+        raise TypeError("select takes a list of key paths")
+    tree = {}
+    for keypath in keypaths:
+        keys = parse_keypath(keypath)
+        if not keys:
+            return ALL
+        node = tree
+        for key in keys[:-1]:
+            child = node.get(key)
+            if child is ALL:
+                break
+            if child is None:
+                child = node[key] = {}
+            node = child
+        else:
+            node[keys[-1]] = ALL
+    return tree
+
+
+def _merge(a, b):
+    if a is ALL or b is ALL:
+        return ALL
+    merged = dict(a)
+    for key, child in b.items():
+        merged[key] = child if key not in merged else _merge(merged[key], child)
+    return merged
+
+
+def _child(node, key):
+    # What ``node`` selects of the item at ``key``; None if nothing.
+    exact = node.get(key)
+    wild = node.get(WILDCARD)
+    if exact is None or wild is None:
+        return wild if exact is None else exact
+    return _merge(exact, wild)
+
+
+def _select(value, keypath, node):
+    # ``value`` at ``keypath`` with the parts ``node`` selects decoded.
+    if value.__class__ not in NESTED_TYPES:
+        # Selected as a whole, or a path running past a scalar.
+        return value
+    if node is ALL:
+        return _decode_value(value, keypath)
+    if value.__class__ is list:
+        items = list(value)
+        for index, item in enumerate(value):
+            child = _child(node, index)
+            if child is not None:
+                items[index] = _select(item, KeyPath(keypath, index), child)
+        return items
+    tag = value.get('__type__')
+    build = None
+    if tag is not None:
+        build = _builders[tag]
+        if build is None:
+            return value
+    elif COLUMNAR_KEY in value:
+        return _select(expand_columnar(value, keypath), keypath, node)
+    elif REF_KEY in value:
+        return resolve_reference(value, keypath)
+    elif LITERAL_KEY in value:
+        value = literal_dict(value, keypath)
+    data = dict(value)
+    for key, item in value.items():
+        child = _child(node, key)
+        if child is not None:
+            data[key] = _select(item, KeyPath(keypath, key), child)
+    return data if build is None else build(data, keypath)
+
+
+def decode_selected(data, select):
+    """ _decode_document, decoding only what ``select`` selects. """
+    tree = selection(select)
+    if isinstance(data, dict):
+        if "__type__" in data and _builders[data["__type__"]] is None:
+            raise DecodingError("JSON string does not contain a valid Decodable type")
+    elif not isinstance(data, list):
+        raise DecodingError("JSON string does not contain a valid Decodable type")
+    return _select(data, None, tree)
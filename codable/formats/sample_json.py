@@ -1,59 +1,273 @@
+""" JSONFooCodec: writes JSON text directly, without json.dumps.
+
+Objects encode into a container that writes each field as text the moment
+it is encoded, so no intermediate dicts are built; AutoEncodable classes
+skip the container and use a writer compiled per attribute layout. Fragments
+go to one list that is joined once, or handed to a stream in chunks by
+``dump``. Lists whose items are all str, int, float, bool or None are
+written with a single join. The text is what JSONCodec.encode returns for the same
+options: the same separators, ASCII escapes, ``NaN`` and ``Infinity`` for
+non-finite floats. A key encoded twice into one container is written twice.
+"""
 import json
-from codable.formats.json import JSONKeyedEncodingContainer, JSONSingleValueEncodingContainer, JSONUnkeyedEncodingContainer
-from codable.serialization import SingleValueEncodingContainer, custom_type_registry, Encodable, Decodable, KeyedDecodingContainer, KeyedEncodingContainer, UnkeyedEncodingContainer, UnkeyedDecodingContainer
+from functools import partial
+from json.encoder import encode_basestring_ascii
+
+from codable.formats.json import (
+    STREAM_FLUSH_FRAGMENTS,
+    JSONKeyedDecodingContainer,
+    _JSONContainer,
+    _is_binary_stream,
+    _run_encoder,
+    _resolve_scalar_text,
+    _stream_key,
+)
+from codable.literal import LITERAL_KEY, needs_literal
+from codable.plans import MAX_PLANS, _compile, public_fields, slot_fields
+from codable.serialization import (
+    Decodable,
+    DispatchTable,
+    Encodable,
+    EncodeContext,
+    EncodingError,
+    KeyedEncodingContainer,
+    KeyPath,
+    RegistryEntry,
+    custom_type_registry,
+    encode_kind,
+    has_default_encode,
+)
+
+
+class _Buffer(list):
+    # The fragments written so far. ``closings`` ends the objects of each
+    # class for the chosen type tags; ``write``, if set, takes the
+    # fragments in chunks.
+    __slots__ = ('closings', 'write')
+
+    def __init__(self, closings, write=None):
+        super().__init__()
+        self.closings = closings
+        self.write = write
+
+    def flush(self):
+        self.write(''.join(self))
+        self.clear()
+
+
+# Text of the keys seen so far, with the separator after them. Field names
+# repeat endlessly; the bound keeps keys of large dicts from piling up.
+_key_texts = {}
+_MAX_KEY_TEXTS = 4096
+
+
+def _key_text(key, keypath):
+    text = _key_texts.get(key)
+    if text is None:
+        text = _stream_key(key, keypath) + ': '
+        if key.__class__ is str and len(_key_texts) < _MAX_KEY_TEXTS:
+            _key_texts[key] = text
+    return text
+
+
+class JSONTextKeyedEncodingContainer(_JSONContainer, KeyedEncodingContainer):
+    """ Writes every field to the buffer as soon as it is encoded. """
+    __slots__ = ('_out', '_keypath', '_separator')
+
+    def __init__(self, out, keypath=None):
+        # ``keypath`` is a KeyPath node (or None at the root); the writers
+        # below always have one at hand.
+        self._out = out
+        self._keypath = keypath
+        self._separator = '{'
+
+    def encode(self, key, value):
+        out = self._out
+        text = _key_texts.get(key) or _key_text(key, self._keypath)
+        scalar = _texts[value.__class__]
+        if scalar is not None:
+            out.append(self._separator + text + scalar(value))
+        else:
+            out.append(self._separator + text)
+            _writers[value.__class__](value, KeyPath(self._keypath, key), out)
+        self._separator = ', '
+
+    @property
+    def empty(self):
+        return self._separator == '{'
+
+
+def _resolve_text(cls):
+    # Text of a scalar value; None for everything else.
+    return _resolve_scalar_text(cls) if encode_kind(cls) == 'scalar' else None
+
+
+_texts = DispatchTable(_resolve_text)
+
+
+def _closing(tags, cls):
+    # How an object of ``cls`` ends: (with no fields, after some fields).
+    tag = tags[cls]
+    if tag is None:
+        return '{}', '}'
+    text = '"__type__": ' + _texts[tag.__class__](tag) + '}'
+    return '{' + text, ', ' + text
+
+
+_closings = {}
+
+
+def _closings_for(type_tags):
+    table = _closings.get(type_tags)
+    if table is None:
+        table = _closings[type_tags] = DispatchTable(partial(_closing, EncodeContext(type_tags).tags))
+    return table
+
+
+def _write_object(value, keypath, out, entry=None):
+    container = JSONTextKeyedEncodingContainer(out, keypath)
+    _run_encoder(value, container, entry)
+    out.append(out.closings[value.__class__ if entry is None else entry.cls][not container.empty])
+    if out.write is not None and len(out) >= STREAM_FLUSH_FRAGMENTS:
+        out.flush()
+
+
+# Writers for AutoEncodable classes, compiled per class and attribute
+# layout like their encoders in codable.plans. They write the fields
+# straight to the buffer, without a container.
+_text_plans = {}
+
+
+def _compile_text_plan(cls, layout):
+    fields = public_fields(layout)
+    lines = ['def write(obj, keypath, out):', '    d = obj.__dict__']
+    separator = '{'
+    for field in fields:
+        prefix = separator + _key_text(field, None)
+        lines += [
+            f'    v = d[{field!r}]',
+            '    text = texts[v.__class__]',
+            '    if text is not None:',
+            f'        out.append({prefix!r} + text(v))',
+            '    else:',
+            f'        out.append({prefix!r})',
+            f'        writers[v.__class__](v, KeyPath(keypath, {field!r}), out)',
+        ]
+        separator = ', '
+    lines.append(f'    out.append(out.closings[obj.__class__][{bool(fields)}])')
+    return _compile('write', lines, {'texts': _texts, 'writers': _writers, 'KeyPath': KeyPath})
+
+
+def _write_auto(value, keypath, out):
+    key = (value.__class__, tuple(value.__dict__))
+    plan = _text_plans.get(key)
+    if plan is None:
+        if len(_text_plans) >= MAX_PLANS:
+            return _write_object(value, keypath, out)
+        plan = _text_plans[key] = _compile_text_plan(*key)
+    plan(value, keypath, out)
+    if out.write is not None and len(out) >= STREAM_FLUSH_FRAGMENTS:
+        out.flush()
+
+
+def _write_dict(value, keypath, out):
+    literal = needs_literal(value)
+    if literal:
+        out.append('{' + _key_text(LITERAL_KEY, keypath))
+    container = JSONTextKeyedEncodingContainer(out, keypath)
+    for k, v in value.items():
+        container.encode(k, v)
+    out.append('{}' if container.empty else '}')
+    if literal:
+        out.append('}')
+
+
+def _join_floats(values):
+    text = ', '.join(map(float.__repr__, values))
+    # 'nan' and 'inf' are the only reprs with an n; JSON wants NaN and Infinity.
+    return text if 'n' not in text else None
+
+
+# Joins for lists whose items all have exactly this type. They return None
+# when the list has to be written item by item after all.
+_joins = {
+    str: lambda values: ', '.join(map(encode_basestring_ascii, values)),
+    int: lambda values: ', '.join(map(int.__repr__, values)),
+    float: _join_floats,
+    bool: lambda values: ', '.join(['true' if v else 'false' for v in values]),
+    type(None): lambda values: ', '.join(['null'] * len(values)),
+}
+
+
+def _write_list(values, keypath, out):
+    if not values:
+        out.append('[]')
+        return
+    types = set(map(type, values))
+    if len(types) == 1:
+        join = _joins.get(types.pop())
+        text = join(values) if join is not None else None
+        if text is not None:
+            out.append('[' + text + ']')
+            return
+    texts = _texts
+    separator = '['
+    for index, value in enumerate(values):
+        scalar = texts[value.__class__]
+        if scalar is not None:
+            out.append(separator + scalar(value))
+        else:
+            out.append(separator)
+            _writers[value.__class__](value, KeyPath(keypath, index), out)
+        separator = ', '
+    out.append(']')
+
+
+def _write_unsupported(value, keypath, out):
+    raise EncodingError(f"Object of type {value.__class__.__name__} is not JSON serializable", keypath)
+
+
+def _resolve_writer(cls):
+    # Only reached for values that are not scalars.
+    kind = encode_kind(cls)
+    if kind.__class__ is RegistryEntry:
+        return lambda value, keypath, out: _write_object(value, keypath, out, kind)
+    if kind == 'object' and has_default_encode(cls) and cls.__dictoffset__ and not slot_fields(cls):
+        return _write_auto
+    return {
+        'object': _write_object,
+        'dict': _write_dict,
+        'list': _write_list,
+        None: _write_unsupported,
+    }[kind]
+
+
+_writers = DispatchTable(_resolve_writer)
+
 
 class JSONFooCodec:
     @staticmethod
-    def encode(obj: Encodable) -> str:
-        if isinstance(obj, Encodable):
-            container = JSONKeyedEncodingContainer()
-            obj.encode(container)
-            container.encode("__type__", obj.__class__.__name__)
-            def serialize_dict(container):
-                output = "{"
-                index = 0
-                for key, value in container.data.items():
-                    if index > 0:
-                        output += ', '
-                    output += f'"{key}": '
-                    if isinstance(value, JSONKeyedEncodingContainer):
-                            output += serialize_dict(value)
-                    elif isinstance(value, JSONUnkeyedEncodingContainer):
-                        output += serialize_list(value)
-                    elif isinstance(value, JSONSingleValueEncodingContainer):
-                        output += f'{serialize_single_value(value.value)}'
-                    else:
-                        raise Exception(f"type {type(value)} should not get here.")
-                    index += 1
-                return output + "}"
-            
-            def serialize_single_value(value):
-                if type(value) == str:
-                    return f'"{value}"'
-                return str(value)
-
-            def serialize_list(container):
-                output = "["
-                for index, value in enumerate(container.data):
-                    if isinstance(value, KeyedEncodingContainer):
-                            output += "{"
-                            output += serialize_dict(value)
-                            output += "}"                       
-                    elif isinstance(value, UnkeyedEncodingContainer):
-                        output += '['
-                        output += serialize_list(value)
-                        output += ']'
-                    elif isinstance(value, SingleValueEncodingContainer):
-                        if index > 0:
-                            output += ', '
-                        output += f'{serialize_single_value(value.value)}'
-                    else:
-                        raise Exception(f"type {type(value)} should not get here.")
-                return output + "]"
-
-            encoded_data = serialize_dict(container)
-            return encoded_data
-        raise TypeError(f"Object of type {obj.__class__.__name__} is not Encodable")
+    def encode(obj: Encodable, type_tags: str = 'name') -> str:
+        """ Encode ``obj`` as a JSON string, as JSONCodec.encode would. """
+        out = _Buffer(_closings_for(type_tags))
+        JSONFooCodec._write(obj, out)
+        return ''.join(out)
+
+    @staticmethod
+    def dump(obj: Encodable, fp, type_tags: str = 'name'):
+        """ Write ``obj`` to a text or binary file object in chunks. """
+        write = fp.write
+        if _is_binary_stream(fp):
+            write = lambda text: fp.write(text.encode('ascii'))
+        out = _Buffer(_closings_for(type_tags), write)
+        JSONFooCodec._write(obj, out)
+        out.flush()
+
+    @staticmethod
+    def _write(obj, out):
+        if not isinstance(obj, Encodable):
+            raise TypeError(f"Object of type {obj.__class__.__name__} is not Encodable")
+        _writers[obj.__class__](obj, None, out)
 
     @staticmethod
     def decode(json_str: str) -> Decodable:
@@ -64,7 +278,7 @@ class JSONFooCodec:
                 cls_name = data["__type__"]  # Get the class name from the __type__ field
                 cls = custom_type_registry.get_class(cls_name)  # Retrieve the class from the registry
                 if cls and issubclass(cls, Decodable):  # Check if the class is a subclass of Decodable
-                    container = KeyedDecodingContainer(data)  # Create a decoding container
+                    container = JSONKeyedDecodingContainer(data)  # Create a decoding container
                     return cls.decode(container)  # Decode the object using the class's decode method
                 else:
                     raise TypeError("JSON string does not contain a valid Decodable type")  # Raise error if not decodable
@@ -87,4 +301,4 @@ class JSONFooCodec:
         elif isinstance(data, list):
             return decode_list(data)
         else:
-            raise TypeError("JSON string does not contain a valid Decodable type")
\ No newline at end of file
+            raise TypeError("JSON string does not contain a valid Decodable type")
@@ -0,0 +1,30 @@
+""" Plain dicts whose keys would otherwise be read as markup.
+
+Decoders read a dict with a ``__columnar__`` key as a columnar list and one
+with a ``__ref__`` key as a back-reference. A dict of user data that has
+such a key is written wrapped instead::
+
+    {"__literal__": {"__columnar__": 1, "note": "not a list"}}
+
+and decodes back to a plain dict whose keys are taken as they are and whose
+values are decoded as usual. Dicts with a ``__literal__`` key are wrapped
+too, so every dict round-trips. The wrapper adds no level to key paths.
+"""
+from codable.columnar import COLUMNAR_KEY
+from codable.references import REF_KEY
+
+LITERAL_KEY = '__literal__'
+
+
+def needs_literal(value):
+    """ Whether the mapping ``value`` has to be written wrapped. """
+    return COLUMNAR_KEY in value or REF_KEY in value or LITERAL_KEY in value
+
+
+def literal_dict(value, keypath=None):
+    """ The dict a ``{"__literal__": {...}}`` wrapper holds, after checking its shape. """
+    from codable.serialization import DecodingError
+    inner = value[LITERAL_KEY]
+    if len(value) != 1 or inner.__class__ is not dict:
+        raise DecodingError("Malformed literal dict", keypath)
+    return inner
@@ -0,0 +1,171 @@
+""" LRU memo of the encoded form of frozen objects.
+
+A class that sets ``__frozen__ = True``, or is made with one of the
+decorators and ``frozen=True``, promises that its instances do not change
+once built. The JSON encoders then keep the encoded form of its instances
+in a bounded memo, evicting the least recently used first, and reuse it
+for every equal object instead of walking that object again.
+
+The memo is keyed on the encode options and a fingerprint of the object:
+its class and attributes, down through nested lists, dicts and objects,
+with the type of every value. Equal therefore means equal and of the same
+types throughout, so a field holding 1, one holding 1.0 and one holding
+True each get their own form, as do 0.0 and -0.0. Values compared by
+identity stand for themselves and Encodable instances for their class and
+attributes. Objects holding any other kind of value, such as a datetime,
+an OrderedDict or an instance of a str subclass, are not memoized and are
+encoded as usual.
+
+An object is fingerprinted the first time it is looked up; the memo then
+remembers that instance along with its form, so encoding the same
+instance again costs a dict lookup rather than a walk over it.
+
+Each form is kept as plain data and as JSON text. The streaming encoder
+writes the text out as it is. JSONCodec.encode, which only serialises the
+document it builds, puts the plain form into it as it is, while
+JSONCodec.encode_object, whose document goes to the caller, gets a copy
+of its dicts and lists; a kept form is never handed out to be modified.
+
+The memo pays off for instances encoded more than once, which take a dict
+lookup, and for large objects. An instance seen for the first time is
+walked to fingerprint it, which for a small object costs about what
+encoding it would.
+
+The memo is skipped with ``references=True``, which tracks objects by
+identity, and by the binary format, whose output depends on the symbol
+table of each document.
+"""
+from collections import OrderedDict
+from typing import NamedTuple
+
+from codable.plans import slot_names
+from codable.serialization import Encodable
+
+MEMO_SIZE = 4096
+
+# Values that compare equal only to values of the same type and content.
+_EXACT_TYPES = frozenset((str, int, bool, type(None), bytes))
+
+# Encodable subclasses of these compare, and may encode, by their contents,
+# which the attributes of the instance do not show.
+_CONTENT_TYPES = (str, bytes, int, float, complex, list, tuple, dict, set, frozenset)
+
+
+def fingerprint(value):
+    """ A hashable key for ``value`` that is equal for two values only if
+    they have the same types and contents throughout. Raises TypeError for
+    values it cannot vouch for. """
+    cls = value.__class__
+    if cls in _EXACT_TYPES:
+        return cls, value
+    fields = _fields.get(cls, False)
+    if fields is False:
+        fields = _fields[cls] = _object_fields(cls)
+    if fields is _DICT_ONLY:
+        # Exact values are fingerprinted in line, the hot case.
+        return cls, tuple([(k, v.__class__, v) if v.__class__ in _EXACT_TYPES else (k, fingerprint(v))
+                           for k, v in value.__dict__.items()])
+    if fields is not None:
+        return cls, tuple([(k, fingerprint(v)) for k, v in _state(value, fields)])
+    if cls is float:
+        # Tells 0.0 from -0.0; every NaN is written alike.
+        return cls, value.hex()
+    if cls is list or cls is tuple:
+        return cls, tuple(map(fingerprint, value))
+    if cls is dict:
+        return cls, tuple((fingerprint(k), fingerprint(v)) for k, v in value.items())
+    if cls.__eq__ is object.__eq__:
+        return cls, value
+    raise TypeError(f"cannot fingerprint {cls.__name__} values")
+
+
+# Stands for the slot names of classes whose instances only have a __dict__.
+_DICT_ONLY = ('__dict__',)
+
+
+# _object_fields of each class seen so far.
+_fields = {}
+
+
+def _object_fields(cls):
+    # The slot names of Encodable classes fingerprinted by their attributes,
+    # _DICT_ONLY for those without slots, or None for other classes.
+    if not issubclass(cls, Encodable) or issubclass(cls, _CONTENT_TYPES) or cls.__eq__ is object.__eq__:
+        return None
+    names = slot_names(cls)
+    if not names and not cls.__dictoffset__:
+        return None
+    return names or _DICT_ONLY
+
+
+def _state(value, names):
+    items = [(name, getattr(value, name)) for name in names if hasattr(value, name)]
+    d = getattr(value, '__dict__', None)
+    if d:
+        items += d.items()
+    return items
+
+
+class MemoInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class EncodeMemo:
+    """ A bounded LRU memo in front of ``encode(cls, type_tags, columnar, obj)``,
+    which returns what is kept for ``obj``. """
+
+    def __init__(self, encode, maxsize=MEMO_SIZE):
+        self._encode = encode
+        self.resize(maxsize)
+
+    def resize(self, maxsize):
+        """ Keep at most ``maxsize`` forms (None for no bound, 0 to disable);
+        drops the forms kept so far. """
+        self.maxsize = maxsize
+        self.clear()
+
+    def lookup(self, cls, type_tags, columnar, obj):
+        """ What ``encode`` returned for ``obj``, now or earlier for an object
+        with the same fingerprint; TypeError if ``obj`` cannot be fingerprinted. """
+        # Instances looked up lately are remembered with what they got; the
+        # reference to each keeps its id() from being reused meanwhile.
+        ident = (id(obj), type_tags, columnar)
+        recent = self._recent.get(ident)
+        if recent is not None and recent[0] is obj:
+            self.hits += 1
+            return recent[1]
+        key = (type_tags, columnar, fingerprint(obj))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                # Evicted by another thread meanwhile.
+                pass
+        else:
+            self.misses += 1
+            entry = self._encode(cls, type_tags, columnar, obj)
+            self._keep(self._entries, key, entry)
+        self._keep(self._recent, ident, (obj, entry))
+        return entry
+
+    def _keep(self, table, key, value):
+        if self.maxsize == 0:
+            return
+        table[key] = value
+        if self.maxsize is not None and len(table) > self.maxsize:
+            table.popitem(last=False)
+
+    def info(self):
+        """ Hits, misses, maxsize and current size, as functools.lru_cache reports them. """
+        return MemoInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """ Drop the kept forms and reset the statistics. """
+        self._entries = OrderedDict()
+        self._recent = OrderedDict()
+        self.hits = self.misses = 0
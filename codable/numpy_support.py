@@ -0,0 +1,47 @@
+""" numpy.ndarray support.
+
+Arrays encode as a tagged object holding the dtype descriptor, the shape and
+the raw buffer in C order::
+
+    {"dtype": "<f8", "shape": [2, 3], "data": {"base64": "...", "__type__": "memoryview"},
+     "__type__": "ndarray"}
+
+The binary format writes the buffer as raw bytes, JSON as base64, so no
+element is ever turned into a Python object. Decoding rebuilds the array
+with ``numpy.frombuffer`` over the decoded buffer; the result shares that
+buffer and is read-only, so call ``.copy()`` to modify it.
+
+This module is imported through ``custom_type_registry.register_lazy`` the
+first time an array is encoded or an ``ndarray`` tag is decoded, so numpy is
+never imported by codable itself.
+"""
+import numpy as np
+from numpy.lib.format import descr_to_dtype, dtype_to_descr
+
+from codable.serialization import custom_type_registry
+
+
+def encode_ndarray(array, container):
+    if array.dtype.hasobject:
+        raise TypeError("arrays of Python objects have no raw buffer")
+    if not array.flags.c_contiguous:
+        array = array.copy(order='C')
+    container.encode('dtype', dtype_to_descr(array.dtype))
+    container.encode('shape', list(array.shape))
+    container.encode('data', memoryview(array.reshape(-1).view(np.uint8)))
+
+
+def decode_ndarray(container):
+    dtype = descr_to_dtype(_descr(container.decode('dtype')))
+    shape = tuple(container.decode('shape'))
+    return np.frombuffer(container.decode('data'), dtype=dtype).reshape(shape)
+
+
+def _descr(descr):
+    # Structured dtypes come back from JSON as lists where numpy wants tuples.
+    if isinstance(descr, str):
+        return descr
+    return [(field[0], _descr(field[1]), *map(tuple, field[2:])) for field in descr]
+
+
+custom_type_registry.register(np.ndarray, encode_ndarray, decode_ndarray)
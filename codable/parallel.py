@@ -0,0 +1,85 @@
+""" Process-pool helpers for encoding and decoding large batches.
+
+Work is split into chunks and mapped over a ProcessPoolExecutor. Each worker
+starts by registering every picklable entry of the parent's
+``custom_type_registry``, so classes and custom encoders registered at
+runtime are known in the worker too, whatever the start method. Results come
+back in input order. Batches smaller than ``PARALLEL_THRESHOLD`` are
+processed in the calling process, where the pool start-up would dominate.
+"""
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from codable.serialization import custom_type_registry
+
+PARALLEL_THRESHOLD = 256
+
+# Chunks handed out per worker; more than one keeps workers busy when some
+# chunks are slower than others.
+CHUNKS_PER_WORKER = 4
+
+
+def registry_snapshot(registry=custom_type_registry):
+    """ Return the registry entries that can be sent to another process. """
+    entries = []
+    for entry in registry:
+        try:
+            pickle.dumps(entry)
+        except Exception:
+            # Classes defined inside functions and lambdas cannot be
+            # pickled; workers only know them if an import registers them.
+            continue
+        entries.append(entry)
+    return entries
+
+
+def _init_worker(entries):
+    for entry in entries:
+        custom_type_registry.register(entry.cls, entry.encoder, entry.decoder, entry.type_id)
+
+
+def make_pool(workers=None) -> ProcessPoolExecutor:
+    """ Create a pool whose workers share the current type registry.
+
+    Reusing one pool across calls avoids paying the start-up per batch.
+    """
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(registry_snapshot(),))
+
+
+def _run_chunk(fn, items):
+    return [fn(item) for item in items]
+
+
+def map_batch(fn, items, workers=None, executor=None, chunksize=None, threshold=None):
+    """ Return ``[fn(item) for item in items]``, computed in worker processes.
+
+    ``fn`` must be picklable (a module-level function or staticmethod).
+    Pass ``executor`` to reuse a pool from ``make_pool``; otherwise a pool of
+    ``workers`` processes (default: CPU count) is created for this call.
+    """
+    items = list(items)
+    if threshold is None:
+        threshold = PARALLEL_THRESHOLD
+    if executor is None:
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(items) < threshold:
+            return [fn(item) for item in items]
+    elif len(items) < threshold:
+        return [fn(item) for item in items]
+    if chunksize is None:
+        pool_size = workers or getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+        chunksize = max(1, -(-len(items) // (pool_size * CHUNKS_PER_WORKER)))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    results = []
+    run = partial(_run_chunk, fn)
+    if executor is not None:
+        for part in executor.map(run, chunks):
+            results.extend(part)
+        return results
+    with make_pool(workers) as pool:
+        for part in pool.map(run, chunks):
+            results.extend(part)
+    return results
@@ -0,0 +1,431 @@
+""" Compiled per-class plans for the Auto codables.
+
+AutoEncodable instances of one class almost always share the same attribute
+layout, so instead of scanning and filtering ``__dict__`` for every instance
+we generate a small function per (class, layout) the first time it is seen
+and reuse it afterwards. Decoding works the same way, keyed on the layout of
+the incoming data, and so do ``__eq__`` and ``__hash__`` of the Auto
+classes. Plans are keyed on the class object itself, so redefining a class,
+or giving its instances a new attribute layout, builds a new plan.
+Classes with ``__slots__`` (their own or inherited) are supported; their
+slots are part of the plan and only the ``__dict__``, if any, is keyed on.
+"""
+import weakref
+from functools import lru_cache, partial
+from keyword import iskeyword
+from operator import itemgetter
+
+from codable.references import ID_KEY, register_object
+
+# Upper bound on the number of compiled plans. Once reached, unseen layouts
+# use the generic path instead of compiling more code.
+MAX_PLANS = 4096
+
+_encode_plans = {}
+
+# Values of these types may hold tagged objects and have to be decoded; every
+# other value is stored as is.
+NESTED_TYPES = frozenset((dict, list))
+
+
+def _compile(name, lines, namespace=None):
+    namespace = dict(namespace or {})
+    exec('\n'.join(lines), namespace)
+    return namespace[name]
+
+
+def public_fields(layout):
+    return tuple(k for k in layout if not k.startswith('_'))
+
+
+@lru_cache(maxsize=None)
+def slot_names(cls):
+    """ Slot names of ``cls`` and its bases, base classes first. """
+    names = []
+    for base in reversed(cls.__mro__):
+        slots = base.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name not in names and name not in ('__dict__', '__weakref__'):
+                names.append(name)
+    return tuple(names)
+
+
+@lru_cache(maxsize=None)
+def slot_fields(cls):
+    """ Public slot names of ``cls`` and its bases, base classes first. """
+    return public_fields(slot_names(cls))
+
+
+_MISSING = object()
+
+
+def public_items(obj):
+    """ The public ``(name, value)`` pairs of ``obj``: set slots first, then
+    its ``__dict__``. """
+    items = []
+    for name in slot_fields(obj.__class__):
+        value = getattr(obj, name, _MISSING)
+        if value is not _MISSING:
+            items.append((name, value))
+    d = getattr(obj, '__dict__', None)
+    if d:
+        items += [(k, v) for k, v in d.items() if not k.startswith('_')]
+    return items
+
+
+def generic_encode(obj, container):
+    for k, v in public_items(obj):
+        container.encode(k, v)
+
+
+def compile_encode_plan(cls, layout):
+    """ Generate an encoder for instances of ``cls`` whose ``__dict__`` has
+    the given layout. Slots are read first and skipped while unset. """
+    lines = ['def encode(obj, container):']
+    fields = public_fields(layout)
+    slots = slot_fields(cls)
+    if fields or slots:
+        lines.append('    encode = container.encode')
+    for i, slot in enumerate(slots):
+        lines += [
+            '    try:',
+            f'        v{i} = obj.{slot}' if not iskeyword(slot) else f'        v{i} = getattr(obj, {slot!r})',
+            '    except AttributeError:',
+            '        pass',
+            '    else:',
+            f'        encode({slot!r}, v{i})',
+        ]
+    if fields:
+        lines.append('    d = obj.__dict__')
+        for field in fields:
+            lines.append(f'    encode({field!r}, d[{field!r}])')
+    if not fields and not slots:
+        lines.append('    pass')
+    return _compile('encode', lines)
+
+
+def encode_plan(obj):
+    """ Return the compiled encoder for ``obj``'s class and attribute layout. """
+    try:
+        key = (obj.__class__, tuple(obj.__dict__))
+    except AttributeError:
+        key = (obj.__class__, ())
+    plan = _encode_plans.get(key)
+    if plan is None:
+        if len(_encode_plans) >= MAX_PLANS:
+            return generic_encode
+        plan = _encode_plans[key] = compile_encode_plan(*key)
+    return plan
+
+
+def _compile_decode(cls, layout, params, nested):
+    """ Generate a decoder filling ``cls`` from data with the given layout.
+
+    The keys of the data, in order, must be those of the layout; anything
+    else is handed to ``miss``, which finds or compiles the plan for that
+    layout. Attributes are therefore assigned in the order of the
+    document, as the generic path assigns them, and encode back in it.
+
+    ``nested`` is the expression used to decode a dict or list value, with
+    ``{key}`` and ``{var}`` substituted. Fields are assigned with plain
+    attribute stores, which CPython specialises and which keep the instance
+    on the class's shared-key dict; keys that are not identifiers go
+    through ``setattr``.
+    """
+    fields = public_fields(layout)
+    lines = [
+        f'    if tuple(data) != {tuple(layout)!r}:',
+        f'        return miss({params})',
+    ]
+    if layout:
+        # Keys that are not fields are unpacked into ``_``.
+        names = ''.join((f'v{fields.index(key)}' if key in fields else '_') + ', ' for key in layout)
+        lines.append(f'    {names} = data.values()')
+    lines.append('    obj = cls.__new__(cls)')
+    if ID_KEY in layout:
+        # Registered before the fields so references back to it resolve.
+        lines.append(f'    register(data[{ID_KEY!r}], obj)')
+    for i, field in enumerate(fields):
+        var = f'v{i}'
+        lines.append(f'    if {var}.__class__ in NESTED_TYPES:')
+        lines.append(f'        {var} = ' + nested.format(key=repr(field), var=var))
+        if field.isidentifier() and not iskeyword(field):
+            lines.append(f'    obj.{field} = {var}')
+        else:
+            lines.append(f'    setattr(obj, {field!r}, {var})')
+    lines.append('    return obj')
+    return lines
+
+
+def compile_decode_plan(cls, layout, miss):
+    from codable.serialization import KeyPath
+    lines = ['def decode(data, decode_value, keypath):']
+    lines += _compile_decode(cls, layout, 'data, decode_value, keypath',
+                             'decode_value({var}, KeyPath(keypath, {key}))')
+    return _compile('decode', lines, {'cls': cls, 'miss': miss, 'KeyPath': KeyPath, 'NESTED_TYPES': NESTED_TYPES,
+                                      'register': register_object})
+
+
+def compile_container_decode_plan(cls, layout, miss):
+    lines = ['def decode(container):', '    data = container.data']
+    lines += _compile_decode(cls, layout, 'container', 'container.decode({key})')
+    return _compile('decode', lines, {'cls': cls, 'miss': miss, 'NESTED_TYPES': NESTED_TYPES, 'register': register_object})
+
+
+def generic_decode(cls, data, decode_value, keypath):
+    from codable.serialization import KeyPath
+    obj = cls.__new__(cls)
+    if ID_KEY in data:
+        register_object(data[ID_KEY], obj)
+    for key, value in data.items():
+        if not key.startswith('_'):
+            if value.__class__ in NESTED_TYPES:
+                value = decode_value(value, KeyPath(keypath, key))
+            setattr(obj, key, value)
+    return obj
+
+
+def generic_container_decode(cls, container):
+    obj = cls.__new__(cls)
+    if ID_KEY in container.data:
+        register_object(container.data[ID_KEY], obj)
+    for key, value in container.data.items():
+        if not key.startswith('_'):
+            if value.__class__ in NESTED_TYPES:
+                value = container.decode(key)
+            setattr(obj, key, value)
+    return obj
+
+
+# Hashes of frozen instances, by id(), next to the weak reference that
+# drops the entry when the instance goes; the instance itself is left as is.
+_frozen_hashes = {}
+
+
+def frozen_hash(obj):
+    """ The hash kept for the frozen instance ``obj``, or None. """
+    entry = _frozen_hashes.get(id(obj))
+    return None if entry is None else entry[1]
+
+
+def _keep_hash(obj, h):
+    key = id(obj)
+    try:
+        ref = weakref.ref(obj, lambda _, key=key: _frozen_hashes.pop(key, None))
+    except TypeError:
+        # Slotted without __weakref__: hashed afresh every time.
+        return
+    _frozen_hashes[key] = (ref, h)
+
+
+def _compare_prologue(cls, layout, params):
+    """ Lines checking that ``a.__dict__`` has the keys of ``layout``, in
+    any order, and loading its public fields into v0, v1, ... """
+    if not cls.__dictoffset__:
+        return []
+    lines = [
+        '    d = a.__dict__',
+        f'    if len(d) != {len(layout)}:',
+        f'        return miss({params})',
+    ]
+    fields = public_fields(layout)
+    if layout:
+        lines.append('    try:')
+        for key in layout:
+            if key in fields:
+                lines.append(f'        v{fields.index(key)} = d[{key!r}]')
+            else:
+                lines.append(f'        d[{key!r}]')
+        lines += ['    except KeyError:', f'        return miss({params})']
+    return lines
+
+
+def _get_slot(var, obj, slot):
+    return f'{var} = {obj}.{slot}' if not iskeyword(slot) else f'{var} = getattr({obj}, {slot!r})'
+
+
+def compile_hash_plan(cls, layout, miss):
+    """ Generate ``__hash__`` for instances of ``cls`` with the given
+    ``__dict__`` layout. The hash is that of the public ``(name, value)``
+    pairs sorted by name, as generic_hash computes it, so instances with
+    the same fields in another order, or hashed by either path, agree.
+
+    The hash of an instance of a frozen class is computed once and kept
+    in a table beside it, so its ``__dict__`` and layout do not change.
+    """
+    frozen = getattr(cls, '__frozen__', False)
+    lines = ['def hash_(a):']
+    if frozen:
+        lines += [
+            '    entry = hashes.get(id(a))',
+            '    if entry is not None:',
+            '        return entry[1]',
+        ]
+    lines += _compare_prologue(cls, layout, 'a')
+    fields = public_fields(layout)
+    slots = slot_fields(cls)
+    names = sorted(set(fields) | set(slots))
+    if slots:
+        # Unset slots are left out, so the pairs are collected at run time.
+        lines.append('    items = []')
+        for name in names:
+            if name in fields:
+                lines.append(f'    items.append(({name!r}, v{fields.index(name)}))')
+            else:
+                lines += [
+                    '    try:',
+                    '        ' + _get_slot('s', 'a', name),
+                    '    except AttributeError:',
+                    '        pass',
+                    '    else:',
+                    f'        items.append(({name!r}, s))',
+                ]
+        lines.append('    h = hash(tuple(items))')
+    else:
+        items = ''.join(f'({name!r}, v{fields.index(name)}), ' for name in names)
+        lines.append(f'    h = hash(({items}))')
+    if frozen:
+        lines.append('    keep(a, h)')
+    lines.append('    return h')
+    return _compile('hash_', lines, {'miss': miss, 'hashes': _frozen_hashes, 'keep': _keep_hash})
+
+
+def generic_hash(cls, a):
+    h = hash(tuple(sorted(public_items(a), key=itemgetter(0))))
+    if getattr(cls, '__frozen__', False):
+        _keep_hash(a, h)
+    return h
+
+
+def compile_eq_plan(cls, layout, miss):
+    """ Generate ``__eq__`` for instances of ``cls`` with the given
+    ``__dict__`` layout: ``b`` must be an instance of ``cls`` with every
+    public attribute of ``a`` equal, as in generic_eq. Attributes of ``b``
+    are read directly; when one is missing the generic path decides. """
+    lines = [
+        'def eq(a, b):',
+        '    if not isinstance(b, cls):',
+        '        return False',
+    ]
+    lines += _compare_prologue(cls, layout, 'a, b')
+    for slot in slot_fields(cls):
+        lines += [
+            '    try:',
+            '        ' + _get_slot('s', 'a', slot),
+            '    except AttributeError:',
+            '        pass',
+            '    else:',
+            f'        if not getattr(b, {slot!r}, MISSING) == s:',
+            '            return False',
+        ]
+    fields = public_fields(layout)
+    if fields:
+        tests = [f'b.{field} == v{i}' if field.isidentifier() and not iskeyword(field)
+                 else f'getattr(b, {field!r}) == v{i}' for i, field in enumerate(fields)]
+        lines += [
+            '    try:',
+            f'        if not ({" and ".join(tests)}):',
+            '            return False',
+            '    except AttributeError:',
+            '        return generic(cls, a, b)',
+        ]
+    lines.append('    return True')
+    return _compile('eq', lines, {'cls': cls, 'miss': miss, 'generic': generic_eq, 'MISSING': _MISSING})
+
+
+def generic_eq(cls, a, b):
+    if not isinstance(b, cls):
+        return False
+    return all(getattr(b, k, _MISSING) == v for k, v in public_items(a))
+
+
+class _LayoutPlans:
+    """ Plans per (class, layout) plus the plan each class used last.
+
+    The layout is that of the data being decoded, or of the ``__dict__`` of
+    the instance being compared or hashed. Callers fetch the last plan with
+    a single lookup on the class; the plan guards its own layout and comes
+    back through ``miss`` when the data does not match.
+    """
+    def __init__(self, compile_plan, generic, data_of):
+        self.compile_plan = compile_plan
+        self.generic = generic
+        self.data_of = data_of
+        self.plans = {}
+        self.current = {}
+
+    def get(self, cls):
+        plan = self.current.get(cls)
+        if plan is None:
+            plan = partial(self.miss, cls)
+        return plan
+
+    def miss(self, cls, source, *args):
+        key = (cls, tuple(self.data_of(source)))
+        plan = self.plans.get(key)
+        if plan is None:
+            if len(self.plans) >= MAX_PLANS:
+                return self.generic(cls, source, *args)
+            plan = self.plans[key] = self.compile_plan(cls, key[1], partial(self.miss, cls))
+        self.current[cls] = plan
+        return plan(source, *args)
+
+    def clear(self, cls=None):
+        if cls is None:
+            self.plans.clear()
+            self.current.clear()
+            return
+        self.current.pop(cls, None)
+        for key in [key for key in self.plans if key[0] is cls]:
+            del self.plans[key]
+
+
+_decode_plans = _LayoutPlans(compile_decode_plan, generic_decode, lambda data: data)
+_container_decode_plans = _LayoutPlans(
+    compile_container_decode_plan, generic_container_decode, lambda container: container.data)
+_hash_plans = _LayoutPlans(compile_hash_plan, generic_hash, lambda obj: getattr(obj, '__dict__', ()))
+_eq_plans = _LayoutPlans(compile_eq_plan, generic_eq, lambda obj: getattr(obj, '__dict__', ()))
+
+
+def decode_plan(cls):
+    """ Return a decoder building ``cls`` straight from a mapping.
+
+    The decoder is called as ``decoder(data, decode_value, keypath)`` where
+    ``decode_value(value, keypath)`` is used for nested dict and list values
+    and ``keypath`` is the KeyPath of ``data``.
+    """
+    return _decode_plans.get(cls)
+
+
+def container_decode_plan(cls):
+    """ Return a decoder building ``cls`` from a KeyedDecodingContainer. """
+    return _container_decode_plans.get(cls)
+
+
+def hash_plan(cls):
+    """ Return ``__hash__`` for instances of ``cls``, compiled per layout. """
+    return _hash_plans.get(cls)
+
+
+def eq_plan(cls):
+    """ Return ``__eq__`` for instances of ``cls``, compiled per layout. """
+    return _eq_plans.get(cls)
+
+
+def clear_plans(cls=None):
+    """ Drop the compiled plans for ``cls``, or for every class. """
+    _decode_plans.clear(cls)
+    _container_decode_plans.clear(cls)
+    _hash_plans.clear(cls)
+    _eq_plans.clear(cls)
+    if cls is None:
+        _encode_plans.clear()
+        return
+    for key in [key for key in _encode_plans if key[0] is cls]:
+        del _encode_plans[key]
+
+
+def plan_count(cls):
+    return sum(1 for key in _encode_plans if key[0] is cls)
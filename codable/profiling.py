@@ -0,0 +1,208 @@
+""" Opt-in profiling of encoding and decoding, per class.
+
+    from codable import profiling
+
+    with profiling.profile() as profile:
+        JSONCodec.encode(report)
+    print(profile.format())
+
+While a Profile is active the JSON codec records, for every class it
+encodes or decodes, the number of calls, the cumulative time (including
+nested objects), the self time (excluding them) and, for encoding, the
+size of the JSON text the objects produce, nested objects included. The
+JSONCodec entry points are recorded too, under ``call``.
+
+Profiling hooks into the dispatch tables of the codec: enabling or
+disabling it empties them, and while it is off they hold the plain
+handlers, so a disabled profiler costs nothing per value and one global
+check per entry point call. Recursive classes are counted once in the
+cumulative figures, as cProfile does. The binary format is not profiled.
+"""
+import functools
+import marshal
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+# The Profile being recorded into, or None.
+active = None
+
+_listeners = []
+
+
+class Stats(NamedTuple):
+    calls: int
+    total: float
+    own: float
+    bytes: int
+
+
+def add_listener(listener):
+    """ Call ``listener()`` whenever profiling is switched on or off. """
+    _listeners.append(listener)
+
+
+def _switch(profile):
+    global active
+    previous, active = active, profile
+    for listener in _listeners:
+        listener()
+    return previous
+
+
+class _Frame:
+    # Time spent in profiled calls made by this one, and the sizes of the
+    # values they returned, by id().
+    __slots__ = ('child_time', 'sizes')
+
+    def __init__(self):
+        self.child_time = 0.0
+        self.sizes = {}
+
+
+class Profile:
+    """ Statistics per ``(operation, name)``, where the operation is
+    ``'encode'``, ``'decode'`` or ``'call'`` and the name a qualified class
+    name or an entry point. """
+
+    def __init__(self):
+        self._stats = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        # (frames, keys being recorded) of this thread.
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = ([], {})
+            return stack
+
+    def _record(self, key, total, own, size, outermost):
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[2] += own
+            if outermost:
+                entry[1] += total
+                entry[3] += size
+
+    def call(self, key, fn, args, size=None):
+        """ Call ``fn(*args)`` and record it under ``key``. ``size(result,
+        sizes)``, if given, measures the result; ``sizes`` holds the sizes of
+        values returned by nested calls, by id(). """
+        frames, running = self._stack()
+        frame = _Frame()
+        frames.append(frame)
+        running[key] = running.get(key, 0) + 1
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        finally:
+            total = time.perf_counter() - start
+            frames.pop()
+            running[key] -= 1
+        measured = size(result, frame.sizes) if size is not None else 0
+        if frames:
+            frames[-1].child_time += total
+            if size is not None:
+                frames[-1].sizes[id(result)] = measured
+        self._record(key, total, total - frame.child_time, measured, not running[key])
+        return result
+
+    def stream(self, key, fn, args, parts):
+        """ Run the generator ``fn(*args)``, which appends text to ``parts``,
+        as the stream writer does, and record it under ``key``. Time is only
+        counted while it runs, and its size is the text it appended. """
+        frames, running = self._stack()
+        frame = _Frame()
+        outermost = not running.get(key)
+        total = 0.0
+        size = 0
+        generator = fn(*args)
+        while True:
+            mark = len(parts)
+            frames.append(frame)
+            running[key] = running.get(key, 0) + 1
+            start = time.perf_counter()
+            try:
+                next(generator)
+                done = False
+            except StopIteration:
+                done = True
+            finally:
+                total += time.perf_counter() - start
+                frames.pop()
+                running[key] -= 1
+                size += sum(map(len, parts[mark:]))
+            if done:
+                break
+            # The writer flushes and empties ``parts`` before resuming us.
+            yield
+        if frames:
+            frames[-1].child_time += total
+        self._record(key, total, total - frame.child_time, size, outermost)
+
+    def snapshot(self):
+        """ Return a copy of the statistics as ``{(operation, name): Stats}``. """
+        with self._lock:
+            return {key: Stats(*entry) for key, entry in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def format(self, sort='own', limit=None):
+        """ Return the statistics as a text table, largest ``sort`` first. """
+        rows = sorted(self.snapshot().items(), key=lambda item: getattr(item[1], sort), reverse=True)
+        lines = [f"{'calls':>10} {'total ms':>10} {'self ms':>10} {'bytes':>12}  operation name"]
+        for (operation, name), stats in rows[:limit]:
+            lines.append(f"{stats.calls:10d} {stats.total * 1e3:10.3f} {stats.own * 1e3:10.3f} "
+                         f"{stats.bytes:12d}  {operation} {name}")
+        return '\n'.join(lines)
+
+    def dump_stats(self, path):
+        """ Write the statistics in the format of ``cProfile`` and ``pstats``,
+        so ``pstats.Stats(path)`` and the tools built on it can read them. """
+        stats = {('codable', 0, f"{operation} {name}"): (s.calls, s.calls, s.own, s.total, {})
+                 for (operation, name), s in self.snapshot().items()}
+        with open(path, 'wb') as fp:
+            marshal.dump(stats, fp)
+
+
+def enable():
+    """ Start recording into a new Profile, or keep the active one, and return it. """
+    if active is None:
+        _switch(Profile())
+    return active
+
+
+def disable():
+    """ Stop recording; returns the Profile that was active, if any. """
+    return _switch(None) if active is not None else None
+
+
+@contextmanager
+def profile():
+    """ Record what happens inside the block into a new Profile. """
+    previous = _switch(Profile())
+    try:
+        yield active
+    finally:
+        _switch(previous)
+
+
+def entry_point(name):
+    """ Record calls of the decorated function under ``('call', name)``. """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = active
+            if profile is None:
+                return fn(*args, **kwargs)
+            return profile.call(('call', name), functools.partial(fn, **kwargs), args)
+        return wrapper
+    return decorate
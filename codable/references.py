@@ -0,0 +1,70 @@
+""" Shared and cyclic object graphs.
+
+With ``references=True`` an encoder writes every object the first time it
+meets it, with an ``__id__`` numbering objects in the order they are
+started, and every later occurrence as a back-reference::
+
+    {"__id__": 0, "owner": {"__id__": 1, "name": "Ada", "__type__": "User"},
+     "editor": {"__ref__": 1}, "__type__": "Doc"}
+
+Objects are Encodable instances and types with registered encoders; plain
+dicts and lists are written out wherever they appear, so a cycle has to
+pass through an object. Ids are scoped to one document. A plain dict with
+a ``__ref__`` key of its own is written as a literal dict (see
+``codable.literal``), whether or not references are on.
+
+Decoders register an object under its ``__id__`` as soon as it exists, so
+a reference back to an object still being filled in gets the instance
+itself. Classes with the stock AutoDecodable.decode are created before
+their fields are decoded; other classes only exist once their ``decode``
+returns, so a cycle back into one of them cannot be rebuilt and raises
+DecodingError. Back-references need type tags; documents decoded with a
+schema or lazily take them as plain dicts.
+"""
+from contextvars import ContextVar
+
+ID_KEY = '__id__'
+REF_KEY = '__ref__'
+
+# Objects of the document being decoded, by id; None outside a decode.
+_objects = ContextVar('codable_references', default=None)
+
+
+def track_object(references, obj):
+    """ Return ``(ref_id, seen)`` for ``obj`` in the ``references`` table of
+    an encode call, numbering it if it is new. """
+    entry = references.get(id(obj))
+    if entry is not None:
+        return entry[0], True
+    ref_id = len(references)
+    # Keeping the object alive keeps its id() from being reused.
+    references[id(obj)] = (ref_id, obj)
+    return ref_id, False
+
+
+def begin_scope():
+    """ Start a reference scope for one document; pass the result to ``end_scope``. """
+    return _objects.set({})
+
+
+def end_scope(token):
+    _objects.reset(token)
+
+
+def register_object(ref_id, obj):
+    objects = _objects.get()
+    if objects is not None:
+        objects[ref_id] = obj
+
+
+def resolve_reference(value, keypath):
+    """ Return the object a ``{"__ref__": id}`` dict points to. """
+    from codable.serialization import DecodingError
+    objects = _objects.get()
+    ref_id = value[REF_KEY]
+    if len(value) != 1 or objects is None or ref_id.__class__ is not int:
+        raise DecodingError(f"Malformed reference {value!r}", keypath)
+    try:
+        return objects[ref_id]
+    except KeyError:
+        raise DecodingError(f"Reference to object {ref_id}, which is unknown or not decoded yet", keypath) from None
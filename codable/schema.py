@@ -0,0 +1,314 @@
+""" Decoding against type annotations instead of ``__type__`` tags.
+
+``schema_decoder(tp)`` turns a type expression into a function that checks
+parsed data against it and builds the typed result. Supported are classes
+with annotations (nested to any depth), ``list[X]``, ``tuple[X, ...]`` and
+fixed tuples, ``dict[str, X]``, ``Optional[X]`` and other unions, ``Any``,
+the JSON scalar types, and types registered in ``custom_type_registry``
+with a decoder. Values that do not match raise DecodingError with the key
+path of the value.
+
+Class plans are compiled from the annotations the first time a class is
+decoded, like the AutoDecodable plans, so no reflection happens per call.
+Missing fields fall back to class attribute defaults and dataclass default
+factories, then to None for ``Optional`` and ``Any`` fields; any other
+missing field is an error. Keys without an annotation are ignored.
+"""
+import dataclasses
+import types
+from functools import partial
+from keyword import iskeyword
+from typing import Any, ClassVar, Union, get_args, get_origin, get_type_hints
+
+from codable.columnar import COLUMNAR_KEY, expand_columnar
+from codable.literal import LITERAL_KEY, literal_dict
+from codable.plans import NESTED_TYPES, _compile
+from codable.serialization import (
+    Decodable,
+    DecodingError,
+    KeyPath,
+    custom_type_registry,
+    has_default_decode,
+    qualified_name,
+)
+
+# Decoders are called as ``decoder(value, keypath, key)``: ``keypath`` is the
+# path of the enclosing value and ``key`` the key of ``value`` in it, or ROOT
+# for the top-level value. The path is only built when it is needed.
+ROOT = object()
+
+_MISSING = object()
+
+# Origins of union types: ``X | Y`` has its own type from Python 3.10 on.
+_UNIONS = (Union, types.UnionType) if hasattr(types, 'UnionType') else (Union,)
+
+
+def _path(keypath, key):
+    return keypath if key is ROOT else KeyPath(keypath, key)
+
+
+def _type_name(tp):
+    return tp.__name__ if isinstance(tp, type) else repr(tp)
+
+
+def _fail(expected, value, keypath, key):
+    raise DecodingError(f"Expected {expected}, got {value.__class__.__name__}", _path(keypath, key))
+
+
+def _decode_any(value, keypath, key):
+    # Untyped values may still hold tagged objects.
+    if value.__class__ in NESTED_TYPES:
+        from codable.formats.json import _decode_value
+        return _decode_value(value, _path(keypath, key))
+    return value
+
+
+def _decode_none(value, keypath, key):
+    if value is not None:
+        _fail('null', value, keypath, key)
+    return None
+
+
+def _decode_str(value, keypath, key):
+    if not isinstance(value, str):
+        _fail('str', value, keypath, key)
+    return value
+
+
+def _decode_int(value, keypath, key):
+    if not isinstance(value, int) or value.__class__ is bool:
+        _fail('int', value, keypath, key)
+    return value
+
+
+def _decode_float(value, keypath, key):
+    if not isinstance(value, (int, float)) or value.__class__ is bool:
+        _fail('float', value, keypath, key)
+    return float(value)
+
+
+def _decode_bool(value, keypath, key):
+    if value.__class__ is not bool:
+        _fail('bool', value, keypath, key)
+    return value
+
+
+_SCALARS = {
+    str: _decode_str,
+    int: _decode_int,
+    float: _decode_float,
+    bool: _decode_bool,
+}
+
+
+def _decode_optional(decoder, value, keypath, key):
+    if value is None:
+        return None
+    return decoder(value, keypath, key)
+
+
+def _decode_union(decoders, name, value, keypath, key):
+    for decoder in decoders:
+        try:
+            return decoder(value, keypath, key)
+        except DecodingError:
+            pass
+    _fail(name, value, keypath, key)
+
+
+def _decode_list(decoder, value, keypath, key):
+    if value.__class__ is dict and COLUMNAR_KEY in value:
+        value = expand_columnar(value, _path(keypath, key))
+    if value.__class__ is not list:
+        _fail('list', value, keypath, key)
+    path = _path(keypath, key)
+    return [decoder(v, path, i) for i, v in enumerate(value)]
+
+
+def _decode_tuple(decoder, value, keypath, key):
+    return tuple(_decode_list(decoder, value, keypath, key))
+
+
+def _decode_fixed_tuple(decoders, value, keypath, key):
+    if value.__class__ is dict and COLUMNAR_KEY in value:
+        value = expand_columnar(value, _path(keypath, key))
+    if value.__class__ is not list or len(value) != len(decoders):
+        _fail(f'list of {len(decoders)} items', value, keypath, key)
+    path = _path(keypath, key)
+    return tuple(decoder(v, path, i) for i, (decoder, v) in enumerate(zip(decoders, value)))
+
+
+def _decode_dict(decoder, value, keypath, key):
+    if value.__class__ is not dict:
+        _fail('object', value, keypath, key)
+    if LITERAL_KEY in value:
+        value = literal_dict(value, _path(keypath, key))
+    path = _path(keypath, key)
+    return {k: decoder(v, path, k) for k, v in value.items()}
+
+
+def _decode_instance(cls, value, keypath, key):
+    if not isinstance(value, cls):
+        _fail(cls.__name__, value, keypath, key)
+    return value
+
+
+def _decode_foreign(entry, value, keypath, key):
+    from codable.formats.json import _decode_foreign as decode_foreign
+    if isinstance(value, entry.cls):
+        # Formats that carry the type natively, like bytes in binary.
+        return value
+    if value.__class__ is not dict:
+        _fail(entry.cls.__name__, value, keypath, key)
+    return decode_foreign(entry, value, _path(keypath, key))
+
+
+def _decode_class(cls, value, keypath, key):
+    return _class_plans[cls](value, keypath, key)
+
+
+def _decode_custom(cls, value, keypath, key):
+    # Classes with their own ``decode`` get a container, as in tagged mode.
+    from codable.formats.json import _decode_object
+    if value.__class__ is not dict:
+        _fail(cls.__name__, value, keypath, key)
+    return _decode_object(cls, value, _path(keypath, key))
+
+
+def _schema_fields(cls):
+    return [(name, tp) for name, tp in get_type_hints(cls).items()
+            if not name.startswith('_') and get_origin(tp) is not ClassVar and tp is not ClassVar]
+
+
+def _field_defaults(cls):
+    # Default factories of dataclass fields; plain defaults are class attributes.
+    if not dataclasses.is_dataclass(cls):
+        return {}
+    return {field.name: field.default_factory for field in dataclasses.fields(cls)
+            if field.default_factory is not dataclasses.MISSING}
+
+
+def compile_schema_plan(cls):
+    """ Generate a decoder building ``cls`` from a dict according to its
+    annotations. """
+    fields = _schema_fields(cls)
+    factories = _field_defaults(cls)
+    namespace = {'cls': cls, 'KeyPath': KeyPath, 'ROOT': ROOT, 'MISSING': _MISSING,
+                 'fail': _fail, 'missing': _missing}
+    lines = [
+        'def decode(data, keypath, key):',
+        '    if data.__class__ is not dict:',
+        f'        fail({cls.__name__!r}, data, keypath, key)',
+        '    path = keypath if key is ROOT else KeyPath(keypath, key)',
+        '    obj = cls.__new__(cls)',
+    ]
+    for i, (name, tp) in enumerate(fields):
+        namespace[f'd{i}'] = schema_decoder(tp)
+        lines += [
+            f'    v = data.get({name!r}, MISSING)',
+            '    if v is MISSING:',
+        ]
+        if name in factories:
+            namespace[f'f{i}'] = factories[name]
+            lines.append(f'        setattr(obj, {name!r}, f{i}())')
+        elif _has_default(cls, name):
+            lines.append('        pass')
+        elif _is_optional(tp):
+            lines.append(f'        setattr(obj, {name!r}, None)')
+        else:
+            lines.append(f'        missing(cls, {name!r}, path)')
+        lines.append('    else:')
+        if tp in _SCALARS:
+            # Exact scalar types skip the call.
+            lines.append(f'        if v.__class__ is not {tp.__name__}:')
+            lines.append(f'            v = d{i}(v, path, {name!r})')
+        else:
+            lines.append(f'        v = d{i}(v, path, {name!r})')
+        if name.isidentifier() and not iskeyword(name):
+            lines.append(f'        obj.{name} = v')
+        else:
+            lines.append(f'        setattr(obj, {name!r}, v)')
+    lines.append('    return obj')
+    return _compile('decode', lines, namespace)
+
+
+def _has_default(cls, name):
+    # Slots show up as member descriptors on the class; those are no default.
+    for base in cls.__mro__:
+        if name in base.__dict__:
+            return not isinstance(base.__dict__[name], types.MemberDescriptorType)
+    return False
+
+
+def _missing(cls, name, path):
+    raise DecodingError(f"Missing field {name!r} of {cls.__name__}", path)
+
+
+def _is_optional(tp):
+    return tp is Any or get_origin(tp) in _UNIONS and type(None) in get_args(tp)
+
+
+class _ClassPlans(dict):
+    # Compiled on first use, so recursive and forward references only need
+    # the class to exist by the time data is decoded.
+    def __missing__(self, cls):
+        plan = self[cls] = compile_schema_plan(cls)
+        return plan
+
+
+_class_plans = _ClassPlans()
+
+_decoders = {}
+
+
+def schema_decoder(tp):
+    """ Return the cached ``decoder(value, keypath, key)`` for ``tp``. """
+    try:
+        return _decoders[tp]
+    except KeyError:
+        decoder = _decoders[tp] = _build_decoder(tp)
+        return decoder
+
+
+def _build_decoder(tp):
+    if tp is Any or tp is object:
+        return _decode_any
+    if tp is None or tp is type(None):
+        return _decode_none
+    if tp in _SCALARS:
+        return _SCALARS[tp]
+    origin = get_origin(tp)
+    args = get_args(tp)
+    if origin in _UNIONS:
+        options = tuple(schema_decoder(arg) for arg in args if arg is not type(None))
+        if len(options) == 1:
+            return partial(_decode_optional, options[0]) if len(options) < len(args) else options[0]
+        if len(options) < len(args):
+            options = (_decode_none,) + options
+        return partial(_decode_union, options, _type_name(tp))
+    if tp is list or origin is list:
+        return partial(_decode_list, schema_decoder(args[0]) if args else _decode_any)
+    if tp is tuple or origin is tuple:
+        if not args or (len(args) == 2 and args[1] is Ellipsis):
+            return partial(_decode_tuple, schema_decoder(args[0]) if args else _decode_any)
+        return partial(_decode_fixed_tuple, tuple(schema_decoder(arg) for arg in args))
+    if tp is dict or origin is dict:
+        if args and args[0] not in (str, Any):
+            raise TypeError(f"Schema dict keys must be str, not {_type_name(args[0])}")
+        return partial(_decode_dict, schema_decoder(args[1]) if args else _decode_any)
+    if isinstance(tp, type):
+        fields = _schema_fields(tp)
+        if issubclass(tp, Decodable) and (not fields or not has_default_decode(tp)):
+            return partial(_decode_custom, tp)
+        if fields:
+            return partial(_decode_class, tp)
+        entry = custom_type_registry.get_entry(qualified_name(tp))
+        if entry is not None and entry.cls is tp and entry.decoder is not None:
+            return partial(_decode_foreign, entry)
+        return partial(_decode_instance, tp)
+    raise TypeError(f"Unsupported schema type {tp!r}")
+
+
+def decode_schema(tp, data, keypath=None, key=ROOT):
+    """ Check ``data`` against ``tp`` and build the typed result. """
+    return schema_decoder(tp)(data, keypath, key)
@@ -1,127 +1,451 @@
 import json
+import warnings
 from typing import NamedTuple, Union, Any
 from abc import ABC, ABCMeta, abstractmethod
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+
+from codable.plans import encode_plan, container_decode_plan, eq_plan, hash_plan
 
 class RegistryEntry(NamedTuple):
     cls: type
     encoder: Any
     decoder: Any
+    type_id: Union[int, None] = None
+
+
+def qualified_name(cls) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class TypeTagCollisionWarning(UserWarning):
+    """ Two registered classes share a short name, so ``__type__`` name tags
+    only reach the one registered last. """
+
 
 class CustomTypeRegistry:
+    """ Classes known to the codecs, keyed by qualified name.
+
+    Encodable and Decodable subclasses register themselves. Types you do not
+    own can be registered with an ``encoder(value, container)`` that writes
+    the value's fields into a keyed container and a ``decoder(container)``
+    that builds the value back from one::
+
+        custom_type_registry.register(
+            UUID,
+            encoder=lambda value, container: container.encode('hex', value.hex),
+            decoder=lambda container: UUID(container.decode('hex')))
+
+    A type tag is the short class name, the qualified name
+    (``module.QualName``) or a small integer type ID. IDs are given with
+    ``register(..., type_id=7)`` or a ``__type_id__ = 7`` class attribute.
+    Reusing an ID for another class raises ValueError, and reusing a short
+    name warns with TypeTagCollisionWarning, both when the class registers.
+
+    Support for optional libraries is registered lazily with
+    ``register_lazy``, so the library is only imported once one of its
+    values is encoded or its tag is decoded.
+    """
     def __init__(self):
         self._registry: dict[str, RegistryEntry] = {}
-
-    def register(self, cls, encoder=None, decoder=None):
-        if cls.__name__ in self._registry:
-            existing_entry = self._registry[cls.__name__]
-            new_encoder = encoder if encoder is not None else existing_entry.encoder
-            new_decoder = decoder if decoder is not None else existing_entry.decoder
-            self._registry[cls.__name__] = RegistryEntry(cls, new_encoder, new_decoder)
-        else:
-            self._registry[cls.__name__] = RegistryEntry(cls, encoder, decoder)
+        self._names: dict[str, str] = {}
+        self._ids: dict[int, str] = {}
+        self._lazy = {}
+        self._listeners = []
+
+    def register_lazy(self, name, loader):
+        """ Call ``loader()`` the first time the type with qualified name
+        ``name`` is looked up; the loader registers it. """
+        self._lazy[name] = loader
+        self._lazy[name.rpartition('.')[2]] = loader
+
+    def _load(self, name):
+        loader = self._lazy.get(name)
+        if loader is None:
+            return False
+        for key in [key for key, value in self._lazy.items() if value is loader]:
+            del self._lazy[key]
+        loader()
+        return True
+
+    def add_listener(self, listener):
+        """ Call ``listener()`` whenever an entry is added or replaced. """
+        self._listeners.append(listener)
+
+    def register(self, cls, encoder=None, decoder=None, type_id=None):
+        self._register(cls, encoder, decoder, type_id)
+        for listener in self._listeners:
+            listener()
+
+    def _register(self, cls, encoder, decoder, type_id):
+        name = qualified_name(cls)
+        existing_entry = self._registry.get(name)
+        if existing_entry is not None:
+            encoder = encoder if encoder is not None else existing_entry.encoder
+            decoder = decoder if decoder is not None else existing_entry.decoder
+            type_id = type_id if type_id is not None else existing_entry.type_id
+        if type_id is not None:
+            if type_id.__class__ is not int or type_id < 0:
+                raise ValueError(f"Type ID of {name} must be a non-negative int, not {type_id!r}")
+            owner = self._ids.get(type_id)
+            if owner is not None and owner != name:
+                raise ValueError(f"Type ID {type_id} of {name} is already used by {owner}")
+        if existing_entry is not None and existing_entry.type_id not in (None, type_id):
+            del self._ids[existing_entry.type_id]
+        owner = self._names.get(cls.__name__)
+        if owner is not None and owner != name and owner in self._registry:
+            warnings.warn(f"{name} and {owner} are both registered as {cls.__name__!r}; "
+                          f"name tags now decode as {name}", TypeTagCollisionWarning, stacklevel=4)
+        self._registry[name] = RegistryEntry(cls, encoder, decoder, type_id)
+        self._names[cls.__name__] = name
+        if type_id is not None:
+            self._ids[type_id] = name
+
+    def unregister(self, cls):
+        """ Remove the entry of ``cls``; a no-op if it has none. """
+        name = qualified_name(cls)
+        entry = self._registry.pop(name, None)
+        if entry is None:
+            return
+        if entry.type_id is not None:
+            del self._ids[entry.type_id]
+        if self._names.get(cls.__name__) == name:
+            del self._names[cls.__name__]
+        for listener in self._listeners:
+            listener()
 
     def get_encoder(self, cls) -> Union[json.JSONEncoder, None]:
-        entry = self._registry.get(cls.__name__)
+        entry = self._registry.get(qualified_name(cls))
         return entry.encoder if entry else None
 
-    def get_decoder(self, cls_name) -> Union[json.JSONDecoder, type, None]:
-        entry = self._registry.get(cls_name)
+    def get_decoder(self, tag) -> Union[json.JSONDecoder, type, None]:
+        entry = self.get_entry(tag)
         return entry.decoder if entry else None
 
-    def get_class(self, cls_name) -> Union[type, None]:
-        entry = self._registry.get(cls_name)
+    def get_class(self, tag) -> Union[type, None]:
+        entry = self.get_entry(tag)
         return entry.cls if entry else None
 
+    def get_entry(self, tag) -> Union[RegistryEntry, None]:
+        """ Look up a type tag: a type ID, a qualified name or a short name. """
+        if tag.__class__ is int:
+            name = self._ids.get(tag)
+        elif tag in self._registry:
+            name = tag
+        else:
+            name = self._names.get(tag)
+            if name is None and self._lazy and self._load(tag):
+                return self.get_entry(tag)
+        return self._registry.get(name) if name is not None else None
+
+    def type_id(self, cls) -> Union[int, None]:
+        # Lazy proxies are not registered; they take the ID of their class.
+        cls = cls.__dict__.get('__proxy_for__', cls)
+        entry = self._registry.get(qualified_name(cls))
+        return entry.type_id if entry is not None and entry.cls is cls else None
+
+    def foreign_entry(self, cls) -> Union[RegistryEntry, None]:
+        """ The entry with an encoder for ``cls`` or its nearest registered
+        base, for types that are not Encodable. """
+        for base in cls.__mro__:
+            name = qualified_name(base)
+            if name in self._lazy:
+                self._load(name)
+            entry = self._registry.get(name)
+            if entry is not None and entry.cls is base and entry.encoder is not None:
+                return entry
+        return None
+
+    def __iter__(self):
+        return iter(list(self._registry.values()))
+
 # Create a global registry instance
 custom_type_registry = CustomTypeRegistry()
 
 
-class KeyedEncodingContainer(ABC):
+def _load_numpy_support():
+    import codable.numpy_support  # noqa: F401  (registers on import)
+
+
+custom_type_registry.register_lazy('numpy.ndarray', _load_numpy_support)
+
+
+class DispatchTable(dict):
+    """ Handlers keyed by exact value type (or type tag), resolved lazily.
+
+    ``resolve(key)`` picks the handler the first time a key is seen; after
+    that choosing a handler is a single dict lookup. The table is emptied
+    whenever ``custom_type_registry`` changes.
+    """
+    def __init__(self, resolve, registry=None):
+        super().__init__()
+        self._resolve = resolve
+        (registry or custom_type_registry).add_listener(self.clear)
+
+    def __missing__(self, key):
+        handler = self[key] = self._resolve(key)
+        return handler
+
+
+def _id_tag(cls):
+    type_id = custom_type_registry.type_id(cls)
+    return type_id if type_id is not None else qualified_name(cls)
+
+
+# Type tag of a class, per tag style.
+_type_tags = {
+    'name': DispatchTable(lambda cls: cls.__name__),
+    'qualified': DispatchTable(qualified_name),
+    'id': DispatchTable(_id_tag),
+    'none': DispatchTable(lambda cls: None),
+}
+
+
+class EncodeContext:
+    """ Options of one encode call, shared by all of its containers.
+
+    ``type_tags`` picks what ``__type__`` holds: ``'name'``, the class name
+    (the default); ``'qualified'``, ``module.QualName``; or ``'id'``, the
+    registered type ID, falling back to the qualified name for classes
+    without one; or ``'none'``, no tag at all, for documents that are decoded
+    with a schema. Decoding accepts all of them.
+
+    ``columnar`` writes lists of objects of one class in columnar form; see
+    ``codable.columnar``.
+
+    ``references`` writes each object once and back-references after that;
+    see ``codable.references``. The context then holds the objects seen so
+    far and serves a single encode call.
+
+    ``share_forms`` is for callers that only serialise the document they
+    get: encoders may then put forms kept across calls into it as they are,
+    rather than copies; see ``codable.memo``.
+    """
+    __slots__ = ('type_tags', 'tags', 'columnar', 'references', 'share_forms')
+
+    def __init__(self, type_tags='name', columnar=False, references=False, share_forms=False):
+        if type_tags not in _type_tags:
+            raise ValueError(f"type_tags must be one of {', '.join(map(repr, _type_tags))}, not {type_tags!r}")
+        if columnar and references:
+            raise ValueError("columnar and references cannot be combined")
+        self.type_tags = type_tags
+        self.tags = _type_tags[type_tags]
+        self.columnar = columnar
+        self.references = {} if references else None
+        self.share_forms = share_forms
+
+
+DEFAULT_ENCODE_CONTEXT = EncodeContext()
+
+
+# Types every format stores natively.
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def encode_kind(cls):
+    """ Classify ``cls`` for the encoders of every format.
+
+    Returns ``'scalar'``, ``'object'`` (Encodable), ``'dict'`` (dicts and
+    other mappings), ``'list'`` (lists, tuples and other sequences), a
+    RegistryEntry for a type with a registered encoder, or None if the type
+    cannot be encoded.
+    """
+    if cls in SCALAR_TYPES:
+        return 'scalar'
+    if issubclass(cls, Encodable):
+        return 'object'
+    entry = custom_type_registry.foreign_entry(cls)
+    if entry is not None:
+        return entry
+    if issubclass(cls, dict):
+        return 'dict'
+    if issubclass(cls, (list, tuple)):
+        return 'list'
+    if issubclass(cls, (str, int, float)):
+        return 'scalar'
+    if issubclass(cls, Mapping):
+        return 'dict'
+    if issubclass(cls, Sequence):
+        return 'list'
+    return None
+
+
+class KeyPath:
+    """ One step of a key path, linked to the path of its parent.
+
+    Containers hand each child a node instead of copying the whole path, so
+    descending one level costs a single small allocation. The path is only
+    turned into a list when someone asks for it, usually to report an error.
+    """
+    __slots__ = ('parent', 'key')
+
+    def __init__(self, parent, key):
+        self.parent = parent
+        self.key = key
+
+    def to_list(self):
+        path = []
+        node = self
+        while node is not None:
+            path.append(node.key)
+            node = node.parent
+        path.reverse()
+        return path
+
+    @classmethod
+    def from_list(cls, keys):
+        node = None
+        for key in keys:
+            node = cls(node, key)
+        return node
+
+    def __repr__(self):
+        return f"KeyPath({self.to_list()!r})"
+
+
+def keypath_node(keypath):
+    """ Accept a KeyPath, a list of keys or None and return a KeyPath or None. """
+    if keypath is None or isinstance(keypath, KeyPath):
+        return keypath
+    return KeyPath.from_list(keypath)
+
+
+def keypath_list(keypath):
+    return keypath.to_list() if keypath is not None else []
+
+
+def format_keypath(keys):
+    return ''.join(f'[{key}]' if isinstance(key, int) else f'.{key}' for key in keys).lstrip('.') or '<root>'
+
+
+class CodingError(TypeError):
+    """ An encode or decode failure, carrying the key path where it happened.
+
+    Line-oriented formats also set ``lineno`` to the 1-based line of the
+    record that failed.
+    """
+    def __init__(self, message, keypath=None, lineno=None):
+        self.keypath = keypath_list(keypath_node(keypath))
+        self.message = message
+        self.lineno = lineno
+        location = format_keypath(self.keypath)
+        if lineno is not None:
+            location = f"line {lineno}, {location}"
+        super().__init__(f"{message} (at {location})")
+
+    def __reduce__(self):
+        # Keep the structured fields when errors cross process boundaries.
+        return (self.__class__, (self.message, self.keypath, self.lineno))
+
+class EncodingError(CodingError):
     pass
 
-class KeyedDecodingContainer(ABC):
+class DecodingError(CodingError):
     pass
 
+
+class KeyedEncodingContainer(ABC):
+    __slots__ = ()
+
+class KeyedDecodingContainer(ABC):
+    __slots__ = ()
+
 class UnkeyedEncodingContainer(ABC):
-    pass
+    __slots__ = ()
 
 class UnkeyedDecodingContainer(ABC):
-    pass
+    __slots__ = ()
 
 class SingleValueEncodingContainer(ABC):
-    pass
+    __slots__ = ()
 
 class SingleValueDecodingContainer(ABC):
-    pass
+    __slots__ = ()
 
 class CodeableMeta(ABCMeta):
     def __init__(cls, name, bases, dct):
         super().__init__(name, bases, dct)
-        base_classes = {'Encodable', 'Decodable', 'AutoEncodable', 'AutoDecodable'}
-        if name in base_classes:
+        # The base classes defined in this module are not registered, nor
+        # are proxies standing in for a registered class.
+        if dct.get('__module__') == __name__ or '__proxy_for__' in dct:
             return
-        encodable = globals().get('Encodable', object)
-        decodable = globals().get('Decodable', object)
-        if issubclass(cls, encodable) and cls is not encodable:
-            custom_type_registry.register(cls, cls.encode)
-        if issubclass(cls, decodable) and cls is not decodable:
-            custom_type_registry.register(cls, cls.decode)
+        type_id = dct.get('__type_id__')
+        if issubclass(cls, Encodable):
+            custom_type_registry.register(cls, cls.encode, type_id=type_id)
+        if issubclass(cls, Decodable):
+            custom_type_registry.register(cls, decoder=cls.decode, type_id=type_id)
 
 
 class Encodable(ABC, metaclass=CodeableMeta):
+    __slots__ = ()
+    # True promises instances never change once built, letting encoders
+    # reuse their encoded form; see codable.memo.
+    __frozen__ = False
+
     @abstractmethod
     def encode(self, container: KeyedEncodingContainer):
         pass
 
 class Decodable(ABC, metaclass=CodeableMeta):
+    __slots__ = ()
+
     @abstractmethod
     def decode(cls, container: KeyedDecodingContainer):
         pass
 
 class Codable(Encodable, Decodable):
-    pass
+    __slots__ = ()
 
 class AutoEncodable(Encodable, metaclass=CodeableMeta):
+    """ Encodes every public attribute, from ``__slots__`` (own or inherited)
+    and ``__dict__``. Unset slots are left out. """
+    __slots__ = ()
+
     def encode(self, container: KeyedEncodingContainer):
-        for k, v in self.__dict__.items():
-            if not k.startswith('_'):
-                container.encode(k, v)
+        encode_plan(self)(self, container)
 
     def __hash__(self):
-        return hash(tuple((k, v) for k, v in self.__dict__.items() if not k.startswith('_')))
+        return hash_plan(self.__class__)(self)
 
     def __eq__(self, other):
-        if not isinstance(other, self.__class__):
-            return False
-        return all(
-            getattr(self, k) == getattr(other, k)
-            for k in self.__dict__.keys()
-            if not k.startswith('_')
-        )
+        return eq_plan(self.__class__)(self, other)
 
 class AutoDecodable(Decodable, metaclass=CodeableMeta):
+    __slots__ = ()
+
     @classmethod
     def decode(cls, container: KeyedDecodingContainer):
-        instance = cls.__new__(cls)
-        for key, value in container.data.items():
-            if not key.startswith('_'):
-                setattr(instance, key, value)
-        return instance
+        return container_decode_plan(cls)(container)
 
     def __hash__(self):
-        return hash(tuple((k, v) for k, v in self.__dict__.items() if not k.startswith('_')))
+        return hash_plan(self.__class__)(self)
 
     def __eq__(self, other):
-        if not isinstance(other, self.__class__):
-            return False
-        return all(
-            getattr(self, k) == getattr(other, k)
-            for k in self.__dict__.keys()
-            if not k.startswith('_')
-        )
+        return eq_plan(self.__class__)(self, other)
 
 class AutoCodable(Codable, AutoEncodable, AutoDecodable):
-    pass
+    __slots__ = ()
+
+
+@lru_cache(maxsize=None)
+def has_default_encode(cls) -> bool:
+    """ True if ``cls`` encodes with the unmodified AutoEncodable.encode.
+
+    The counterpart of ``has_default_decode``, for codecs that write such
+    classes without a container. Cached the same way.
+    """
+    return getattr(cls, 'encode', None) is AutoEncodable.encode
+
+
+@lru_cache(maxsize=None)
+def has_default_decode(cls) -> bool:
+    """ True if ``cls`` decodes with the unmodified AutoDecodable.decode.
+
+    Codecs use this to build such classes straight from their data without
+    wrapping it in a KeyedDecodingContainer first. The answer is cached per
+    class; call ``has_default_decode.cache_clear()`` after patching ``decode``.
+    """
+    return getattr(cls.decode, '__func__', None) is AutoDecodable.decode.__func__
 """ Notes
 
 Top Level Encoder:
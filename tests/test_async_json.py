@@ -0,0 +1,127 @@
+import asyncio
+import socket
+
+import pytest
+from codable.formats.async_json import AsyncJSONCodec, _chunks
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoCodable, DecodingError
+
+
+class Reading(AutoCodable):
+    def __init__(self, sensor, values):
+        self.sensor = sensor
+        self.values = values
+
+
+class Log(AutoCodable):
+    def __init__(self, readings):
+        self.readings = readings
+
+
+def log(count=2000):
+    return Log([Reading(f"s{i}", [i, i * 0.5, "x" * 20]) for i in range(count)])
+
+
+async def pipe():
+    left, right = socket.socketpair()
+    for sock in (left, right):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    # Keep the unused halves referenced; collecting a writer closes its socket.
+    reader, reader_writer = await asyncio.open_connection(sock=left)
+    writer_reader, writer = await asyncio.open_connection(sock=right)
+    return reader, writer, (reader_writer, writer_reader)
+
+
+async def close(*writers):
+    for writer in writers:
+        writer.close()
+    for writer in writers:
+        await writer.wait_closed()
+
+
+def reader_for(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+@pytest.mark.parametrize("offload_threshold", [None, 0, 4096])
+def test_round_trip_over_a_socket(offload_threshold):
+    async def main():
+        reader, writer, (reader_writer, _) = await pipe()
+
+        async def send():
+            await AsyncJSONCodec.encode(log(), writer, chunk_size=1024, offload_threshold=offload_threshold)
+            writer.close()
+
+        sent, received = await asyncio.gather(
+            send(), AsyncJSONCodec.decode(reader, chunk_size=1024, offload_threshold=offload_threshold))
+        await close(writer, reader_writer)
+        return received
+
+    assert asyncio.run(main()) == log()
+
+
+def test_encode_respects_backpressure_and_yields():
+    async def main():
+        reader, writer, (reader_writer, _) = await pipe()
+        writer.transport.set_write_buffer_limits(high=4096)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        send = asyncio.create_task(AsyncJSONCodec.encode(log(20000), writer, chunk_size=2048, offload_threshold=None))
+        await asyncio.sleep(0.05)
+        # Nobody reads, so the writer waits in drain() with a bounded buffer.
+        assert not send.done()
+        assert writer.transport.get_write_buffer_size() < 4096 + 2048 * 2
+        data = await reader.read(1 << 30)
+        while not send.done():
+            data += await reader.read(1 << 30)
+        await send
+        writer.close()
+        data += await reader.read()
+        task.cancel()
+        await close(writer, reader_writer)
+        return data, ticks
+
+    data, ticks = asyncio.run(main())
+    assert data.decode() == JSONCodec.encode(log(20000))
+    assert ticks > 10
+
+
+@pytest.mark.parametrize("offload_threshold", [None, 100])
+def test_iterdecode_yields_elements_as_they_arrive(offload_threshold):
+    readings = log(50).readings
+    data = ("[" + ", ".join(JSONCodec.encode(r) for r in readings) + "]").encode()
+
+    async def main():
+        return [r async for r in AsyncJSONCodec.iterdecode(reader_for(data), chunk_size=64,
+                                                           offload_threshold=offload_threshold)]
+
+    assert asyncio.run(main()) == readings
+
+
+def test_decode_with_schema_and_errors():
+    async def main(data, **kwargs):
+        return await AsyncJSONCodec.decode(reader_for(data), **kwargs)
+
+    assert asyncio.run(main(b'{"sensor": "a", "values": [1]}', schema=Reading)) == Reading("a", [1])
+    with pytest.raises(ValueError):
+        asyncio.run(main(b'[1, 2'))
+    with pytest.raises(DecodingError):
+        asyncio.run(main(b'["x"]', schema=list[int]))
+
+
+def test_chunks_split_long_pieces():
+    parts = ["ab", "c" * 10, "", "d", "efghij"]
+    chunks = list(_chunks(parts, 4))
+    assert b"".join(chunks) == "".join(parts).encode()
+    assert [len(chunk) for chunk in chunks] == [4, 4, 4, 4, 3]
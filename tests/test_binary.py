@@ -0,0 +1,94 @@
+import json
+import math
+import pytest
+from codable.formats.binary import BinaryCodec, MAGIC
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoEncodable, AutoDecodable, DecodingError, EncodingError
+
+
+class BinPoint(AutoEncodable, AutoDecodable):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class BinShape(AutoEncodable, AutoDecodable):
+    def __init__(self, name, points, extra):
+        self.name = name
+        self.points = points
+        self.extra = extra
+
+
+def shape():
+    extra = {
+        "ints": [0, -1, 127, -128, 300, -70000, 2 ** 40, -2 ** 63, 2 ** 80, -2 ** 90],
+        "floats": [0.5, -1e300, math.inf],
+        "flags": [True, False, None],
+        "text": "héllo \U0001f600",
+        1: "int key",
+        2.5: "float key",
+        None: "none key",
+        "tuple": (1, 2),
+        "nested": {"deep": [BinPoint(5, 6)]},
+    }
+    return BinShape("tri", [BinPoint(0, 0), BinPoint(1, 0), BinPoint(0, 1)], extra)
+
+
+def test_round_trip_matches_json():
+    obj = shape()
+    data = BinaryCodec.encode(obj)
+    assert data.startswith(MAGIC)
+    assert BinaryCodec.loads(data) == json.loads(JSONCodec.encode(obj))
+    decoded = BinaryCodec.decode(data)
+    assert decoded.points == obj.points
+    assert decoded.extra["nested"]["deep"] == [BinPoint(5, 6)]
+    assert decoded.extra["1"] == "int key"
+    assert decoded.extra["null"] == "none key"
+
+
+def test_nan_round_trips():
+    value = BinaryCodec.decode(BinaryCodec.encode(BinPoint(math.nan, 1))).x
+    assert math.isnan(value)
+
+
+def test_bytes_are_kept_raw():
+    decoded = BinaryCodec.decode(BinaryCodec.encode(BinPoint(b"\x00\xff", bytearray(b"ab"))))
+    assert decoded.x == b"\x00\xff"
+    assert decoded.y == b"ab"
+
+
+def test_keys_and_type_names_are_stored_once():
+    points = BinShape("many", [BinPoint(i, i) for i in range(100)], {})
+    data = BinaryCodec.encode(points)
+    assert data.count(b"BinPoint") == 1
+    assert len(data) < len(JSONCodec.encode(points)) / 3
+
+
+def test_unserialisable_value_reports_keypath():
+    with pytest.raises(EncodingError) as exc_info:
+        BinaryCodec.encode(BinShape("bad", [BinPoint(0, object())], {}))
+    assert exc_info.value.keypath == ["points", 0, "y"]
+
+
+def test_decode_matches_json_decode():
+    # The type name is a single symbol; renaming it leaves every point an
+    # unknown tagged dict.
+    data = BinaryCodec.encode(shape()).replace(b"BinPoint", b"NoSuchCl")
+    decoded = BinaryCodec.decode(data)
+    assert decoded.points[1] == {"x": 1, "y": 0, "__type__": "NoSuchCl"}
+    assert JSONCodec.encode(decoded) == JSONCodec.encode(JSONCodec.decode_object(BinaryCodec.loads(data)))
+    for options in [{"columnar": True}, {"references": True}, {"type_tags": "id"}]:
+        data = BinaryCodec.encode(shape(), **options)
+        assert JSONCodec.encode(BinaryCodec.decode(data)) == JSONCodec.encode(shape())
+    with pytest.raises(DecodingError):
+        BinaryCodec.decode(BinaryCodec.encode(BinPoint(1, 2)).replace(b"BinPoint", b"NoSuchCl"))
+
+
+def test_corrupt_documents_raise_decoding_error():
+    data = BinaryCodec.encode(shape())
+    with pytest.raises(DecodingError):
+        BinaryCodec.decode(b"nope" + data[4:])
+    with pytest.raises(DecodingError):
+        BinaryCodec.decode(data[:-5])
+    with pytest.raises(DecodingError):
+        BinaryCodec.decode(data + b"\x00")
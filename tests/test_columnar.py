@@ -0,0 +1,143 @@
+import io
+import json
+import pytest
+from codable.columnar import COLUMNAR_KEY
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.formats.sample_json import JSONFooCodec
+from codable.literal import LITERAL_KEY
+from codable.serialization import AutoCodable, Codable, DecodingError
+
+
+class ColSample(AutoCodable):
+    t: int
+    value: float
+
+    def __init__(self, t, value):
+        self.t = t
+        self.value = value
+
+
+class ColPoint(AutoCodable):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class ColSeries(AutoCodable):
+    samples: list[ColSample]
+
+    def __init__(self, name, samples):
+        self.name = name
+        self.samples = samples
+
+
+class ColCustom(Codable):
+    def __init__(self, n):
+        self.n = n
+
+    def encode(self, container):
+        container.encode("n", self.n)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode("n"))
+
+    def __eq__(self, other):
+        return isinstance(other, ColCustom) and other.n == self.n
+
+
+def series(count=10):
+    return ColSeries("s", [ColSample(i, i * 0.5) for i in range(count)])
+
+
+def test_homogeneous_lists_become_columns():
+    data = json.loads(JSONCodec.encode(series(), columnar=True))
+    assert data["samples"] == {
+        COLUMNAR_KEY: "ColSample",
+        "__keys__": ["t", "value"],
+        "__values__": [list(range(10)), [i * 0.5 for i in range(10)]],
+    }
+    assert len(JSONCodec.encode(series(1000), columnar=True)) * 3 < len(JSONCodec.encode(series(1000)))
+
+
+@pytest.mark.parametrize("round_trip", [
+    lambda obj: JSONCodec.decode(JSONCodec.encode(obj, columnar=True)),
+    lambda obj: JSONCodec.decode(''.join(JSONCodec.iterencode(obj, columnar=True))),
+    lambda obj: BinaryCodec.decode(BinaryCodec.encode(obj, columnar=True)),
+])
+def test_round_trip(round_trip):
+    obj = ColSeries("nested", [ColPoint([1, {"k": ColPoint(0, 0)}], ColPoint(i, -i)) for i in range(6)])
+    assert round_trip(series()) == series()
+    assert round_trip(obj) == obj
+    customs = ColSeries("custom", [ColCustom(i) for i in range(5)])
+    assert round_trip(customs).samples == customs.samples
+
+
+def test_streaming_output_matches_encode():
+    obj = ColSeries("s", [ColPoint(ColPoint(i, i), [i]) for i in range(8)])
+    assert ''.join(JSONCodec.iterencode(obj, columnar=True)) == JSONCodec.encode(obj, columnar=True)
+
+
+def test_mixed_or_short_lists_stay_rows():
+    mixed = [ColPoint(1, 2)] * 4 + [ColSample(1, 1.0)]
+    ragged = [ColPoint(1, 2) for _ in range(4)]
+    ragged[2].z = 3
+    for samples in (mixed, ragged, [ColPoint(1, 2)] * 3, [1, 2, 3, 4, 5]):
+        data = json.loads(JSONCodec.encode(ColSeries("s", samples), columnar=True))
+        assert isinstance(data["samples"], list)
+
+
+def test_schema_and_untagged_columns():
+    text = JSONCodec.encode(series(), type_tags='none', columnar=True)
+    assert json.loads(text)["samples"][COLUMNAR_KEY] is None
+    assert JSONCodec.decode(text, schema=ColSeries).samples == series().samples
+    assert JSONCodec.decode(text)["samples"] == [{"t": s.t, "value": s.value} for s in series().samples]
+
+
+def test_malformed_columns_are_rejected():
+    bad = '{"__type__": "ColSeries", "name": "s", "samples": {"__columnar__": "ColSample", ' \
+          '"__keys__": ["t", "value"], "__values__": [[1, 2], [0.5]]}}'
+    with pytest.raises(DecodingError) as exc_info:
+        JSONCodec.decode(bad)
+    assert exc_info.value.keypath == ["samples"]
+
+
+@pytest.mark.parametrize("round_trip", [
+    lambda obj: JSONCodec.decode(JSONCodec.encode(obj, columnar=True)),
+    lambda obj: JSONCodec.decode(''.join(JSONCodec.iterencode(obj, columnar=True))),
+    lambda obj: JSONCodec.decode(JSONCodec.encode(obj, columnar=True), iterative=True),
+    lambda obj: JSONCodec.decode(JSONFooCodec.encode(obj)),
+    lambda obj: JSONCodec.decode(JSONCodec.encode(obj, columnar=True), select=['*']),
+    lambda obj: BinaryCodec.decode(BinaryCodec.encode(obj, columnar=True)),
+    lambda obj: ColSeries(list(JSONCodec.decode_lazy(JSONCodec.encode(obj).encode()).name), obj.samples),
+])
+def test_user_dicts_with_reserved_keys_round_trip(round_trip):
+    dicts = [{COLUMNAR_KEY: 1}, {LITERAL_KEY: {COLUMNAR_KEY: "x"}, "k": [ColPoint(1, 2)]}, {LITERAL_KEY: 1}]
+    obj = ColSeries(dicts, [ColSample(i, dicts[i % 3]) for i in range(6)])
+    decoded = round_trip(obj)
+    assert decoded.name == dicts
+    assert [s.value for s in decoded.samples] == [s.value for s in obj.samples]
+
+
+def test_reserved_keys_are_wrapped():
+    data = json.loads(JSONCodec.encode(ColPoint({COLUMNAR_KEY: 1}, 0)))
+    assert data["x"] == {LITERAL_KEY: {COLUMNAR_KEY: 1}}
+    with pytest.raises(DecodingError) as exc_info:
+        JSONCodec.decode('{"__type__": "ColPoint", "x": {"__literal__": {}, "z": 1}, "y": 0}')
+    assert exc_info.value.keypath == ["x"]
+
+
+class ColNotes(AutoCodable):
+    notes: dict
+    rows: list[dict]
+
+    def __init__(self, notes, rows):
+        self.notes = notes
+        self.rows = rows
+
+
+def test_schema_decodes_wrapped_dicts():
+    notes = {COLUMNAR_KEY: 1, LITERAL_KEY: {COLUMNAR_KEY: 2}}
+    decoded = JSONCodec.decode(JSONCodec.encode(ColNotes(notes, [notes, {}])), schema=ColNotes)
+    assert (decoded.notes, decoded.rows) == (notes, [notes, {}])
@@ -0,0 +1,101 @@
+import pickle
+from codable.plans import _frozen_hashes, frozen_hash, generic_eq, generic_hash
+from codable.serialization import AutoCodable
+
+
+class CmpPoint(AutoCodable):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class CmpPoint3(CmpPoint):
+    def __init__(self, x, y, z):
+        super().__init__(x, y)
+        self.z = z
+
+
+class CmpSlotted(AutoCodable):
+    __slots__ = ('a', 'b', '__dict__')
+
+    def __init__(self, a, **extra):
+        self.a = a
+        self.__dict__.update(extra)
+
+
+class CmpUnit(AutoCodable):
+    __frozen__ = True
+
+    def __init__(self, symbol, scale):
+        self.symbol = symbol
+        self.scale = scale
+
+
+class CmpSlottedUnit(AutoCodable):
+    __slots__ = ('symbol',)
+    __frozen__ = True
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+
+def test_private_attributes_are_ignored():
+    a, b = CmpPoint(1, 2), CmpPoint(1, 2)
+    a._cache = "x"
+    assert a == b and b == a
+    assert hash(a) == hash(b)
+    assert CmpPoint(1, 2) != CmpPoint(1, 3)
+    assert CmpPoint(1, 2) != (1, 2)
+
+
+def test_semantics_match_the_generic_path():
+    pairs = [
+        (CmpPoint(1, 2), CmpPoint3(1, 2, 3)),
+        (CmpPoint3(1, 2, 3), CmpPoint(1, 2)),
+        (CmpSlotted(1), CmpSlotted(1, b=2)),
+        (CmpSlotted(1, c=3), CmpSlotted(1, c=4)),
+        (CmpPoint(1, [2]), CmpPoint(1.0, [2])),
+    ]
+    for a, b in pairs:
+        assert a.__eq__(b) == generic_eq(a.__class__, a, b)
+
+
+def test_hash_ignores_attribute_order():
+    a = CmpPoint(1, 2)
+    b = CmpPoint.__new__(CmpPoint)
+    b.y = 2
+    b.x = 1
+    assert a == b and hash(a) == hash(b) == generic_hash(CmpPoint, b)
+    slotted = CmpSlotted(1, c=3)
+    assert hash(slotted) == generic_hash(CmpSlotted, slotted)
+    assert len({a, b, CmpPoint(2, 1)}) == 2
+
+
+def test_layout_changes_and_odd_keys():
+    a, b = CmpPoint(1, 2), CmpPoint(1, 2)
+    setattr(a, 'not an identifier', 5)
+    assert a != b and b == a
+    setattr(b, 'not an identifier', 5)
+    assert a == b and hash(a) == hash(b)
+    del a.x
+    assert b != a
+
+
+def test_frozen_classes_cache_their_hash():
+    unit = CmpUnit("kg", 1000)
+    state = dict(vars(unit))
+    value = hash(unit)
+    assert frozen_hash(unit) == value == hash(CmpUnit("kg", 1000))
+    assert vars(unit) == state and list(vars(unit)) == list(state)
+    assert unit == CmpUnit("kg", 1000)
+    copy = pickle.loads(pickle.dumps(unit))
+    assert vars(copy) == state and frozen_hash(copy) is None
+    assert copy == unit and hash(copy) == value
+    key = id(unit)
+    del unit
+    assert frozen_hash(copy) == value and key not in _frozen_hashes
+
+
+def test_frozen_classes_without_weak_references_hash_every_time():
+    unit = CmpSlottedUnit("m")
+    assert hash(unit) == hash(CmpSlottedUnit("m")) and frozen_hash(unit) is None
@@ -0,0 +1,123 @@
+import pytest
+from codable.formats import json as json_format
+from codable.formats.json import JSONCodec, JSONKeyedDecodingContainer
+from codable.plans import clear_plans, decode_plan, _decode_plans
+from codable.serialization import AutoDecodable, AutoEncodable, has_default_decode, KeyedDecodingContainer
+
+
+class DecodePlanItem(AutoEncodable, AutoDecodable):
+    def __init__(self, name, qty):
+        self.name = name
+        self.qty = qty
+
+
+class DecodePlanOrder(AutoEncodable, AutoDecodable):
+    def __init__(self, order_id, items, meta):
+        self.order_id = order_id
+        self.items = items
+        self.meta = meta
+
+
+class DecodePlanCelsius(AutoEncodable, AutoDecodable):
+    def __init__(self, degrees):
+        self.degrees = degrees
+
+    @property
+    def degrees(self):
+        return self._degrees
+
+    @degrees.setter
+    def degrees(self, value):
+        self._degrees = float(value)
+
+
+class DecodePlanCustom(AutoEncodable, AutoDecodable):
+    @classmethod
+    def decode(cls, container: KeyedDecodingContainer):
+        obj = cls.__new__(cls)
+        obj.name = container.decode("name").upper()
+        return obj
+
+
+def test_default_decode_detection():
+    assert has_default_decode(DecodePlanItem)
+    assert not has_default_decode(DecodePlanCustom)
+
+
+def test_fast_path_skips_container(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("container should not be built")
+    monkeypatch.setattr(json_format, "JSONKeyedDecodingContainer", fail)
+    obj = JSONCodec.decode('{"name": "bolt", "qty": 3, "__type__": "DecodePlanItem"}')
+    assert obj.__dict__ == {"name": "bolt", "qty": 3}
+
+
+def test_nested_objects_are_decoded():
+    order = DecodePlanOrder(7, [DecodePlanItem("bolt", 3)], {"item": DecodePlanItem("nut", 1)})
+    data = ('{"order_id": 7, "items": [{"name": "bolt", "qty": 3, "__type__": "DecodePlanItem"}], '
+            '"meta": {"item": {"name": "nut", "qty": 1, "__type__": "DecodePlanItem"}}, "__type__": "DecodePlanOrder"}')
+    decoded = JSONCodec.decode(data)
+    assert isinstance(decoded, DecodePlanOrder)
+    assert decoded.items == order.items
+    assert decoded.meta == order.meta
+
+
+def layouts(cls):
+    return [key[1] for key in _decode_plans.plans if key[0] is cls]
+
+
+def test_plan_is_cached_per_layout():
+    clear_plans(DecodePlanItem)
+    data = {"name": "bolt", "qty": 3, "__type__": "DecodePlanItem"}
+    decode_plan(DecodePlanItem)(data, None, None)
+    plan = decode_plan(DecodePlanItem)
+    assert plan is decode_plan(DecodePlanItem)
+    assert plan(dict(data), None, None) == DecodePlanItem("bolt", 3)
+    assert layouts(DecodePlanItem) == [("name", "qty", "__type__")]
+
+
+def test_plan_switches_layout():
+    clear_plans(DecodePlanItem)
+    plan = decode_plan(DecodePlanItem)
+    assert plan({"name": "bolt", "qty": 3}, None, None).__dict__ == {"name": "bolt", "qty": 3}
+    # Same size, different keys: the guard must not reuse the first plan.
+    assert decode_plan(DecodePlanItem)({"name": "bolt", "size": 3}, None, None).__dict__ == {"name": "bolt", "size": 3}
+    assert decode_plan(DecodePlanItem)({"name": "bolt", "_qty": 3}, None, None).__dict__ == {"name": "bolt"}
+    assert decode_plan(DecodePlanItem)({}, None, None).__dict__ == {}
+    assert len(layouts(DecodePlanItem)) == 4
+
+
+def test_attributes_follow_document_key_order():
+    clear_plans(DecodePlanItem)
+    first = JSONCodec.decode('{"name": "bolt", "qty": 3, "__type__": "DecodePlanItem"}')
+    second = JSONCodec.decode('{"qty": 4, "name": "nut", "__type__": "DecodePlanItem"}')
+    assert list(vars(first)) == ["name", "qty"]
+    assert list(vars(second)) == ["qty", "name"]
+    assert JSONCodec.encode(second) == '{"qty": 4, "name": "nut", "__type__": "DecodePlanItem"}'
+    assert len(layouts(DecodePlanItem)) == 2
+
+
+def test_private_keys_are_skipped():
+    obj = JSONCodec.decode('{"name": "bolt", "_secret": 1, "qty": 3, "__type__": "DecodePlanItem"}')
+    assert obj.__dict__ == {"name": "bolt", "qty": 3}
+
+
+def test_data_descriptors_are_assigned_with_setattr():
+    obj = JSONCodec.decode('{"degrees": 21, "__type__": "DecodePlanCelsius"}')
+    assert obj.degrees == 21.0
+    assert isinstance(obj.degrees, float)
+
+
+def test_container_path_matches_fast_path():
+    data = {"name": "bolt", "qty": 3, "__type__": "DecodePlanItem"}
+    obj = DecodePlanItem.decode(JSONKeyedDecodingContainer(data))
+    assert obj == JSONCodec.decode('{"name": "bolt", "qty": 3, "__type__": "DecodePlanItem"}')
+
+
+def test_custom_decode_uses_container():
+    obj = JSONCodec.decode('{"name": "bolt", "__type__": "DecodePlanCustom"}')
+    assert obj.name == "BOLT"
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
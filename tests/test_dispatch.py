@@ -0,0 +1,91 @@
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec, _encoders
+from codable.serialization import AutoEncodable, AutoDecodable, EncodingError, custom_type_registry
+
+
+class Invoice(AutoEncodable, AutoDecodable):
+    def __init__(self, issued, total, ref):
+        self.issued = issued
+        self.total = total
+        self.ref = ref
+
+
+@pytest.fixture(autouse=True)
+def foreign_types():
+    custom_type_registry.register(
+        datetime,
+        encoder=lambda value, container: container.encode('iso', value.isoformat()),
+        decoder=lambda container: datetime.fromisoformat(container.decode('iso')))
+    custom_type_registry.register(
+        Decimal,
+        encoder=lambda value, container: container.encode('value', str(value)),
+        decoder=lambda container: Decimal(container.decode('value')))
+    custom_type_registry.register(
+        UUID,
+        encoder=lambda value, container: container.encode('hex', value.hex),
+        decoder=lambda container: UUID(container.decode('hex')))
+    yield
+    for cls in (datetime, Decimal, UUID):
+        custom_type_registry.unregister(cls)
+
+
+def invoice():
+    return Invoice(datetime(2024, 5, 1, 12, 30), Decimal("19.99"),
+                   [UUID(int=7), {"nested": Decimal("0.1")}])
+
+
+def test_foreign_types_encode_as_tagged_objects():
+    data = json.loads(JSONCodec.encode(invoice()))
+    assert data["issued"] == {"iso": "2024-05-01T12:30:00", "__type__": "datetime"}
+    assert data["ref"][1]["nested"] == {"value": "0.1", "__type__": "Decimal"}
+
+
+@pytest.mark.parametrize("round_trip", [
+    lambda obj: JSONCodec.decode(JSONCodec.encode(obj)),
+    lambda obj: JSONCodec.decode(''.join(JSONCodec.iterencode(obj))),
+    lambda obj: next(JSONCodec.iterdecode(io.StringIO(JSONCodec.encode(obj)))),
+    lambda obj: BinaryCodec.decode(BinaryCodec.encode(obj)),
+])
+def test_foreign_types_round_trip(round_trip):
+    assert round_trip(invoice()) == invoice()
+
+
+def test_registering_a_type_invalidates_the_dispatch_table():
+    class Celsius(float):
+        pass
+
+    assert json.loads(JSONCodec.encode(Invoice(Celsius(1.5), 0, None)))["issued"] == 1.5
+    assert Celsius in _encoders
+    custom_type_registry.register(
+        Celsius,
+        encoder=lambda value, container: container.encode('c', float(value)),
+        decoder=lambda container: Celsius(container.decode('c')))
+    assert Celsius not in _encoders
+    try:
+        decoded = JSONCodec.decode(JSONCodec.encode(Invoice(Celsius(1.5), 0, None)))
+        assert type(decoded.issued) is Celsius
+    finally:
+        custom_type_registry.unregister(Celsius)
+    assert Celsius not in _encoders
+    assert json.loads(JSONCodec.encode(Invoice(Celsius(1.5), 0, None)))["issued"] == 1.5
+
+
+def test_unregistered_types_still_fail_with_keypath():
+    with pytest.raises(EncodingError) as exc_info:
+        JSONCodec.encode(Invoice(None, {1, 2}, None))
+    assert exc_info.value.keypath == ["total"]
+
+
+@pytest.mark.parametrize("value", [b"\x00\xffraw", bytearray(b"abc")])
+def test_bytes_round_trip_through_json_as_base64(value):
+    data = JSONCodec.encode(Invoice(value, 0, None))
+    assert json.loads(data)["issued"]["base64"]
+    decoded = JSONCodec.decode(data).issued
+    assert decoded == value and type(decoded) is type(value)
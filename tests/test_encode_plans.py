@@ -0,0 +1,79 @@
+import pytest
+from codable.formats.json import JSONCodec
+from codable import plans
+from codable.plans import clear_plans, generic_encode, plan_count
+from codable.serialization import AutoEncodable, AutoDecodable
+
+
+class PlanPoint(AutoEncodable, AutoDecodable):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self._cache = None
+
+
+class PlanPointSubclass(PlanPoint):
+    def __init__(self, x, y, z):
+        super().__init__(x, y)
+        self.z = z
+
+
+class RecordingContainer:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, key, value):
+        self.calls.append((key, value))
+
+
+def test_plan_matches_generic_encoding():
+    obj = PlanPoint(1, 2)
+    obj.extra = "three"
+    planned = RecordingContainer()
+    generic = RecordingContainer()
+    obj.encode(planned)
+    generic_encode(obj, generic)
+    assert planned.calls == generic.calls == [("x", 1), ("y", 2), ("extra", "three")]
+
+
+def test_plan_is_cached_per_class_and_layout():
+    clear_plans(PlanPoint)
+    PlanPoint(1, 2).encode(RecordingContainer())
+    PlanPoint(3, 4).encode(RecordingContainer())
+    assert plan_count(PlanPoint) == 1
+
+    PlanPointSubclass(1, 2, 3).encode(RecordingContainer())
+    assert plan_count(PlanPoint) == 1
+    assert plan_count(PlanPointSubclass) == 1
+
+
+def test_new_layout_builds_new_plan():
+    clear_plans(PlanPoint)
+    obj = PlanPoint(1, 2)
+    obj.encode(RecordingContainer())
+    obj.label = "moved"
+    container = RecordingContainer()
+    obj.encode(container)
+    assert container.calls == [("x", 1), ("y", 2), ("label", "moved")]
+    assert plan_count(PlanPoint) == 2
+
+
+def test_plan_limit_falls_back_to_generic(monkeypatch):
+    clear_plans(PlanPoint)
+    monkeypatch.setattr(plans, "MAX_PLANS", len(plans._encode_plans) + 2)
+    for i in range(4):
+        obj = PlanPoint(i, i)
+        setattr(obj, f"attr{i}", i)
+        container = RecordingContainer()
+        obj.encode(container)
+        assert container.calls == [("x", i), ("y", i), (f"attr{i}", i)]
+    assert plan_count(PlanPoint) == 2
+
+
+def test_encoded_json_is_unchanged():
+    obj = PlanPoint(1, "two")
+    assert JSONCodec.encode(obj) == '{"x": 1, "y": "two", "__type__": "PlanPoint"}'
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
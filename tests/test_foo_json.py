@@ -1,19 +1,21 @@
+import io
 import pytest
+from codable.formats.json import JSONCodec
 from codable.formats.sample_json import JSONFooCodec
-from codable.serialization import AutoDecodable, AutoEncodable
+from codable.serialization import AutoCodable, AutoDecodable, AutoEncodable, Codable, EncodingError
 
 
-class AutoEncodableClassForTesting(AutoEncodable, AutoDecodable):
+class FooAutoEncodableClassForTesting(AutoEncodable, AutoDecodable):
     def __init__(self, name, value):
         self.name = name
         self.value = value
         self.l = ['one', 'two', 'three']
 
     def __str__(self):
-        return f"AutoEncodableClassForTesting ({self.name}: {self.value})"
+        return f"FooAutoEncodableClassForTesting ({self.name}: {self.value})"
 
     def __repr__(self):
-        return f"AutoEncodableClassForTesting ({self.name}: {self.value})"
+        return f"FooAutoEncodableClassForTesting ({self.name}: {self.value})"
     
     def __eq__(self, other):
         return self.name == other.name and self.value == other.value
@@ -22,11 +24,73 @@ class AutoEncodableClassForTesting(AutoEncodable, AutoDecodable):
         return hash((self.name, self.value))
 
 def test_encodable_serialization():
-    obj = AutoEncodableClassForTesting(name="test", value=123)
+    obj = FooAutoEncodableClassForTesting(name="test", value=123)
     encoded_obj = JSONFooCodec.encode(obj)
-    expected_json = '{"name": "test", "value": 123, "l": ["one", "two", "three"], "__type__": "AutoEncodableClassForTesting"}'
+    expected_json = '{"name": "test", "value": 123, "l": ["one", "two", "three"], "__type__": "FooAutoEncodableClassForTesting"}'
     assert encoded_obj == expected_json
 
 
+class FooNumbers(AutoCodable):
+    def __init__(self, floats, flags, text, nested=None):
+        self.floats = floats
+        self.flags = flags
+        self.text = text
+        self.nested = nested
+        self.empty = {}
+
+
+class FooHand(Codable):
+    def __init__(self, items):
+        self.items = items
+
+    def encode(self, container):
+        container.encode("items", self.items)
+        container.encode(3, None)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode("items"))
+
+
+def numbers():
+    return FooNumbers(
+        [1.5, -0.0, 1e300, float('nan'), float('inf'), -float('inf')],
+        [True, False, None, 1, 2.5],
+        'quote " backslash \\ tab \t caf\u00e9 \U0001f600',
+        FooHand([(1, 'a'), {'k': [FooNumbers([], [], '')]}, {1.5: True}]))
+
+
+@pytest.mark.parametrize("type_tags", ['name', 'qualified', 'none'])
+def test_matches_json_codec(type_tags):
+    obj = numbers()
+    text = JSONFooCodec.encode(obj, type_tags=type_tags)
+    assert text == JSONCodec.encode(obj, type_tags=type_tags)
+    assert '"floats": [1.5, -0.0, 1e+300, NaN, Infinity, -Infinity]' in text
+    assert '"flags": [true, false, null, 1, 2.5]' in text
+
+
+def test_dump_to_text_and_binary_streams():
+    obj = numbers()
+    text, binary = io.StringIO(), io.BytesIO()
+    JSONFooCodec.dump(obj, text)
+    JSONFooCodec.dump(obj, binary)
+    assert text.getvalue() == binary.getvalue().decode('ascii') == JSONFooCodec.encode(obj)
+
+
+def test_errors_carry_the_keypath():
+    obj = numbers()
+    obj.nested.items[1]['k'].append(object())
+    with pytest.raises(EncodingError) as info:
+        JSONFooCodec.encode(obj)
+    assert info.value.keypath == ['nested', 'items', 1, 'k', 1]
+    with pytest.raises(TypeError):
+        JSONFooCodec.encode({'not': 'encodable'})
+
+
+def test_decode_round_trip():
+    obj = FooAutoEncodableClassForTesting(name="test", value=123)
+    assert JSONFooCodec.decode(JSONFooCodec.encode(obj)) == obj
+
+
 if __name__ == '__main__':
     pytest.main(["-s"])
\ No newline at end of file
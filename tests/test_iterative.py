@@ -0,0 +1,115 @@
+import json
+import sys
+import pytest
+from codable.formats.iterative import _parse, _write
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoCodable, Codable, DecodingError, EncodingError
+
+DEPTH = 3000
+
+
+class IterLink(AutoCodable):
+    def __init__(self, value, next=None):
+        self.value = value
+        self.next = next
+
+
+class IterBox(Codable):
+    def __init__(self, label, items):
+        self.label = label
+        self.items = items
+
+    def encode(self, container):
+        container.encode("label", self.label)
+        container.encode("items", self.items)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode("label"), container.decode("items"))
+
+
+class IterPoint(AutoCodable):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def chain(depth):
+    node = None
+    for i in range(depth):
+        node = IterLink(i, IterBox(f"b{i}", [node, {"k": [i, 0.5]}]))
+    return node
+
+
+def depth_of(node):
+    depth = 0
+    while node is not None:
+        depth += 1
+        node = node.next.items[0]
+    return depth
+
+
+def sample():
+    shared = IterPoint(1, 2)
+    return IterBox("sample", [
+        [IterPoint(i, float(i) / 3) for i in range(6)],
+        {1: True, "nan": float('nan'), "text": 'tab\t "quoted" café'},
+        (shared, shared, b"\x00\xff", None),
+        chain(5),
+    ])
+
+
+def test_documents_deeper_than_the_recursion_limit():
+    limit = sys.getrecursionlimit()
+    obj = chain(DEPTH)
+    with pytest.raises((EncodingError, RecursionError)):
+        JSONCodec.encode(obj)
+    text = JSONCodec.encode(obj, iterative=True)
+    decoded = JSONCodec.decode(text, iterative=True)
+    assert depth_of(decoded) == DEPTH
+    assert decoded.next.items[1] == {"k": [DEPTH - 1, 0.5]}
+    assert JSONCodec.encode(decoded, iterative=True) == text
+    assert sys.getrecursionlimit() == limit
+
+
+@pytest.mark.parametrize("options", [{}, {'columnar': True}, {'references': True}, {'type_tags': 'none'}])
+def test_output_matches_the_recursive_path(options):
+    obj = sample()
+    text = JSONCodec.encode(obj, **options)
+    assert JSONCodec.encode(obj, iterative=True, **options) == text
+    assert JSONCodec.encode_object(obj, iterative=True, **options) == JSONCodec.encode_object(obj, **options)
+    if options.get('type_tags') != 'none':
+        decoded = JSONCodec.decode(text, iterative=True)
+        assert JSONCodec.encode(decoded, **options) == JSONCodec.encode(JSONCodec.decode(text), **options)
+    if options.get('references'):
+        assert decoded.items[2][0] is decoded.items[2][1]
+
+
+def test_fallback_writer_and_parser_match_json():
+    data = [{"a": [1, -2.5e-3, 1e300, None, True, False], "": {}, "e": []},
+            ["escapes \\ \" \n é 😀", float('inf'), -0.0], {"1": {"2": [[]]}}]
+    text = json.dumps(data)
+    assert ''.join(_write(data)) == text
+    assert _parse(text) == json.loads(text)
+    assert _parse(' \n[NaN, -Infinity, "x"] ')[1:] == [float('-inf'), "x"]
+    for bad in ['[1, 2', '{"a" 1}', '{"a": 1,}', '[1,]', '{1: 2}', '[1] x', '"\\q"', '[01]', '']:
+        with pytest.raises(json.JSONDecodeError) as expected:
+            json.loads(bad)
+        with pytest.raises(json.JSONDecodeError) as actual:
+            _parse(bad)
+        assert (actual.value.msg, actual.value.pos) == (expected.value.msg, expected.value.pos), bad
+
+
+def test_decode_keeps_unknown_tags_and_rejects_cycles():
+    data = {"__type__": "IterBox", "label": "x",
+            "items": [{"__type__": "NoSuchClass", "p": {"__type__": "IterPoint", "x": 1, "y": 2}}]}
+    decoded = JSONCodec.decode(json.dumps(data), iterative=True)
+    assert decoded.items == JSONCodec.decode(json.dumps(data)).items == data["items"]
+    a = IterLink(1)
+    a.next = IterBox("loop", [a])
+    text = JSONCodec.encode(a, references=True, iterative=True)
+    assert text == JSONCodec.encode(a, references=True)
+    with pytest.raises(DecodingError):
+        JSONCodec.decode(text, iterative=True)
+    with pytest.raises(ValueError):
+        JSONCodec.decode(text, schema=IterLink, iterative=True)
@@ -0,0 +1,86 @@
+import io
+import pytest
+from codable.formats.json import JSONCodec
+from codable.formats.jsonl import JSONLinesCodec
+from codable.serialization import AutoEncodable, AutoDecodable, DecodingError, EncodingError
+
+
+class LineEvent(AutoEncodable, AutoDecodable):
+    def __init__(self, kind, body):
+        self.kind = kind
+        self.body = body
+
+
+class CountingWriter(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def events(count):
+    return [LineEvent(f"kind-{i % 3}", {"n": i, "child": LineEvent("child", [i])}) for i in range(count)]
+
+
+def test_each_record_is_one_line():
+    text = JSONLinesCodec.encode(events(3))
+    lines = text.splitlines()
+    assert len(lines) == 3
+    assert lines[1] == JSONCodec.encode(events(3)[1])
+    assert text.endswith("\n")
+
+
+def test_round_trip_text_and_binary():
+    out = io.StringIO()
+    assert JSONLinesCodec.encode_many(events(10), out) == 10
+    assert list(JSONLinesCodec.decode_many(io.StringIO(out.getvalue()))) == events(10)
+
+    binary = io.BytesIO()
+    JSONLinesCodec.encode_many(iter(events(10)), binary)
+    binary.seek(0)
+    assert list(JSONLinesCodec.decode_many(binary)) == events(10)
+
+
+def test_writes_are_batched():
+    out = CountingWriter()
+    JSONLinesCodec.encode_many(events(25), out, batch_size=10)
+    assert out.writes == 3
+
+
+def test_blank_lines_are_skipped():
+    text = "\n" + JSONCodec.encode(events(1)[0]) + "\n\n   \n"
+    assert JSONLinesCodec.decode(text) == events(1)
+
+
+def test_decode_is_lazy():
+    lines = JSONLinesCodec.encode(events(2)).splitlines()
+    stream = io.StringIO(lines[0] + "\n{not json}\n")
+    iterator = JSONLinesCodec.decode_many(stream)
+    assert next(iterator) == events(1)[0]
+    with pytest.raises(DecodingError) as info:
+        next(iterator)
+    assert info.value.lineno == 2
+
+
+def test_decode_error_reports_line_and_path():
+    good = JSONCodec.encode(events(1)[0])
+    bad = '{"kind": "x", "body": {"__type__": "NoSuchLineType"}, "__type__": "NoSuchLineType"}'
+    with pytest.raises(DecodingError) as info:
+        JSONLinesCodec.decode("\n".join([good, good, bad]))
+    assert info.value.lineno == 3
+    assert "line 3" in str(info.value)
+
+
+def test_encode_error_reports_line_and_path():
+    objs = events(2) + [LineEvent("bad", {"when": object()})]
+    with pytest.raises(EncodingError) as info:
+        JSONLinesCodec.encode(objs)
+    assert info.value.lineno == 3
+    assert info.value.keypath == ["body", "when"]
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
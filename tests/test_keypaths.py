@@ -0,0 +1,96 @@
+import pytest
+from codable.formats.json import JSONCodec, JSONKeyedEncodingContainer, JSONKeyedDecodingContainer
+from codable.serialization import (
+    AutoEncodable,
+    AutoDecodable,
+    Encodable,
+    Decodable,
+    KeyedDecodingContainer,
+    KeyedEncodingContainer,
+    KeyPath,
+    CodingError,
+    DecodingError,
+    EncodingError,
+)
+
+
+class KeyPathLine(AutoEncodable, AutoDecodable):
+    def __init__(self, sku, extra=None):
+        self.sku = sku
+        self.extra = extra
+
+
+class KeyPathOrder(AutoEncodable, AutoDecodable):
+    def __init__(self, lines):
+        self.lines = lines
+
+
+class KeyPathStrict(Encodable, Decodable):
+    def __init__(self, code):
+        self.code = code
+
+    def encode(self, container: KeyedEncodingContainer):
+        if self.code is None:
+            raise ValueError("code is required")
+        container.encode("code", self.code)
+
+    @classmethod
+    def decode(cls, container: KeyedDecodingContainer):
+        return cls(container.data["code"])
+
+
+def test_keypath_round_trips_through_lists():
+    node = KeyPath.from_list(["orders", 0, "sku"])
+    assert node.to_list() == ["orders", 0, "sku"]
+    assert node.parent.parent.key == "orders"
+    assert KeyPath.from_list([]) is None
+
+
+def test_container_keypath_is_built_lazily():
+    container = JSONKeyedEncodingContainer(["root"])
+    assert isinstance(container._keypath, KeyPath)
+    assert container.keypath == ["root"]
+    assert JSONKeyedEncodingContainer().keypath == []
+
+
+def test_unsupported_value_reports_full_path():
+    order = KeyPathOrder([KeyPathLine("a"), KeyPathLine("b", extra={"when": {1, 2}})])
+    with pytest.raises(EncodingError) as info:
+        JSONCodec.encode(order)
+    assert info.value.keypath == ["lines", 1, "extra", "when"]
+    assert "lines[1].extra.when" in str(info.value)
+    assert isinstance(info.value, TypeError)
+
+
+def test_failing_encode_is_wrapped_with_path():
+    order = KeyPathOrder([KeyPathLine(KeyPathStrict(None))])
+    with pytest.raises(EncodingError) as info:
+        JSONCodec.encode(order)
+    assert info.value.keypath == ["lines", 0, "sku"]
+    assert isinstance(info.value.__cause__, ValueError)
+
+
+def test_failing_decode_is_wrapped_with_path():
+    data = ('{"lines": [{"sku": "a", "extra": null, "__type__": "KeyPathLine"}, '
+            '{"sku": {"__type__": "KeyPathStrict"}, "extra": null, "__type__": "KeyPathLine"}], '
+            '"__type__": "KeyPathOrder"}')
+    with pytest.raises(DecodingError) as info:
+        JSONCodec.decode(data)
+    assert info.value.keypath == ["lines", 1, "sku"]
+    assert isinstance(info.value.__cause__, KeyError)
+
+
+def test_decoding_container_passes_paths_down():
+    container = JSONKeyedDecodingContainer({"inner": {"code": {"__type__": "KeyPathStrict"}}}, ["top"])
+    with pytest.raises(CodingError) as info:
+        container.decode("inner")
+    assert info.value.keypath == ["top", "inner", "code"]
+
+
+def test_invalid_top_level_type_is_a_type_error():
+    with pytest.raises(TypeError):
+        JSONCodec.decode('{"__type__": "NoSuchKeyPathType"}')
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
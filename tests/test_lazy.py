@@ -0,0 +1,167 @@
+import json
+import pickle
+
+import pytest
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.formats.lazy import LazyDict, LazyList
+from codable.serialization import AutoCodable, Codable, DecodingError
+
+
+class Record(AutoCodable):
+    def __init__(self, id, name, tags):
+        self.id = id
+        self.name = name
+        self.tags = tags
+
+
+class SlottedRecord(AutoCodable):
+    __slots__ = ('id', 'note')
+
+    def __init__(self, id, note):
+        self.id = id
+        self.note = note
+
+
+class Archive(AutoCodable):
+    version = 1
+
+    def __init__(self, title, records, index):
+        self.title = title
+        self.records = records
+        self.index = index
+
+
+class Money(Codable):
+    def __init__(self, cents):
+        self.cents = cents
+
+    def encode(self, container):
+        container.encode('cents', self.cents)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode('cents'))
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and other.cents == self.cents
+
+
+def archive(count=5):
+    records = [Record(i, f"r{i}", ["a", {"k": [i]}]) for i in range(count)]
+    return Archive("box", records, {"first": records[0], "money": Money(250), "slotted": SlottedRecord(1, "x")})
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "archive.json"
+    path.write_text(JSONCodec.encode(archive()))
+    return path
+
+
+def test_lazy_decode_matches_eager_decode(path):
+    lazy = JSONCodec.decode_lazy(path)
+    assert isinstance(lazy, Archive)
+    assert type(lazy).__name__ == "Archive"
+    assert lazy == archive()
+    assert archive() == lazy
+
+
+def test_fields_are_decoded_on_access_and_cached(path):
+    lazy = JSONCodec.decode_lazy(str(path))
+    assert "title" not in vars(lazy)
+    assert lazy.title == "box"
+    assert vars(lazy)["title"] == "box"
+    records = lazy.records
+    assert isinstance(records, LazyList)
+    assert records[2].tags[1] == {"k": [2]}
+    assert records[2] is records[2]
+    assert records[-1].id == 4
+    assert [r.id for r in records[1:3]] == [1, 2]
+    assert len(records) == 5
+
+
+def test_dicts_slots_and_custom_types(path):
+    with open(path, "rb") as fp:
+        lazy = JSONCodec.decode_lazy(fp)
+    index = lazy.index
+    assert isinstance(index, LazyDict)
+    assert "money" in index and "missing" not in index
+    assert index["money"] == Money(250)
+    assert type(index["money"]) is Money
+    assert index["slotted"].note == "x"
+    assert sorted(index) == ["first", "money", "slotted"]
+
+
+def test_class_attribute_defaults_do_not_hide_fields():
+    data = json.loads(JSONCodec.encode(archive(1)))
+    data = {"version": 2, **data}
+    assert JSONCodec.decode_lazy(json.dumps(data).encode()).version == 2
+    del data["version"]
+    assert JSONCodec.decode_lazy(json.dumps(data).encode()).version == 1
+
+
+def test_unread_parts_are_not_parsed():
+    text = JSONCodec.encode(archive(2))
+    broken = text.replace('"r1"', '"r1" oops ]]]')
+    with pytest.raises(Exception):
+        JSONCodec.decode(broken)
+    lazy = JSONCodec.decode_lazy(broken.encode())
+    assert lazy.title == "box"
+    assert lazy.records[0].name == "r0"
+
+
+def test_tag_written_first_is_found():
+    lazy = JSONCodec.decode_lazy(b'{"__type__": "Record", "id": 1, "name": "n", "tags": []}')
+    assert isinstance(lazy, Record) and lazy.id == 1
+
+
+def test_missing_field_raises_attribute_error():
+    lazy = JSONCodec.decode_lazy(b'{"id": 1, "__type__": "Record"}')
+    with pytest.raises(AttributeError):
+        lazy.name
+
+
+def test_errors_report_offsets_and_keypaths():
+    lazy = JSONCodec.decode_lazy(b'{"title": "t", "records": [1, 2 3], "__type__": "Archive"}')
+    with pytest.raises(DecodingError) as exc_info:
+        lazy.records[2]
+    assert exc_info.value.keypath == ["records"]
+    with pytest.raises(DecodingError):
+        JSONCodec.decode_lazy(b"  ")
+
+
+def test_encode_and_pickle_load_everything(path):
+    assert JSONCodec.decode(JSONCodec.encode(JSONCodec.decode_lazy(path))) == archive()
+    restored = pickle.loads(pickle.dumps(JSONCodec.decode_lazy(path)))
+    assert type(restored) is Archive
+    assert type(restored.records) is list
+    assert restored == archive()
+
+
+@pytest.mark.parametrize("window", [8, 64, 1 << 20])
+def test_values_larger_than_the_scan_window(monkeypatch, window):
+    from codable.formats import lazy as lazy_module
+    monkeypatch.setattr(lazy_module, "_WINDOW", window)
+    obj = Archive("bøx ✓", [Record(i, "ünï" * i, [[1.25, -3e5], {"a]": "}"}]) for i in range(6)], {})
+    text = json.dumps(json.loads(JSONCodec.encode(obj)), ensure_ascii=False, indent=1)
+    lazy = JSONCodec.decode_lazy(text.encode("utf-8"))
+    assert lazy.records[5].name == "ünï" * 5
+    assert lazy == obj
+
+
+class LazyTagged(AutoCodable):
+    __type_id__ = 4711
+
+    def __init__(self, name, child):
+        self.name = name
+        self.child = child
+
+
+def test_proxies_keep_the_type_id_of_their_class():
+    doc = LazyTagged("a", [LazyTagged("b", None)])
+    text = JSONCodec.encode(doc, type_tags='id')
+    lazy = JSONCodec.decode_lazy(text.encode())
+    assert JSONCodec.encode(lazy, type_tags='id') == text
+    assert JSONCodec.encode(lazy.child[0], type_tags='id') == JSONCodec.encode(doc.child[0], type_tags='id')
+    assert BinaryCodec.encode(JSONCodec.decode_lazy(text.encode()), type_tags='id') == BinaryCodec.encode(doc, type_tags='id')
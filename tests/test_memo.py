@@ -0,0 +1,131 @@
+import json
+from collections import Counter, OrderedDict
+import pytest
+from codable import memo as memo_module
+from codable.decorators import auto_codable
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec, encode_memo
+from codable.serialization import AutoCodable, EncodingError
+
+
+class MemoCurrency(AutoCodable):
+    __frozen__ = True
+
+    def __init__(self, code, digits):
+        self.code = code
+        self.digits = digits
+
+
+@auto_codable(frozen=True)
+class MemoUnit:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+
+class MemoPrice(AutoCodable):
+    def __init__(self, amount, currency, unit=None):
+        self.amount = amount
+        self.currency = currency
+        self.unit = unit
+
+
+class MemoBasket(AutoCodable):
+    def __init__(self, prices):
+        self.prices = prices
+
+
+def basket():
+    return MemoBasket([MemoPrice(i, MemoCurrency("EUR", 2), MemoUnit("kg")) for i in range(10)])
+
+
+@pytest.fixture
+def memo():
+    encode_memo.resize(4)
+    yield encode_memo
+    encode_memo.resize(4096)
+
+
+def test_equal_objects_reuse_the_form(memo):
+    expected = json.dumps(JSONCodec.encode_object(basket()))
+    assert memo.info().hits == 18 and memo.info().misses == 2
+    memo.clear()
+    assert JSONCodec.encode(basket()) == expected
+    assert ''.join(JSONCodec.iterencode(basket())) == expected
+    assert memo.info().hits == 38
+    assert JSONCodec.decode(expected) == basket()
+    assert BinaryCodec.decode(BinaryCodec.encode(basket())) == basket()
+
+
+def test_lru_eviction(memo):
+    for code in ["A", "B", "C", "D", "A", "E", "F", "A"]:
+        JSONCodec.encode(MemoPrice(1, MemoCurrency(code, 2)))
+    info = memo.info()
+    assert (info.hits, info.misses, info.currsize, info.maxsize) == (2, 6, 4, 4)
+    JSONCodec.encode(MemoPrice(1, MemoCurrency("B", 2)))
+    assert memo.info().misses == 7
+
+
+def test_options_are_part_of_the_key(memo):
+    price = MemoPrice(1, MemoCurrency("EUR", 2))
+    assert json.loads(JSONCodec.encode(price, type_tags='none'))["currency"] == {"code": "EUR", "digits": 2}
+    assert json.loads(JSONCodec.encode(price))["currency"]["__type__"] == "MemoCurrency"
+    assert memo.info().misses == 2
+
+
+def test_equal_values_of_other_types_get_their_own_form(memo):
+    digits = [2, 2.0, True, 0.0, -0.0, [2], (2,), MemoUnit(2), MemoUnit(2.0)]
+    expected = [json.dumps(JSONCodec.encode_object(MemoCurrency("EUR", d))["digits"]) for d in digits]
+    memo.resize(None)
+    for _ in range(2):
+        encoded = [JSONCodec.encode(MemoPrice(1, MemoCurrency("EUR", d))) for d in digits]
+        assert [json.dumps(json.loads(text)["currency"]["digits"]) for text in encoded] == expected
+    assert memo.info().misses == len(digits) + 2
+
+
+def test_unfingerprintable_and_failing_objects_are_encoded_as_usual(memo):
+    price = MemoPrice(1, MemoCurrency(["EUR"], 2))
+    assert json.loads(JSONCodec.encode(price))["currency"]["code"] == ["EUR"]
+    price = MemoPrice(1, MemoCurrency("EUR", memoryview(b"2")))
+    assert json.loads(JSONCodec.encode(price))["currency"]["digits"] == JSONCodec.encode_object(price)["currency"]["digits"]
+    assert memo.info().currsize == 1
+
+
+class MemoCode(str):
+    pass
+
+
+def test_subclasses_of_builtin_types_are_not_memoized(memo):
+    for unit in (MemoUnit(OrderedDict(a=1)), MemoUnit(OrderedDict(b=2)), MemoUnit(MemoCode("kg")),
+                 MemoUnit(MemoCode("lb")), MemoUnit(Counter("ab")), MemoUnit(Counter("cd"))):
+        assert JSONCodec.encode(MemoPrice(1, unit)) == json.dumps(JSONCodec.encode_object(MemoPrice(1, unit)))
+        assert json.loads(JSONCodec.encode(MemoPrice(1, unit)))["currency"]["symbol"] == unit.symbol
+    assert memo.info().currsize == 0
+    with pytest.raises(EncodingError) as e:
+        JSONCodec.encode(MemoPrice(1, MemoCurrency("EUR", object())))
+    assert e.value.keypath == ["currency", "digits"]
+
+
+def test_references_bypass_the_memo(memo):
+    eur = MemoCurrency("EUR", 2)
+    decoded = JSONCodec.decode(JSONCodec.encode(MemoBasket([MemoPrice(1, eur), MemoPrice(2, eur)]), references=True))
+    assert decoded.prices[0].currency is decoded.prices[1].currency
+    assert memo.info().currsize == 0
+
+
+def test_returned_forms_can_be_modified(memo):
+    first = JSONCodec.encode_object(MemoPrice(1, MemoCurrency("EUR", 2)))
+    first["currency"]["code"] = "USD"
+    second = JSONCodec.encode_object(MemoPrice(1, MemoCurrency("EUR", 2)))
+    assert second["currency"]["code"] == "EUR" and memo.info().hits == 1
+    assert '"USD"' not in ''.join(JSONCodec.iterencode(MemoPrice(1, MemoCurrency("EUR", 2))))
+
+
+def test_instances_are_fingerprinted_once(memo, monkeypatch):
+    calls = []
+    fingerprint = memo_module.fingerprint
+    monkeypatch.setattr(memo_module, 'fingerprint', lambda value: calls.append(value) or fingerprint(value))
+    eur = MemoCurrency("EUR", 2)
+    basket = MemoBasket([MemoPrice(i, eur) for i in range(5)])
+    assert JSONCodec.encode(basket) == ''.join(JSONCodec.iterencode(basket))
+    assert JSONCodec.encode_object(basket)["prices"][4]["currency"]["code"] == "EUR"
+    assert calls == [eur] and memo.info().hits == 14
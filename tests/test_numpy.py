@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoCodable, EncodingError
+
+np = pytest.importorskip("numpy")
+
+
+class Frame(AutoCodable):
+    def __init__(self, name, pixels):
+        self.name = name
+        self.pixels = pixels
+
+
+CODECS = [JSONCodec, BinaryCodec]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("array", [
+    np.arange(12, dtype=np.float64).reshape(3, 4),
+    np.arange(6, dtype='>i4'),
+    np.array([[True, False]]),
+    np.zeros((0, 3), dtype=np.uint16),
+    np.array(3.5, dtype=np.float32),
+    np.arange(20, dtype=np.int16).reshape(4, 5)[:, ::2],
+    np.array([(1, 2.0), (3, 4.0)], dtype=[('a', '<i4'), ('b', '<f8', (1,))]),
+])
+def test_arrays_round_trip(codec, array):
+    decoded = codec.decode(codec.encode(Frame("f", array))).pixels
+    assert isinstance(decoded, np.ndarray)
+    assert decoded.dtype == array.dtype
+    assert decoded.shape == array.shape
+    assert np.array_equal(decoded, array)
+
+
+def test_json_stores_dtype_shape_and_base64():
+    data = json.loads(JSONCodec.encode(Frame("f", np.array([1, 2], dtype='<u1'))))
+    assert data["pixels"] == {"dtype": "|u1", "shape": [2],
+                              "data": {"base64": "AQI=", "__type__": "memoryview"}, "__type__": "ndarray"}
+
+
+def test_binary_stores_the_raw_buffer():
+    array = np.arange(1000, dtype='<f8')
+    data = BinaryCodec.encode(Frame("f", array))
+    assert array.tobytes() in data
+    assert len(data) < array.nbytes + 100
+
+
+def test_object_arrays_are_rejected():
+    with pytest.raises(EncodingError) as exc_info:
+        JSONCodec.encode(Frame("f", np.array([object()])))
+    assert exc_info.value.keypath == ["pixels"]
@@ -0,0 +1,78 @@
+import pickle
+import pytest
+from codable import parallel
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoEncodable, AutoDecodable, CustomTypeRegistry, DecodingError, custom_type_registry
+
+
+class BatchPoint(AutoEncodable, AutoDecodable):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def points(count):
+    return [BatchPoint(i, {"tags": [str(i)]}) for i in range(count)]
+
+
+def test_encode_batch_matches_serial_encoding(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_THRESHOLD", 1)
+    objs = points(40)
+    assert JSONCodec.encode_batch(objs, workers=2, chunksize=3) == [JSONCodec.encode(o) for o in objs]
+
+
+def test_decode_batch_round_trip_in_order(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_THRESHOLD", 1)
+    objs = points(40)
+    encoded = [JSONCodec.encode(o) for o in objs]
+    assert JSONCodec.decode_batch(encoded, workers=2, chunksize=7) == objs
+
+
+def test_reused_pool(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_THRESHOLD", 1)
+    objs = points(20)
+    with parallel.make_pool(2) as pool:
+        encoded = JSONCodec.encode_batch(objs, executor=pool, chunksize=4)
+        assert encoded == [JSONCodec.encode(o) for o in objs]
+
+
+def test_small_batches_stay_in_process(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("pool should not be started")
+    monkeypatch.setattr(parallel, "make_pool", no_pool)
+    objs = points(5)
+    encoded = JSONCodec.encode_batch(objs, workers=4)
+    assert encoded == [JSONCodec.encode(o) for o in objs]
+    assert JSONCodec.decode_batch(encoded, workers=4) == objs
+    assert JSONCodec.encode_batch(points(parallel.PARALLEL_THRESHOLD), workers=1)[0] == encoded[0]
+
+
+def test_worker_errors_keep_their_details():
+    bad = ['{"x": 1, "y": 2, "__type__": "BatchPoint"}', '{"__type__": "NoSuchBatchType"}']
+    with pytest.raises(DecodingError) as info:
+        parallel.map_batch(JSONCodec.decode, bad, workers=2, chunksize=1, threshold=1)
+    assert "valid Decodable type" in info.value.message
+
+
+def test_registry_snapshot_skips_unpicklable_entries():
+    def make_local():
+        class LocalBatchType(AutoEncodable):
+            pass
+        return LocalBatchType
+    make_local()
+    names = {entry.cls.__name__ for entry in parallel.registry_snapshot()}
+    assert "BatchPoint" in names
+    assert "LocalBatchType" not in names
+    for entry in parallel.registry_snapshot():
+        pickle.dumps(entry)
+
+
+def test_worker_initializer_registers_entries(monkeypatch):
+    registry = CustomTypeRegistry()
+    monkeypatch.setattr(parallel, "custom_type_registry", registry)
+    parallel._init_worker([custom_type_registry.get_entry("BatchPoint")])
+    assert registry.get_class("BatchPoint") is BatchPoint
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
@@ -0,0 +1,73 @@
+import pstats
+from codable import profiling
+from codable.formats.json import JSONCodec, _encode_encodable, _encoders
+from codable.serialization import AutoCodable, qualified_name
+
+
+class ProfLeaf(AutoCodable):
+    def __init__(self, i):
+        self.i = i
+        self.name = f"leaf{i}"
+
+
+class ProfNode(AutoCodable):
+    def __init__(self, leaves, child=None):
+        self.leaves = leaves
+        self.child = child
+
+
+def tree():
+    return ProfNode([ProfLeaf(i) for i in range(3)], ProfNode([ProfLeaf(9)]))
+
+
+NODE = qualified_name(ProfNode)
+LEAF = qualified_name(ProfLeaf)
+
+
+def test_disabled_by_default():
+    JSONCodec.encode(tree())
+    assert profiling.active is None
+    assert _encoders[ProfLeaf] is _encode_encodable
+
+
+def test_counts_times_and_bytes():
+    text = JSONCodec.encode(tree())
+    with profiling.profile() as profile:
+        JSONCodec.decode(JSONCodec.encode(tree()))
+    stats = profile.snapshot()
+    assert _encoders[ProfLeaf] is _encode_encodable
+    node, leaf = stats[('encode', NODE)], stats[('encode', LEAF)]
+    assert (node.calls, leaf.calls) == (2, 4)
+    # Recursion is counted once: the outer node covers the whole document.
+    assert node.bytes == len(text)
+    assert leaf.bytes == sum(len(JSONCodec.encode(ProfLeaf(i))) for i in (0, 1, 2, 9))
+    assert 0 <= node.own <= node.total
+    assert stats[('decode', NODE)].calls == 2 and stats[('decode', LEAF)].calls == 4
+    assert stats[('call', 'JSONCodec.encode')].calls == 1
+    assert stats[('call', 'JSONCodec.decode')].total >= stats[('decode', NODE)].total
+
+
+def test_streaming_bytes():
+    text = JSONCodec.encode(tree())
+    with profiling.profile() as profile:
+        assert ''.join(JSONCodec.iterencode(tree())) == text
+    assert profile.snapshot()[('encode', NODE)].bytes == len(text)
+
+
+def test_enable_reset_and_export(tmp_path):
+    profile = profiling.enable()
+    try:
+        assert profiling.enable() is profile
+        JSONCodec.encode(tree())
+        assert profile.snapshot()
+        profile.reset()
+        assert not profile.snapshot()
+        JSONCodec.encode(ProfLeaf(1))
+    finally:
+        assert profiling.disable() is profile
+    assert profiling.disable() is None
+    assert "encode " + LEAF in profile.format()
+    path = tmp_path / "codable.prof"
+    profile.dump_stats(path)
+    stats = pstats.Stats(str(path)).stats
+    assert stats[('codable', 0, f"encode {LEAF}")][:2] == (1, 1)
@@ -0,0 +1,110 @@
+import json
+import pytest
+from codable.formats.json import JSONCodec
+from codable.formats.projection import parse_keypath
+from codable.serialization import AutoCodable, Codable, DecodingError, KeyPath
+
+
+class ProjItem(AutoCodable):
+    def __init__(self, sku, price):
+        self.sku = sku
+        self.price = price
+
+
+class ProjOrder(AutoCodable):
+    def __init__(self, total, items):
+        self.total = total
+        self.items = items
+
+
+class ProjCustomer(Codable):
+    def __init__(self, name, address):
+        self.name = name
+        self.address = address
+
+    def encode(self, container):
+        container.encode("name", self.name)
+        container.encode("address", self.address)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode("name"), container.decode("address"))
+
+
+class ProjAddress(AutoCodable):
+    def __init__(self, city):
+        self.city = city
+
+
+class ProjExploding(Codable):
+    def encode(self, container):
+        pass
+
+    @classmethod
+    def decode(cls, container):
+        raise AssertionError("should not be decoded")
+
+
+class ProjDoc(AutoCodable):
+    def __init__(self, customer, orders, extra):
+        self.customer = customer
+        self.orders = orders
+        self.extra = extra
+
+
+def sample():
+    orders = [ProjOrder(i * 10, [ProjItem(f"s{i}{j}", j + 0.5) for j in range(3)]) for i in range(4)]
+    return ProjDoc(ProjCustomer("Ada", ProjAddress("London")), orders,
+                   {"log": [ProjExploding()], "n": 1})
+
+
+def test_decodes_only_the_selected_paths():
+    text = JSONCodec.encode(sample())
+    raw = json.loads(text)
+    doc = JSONCodec.decode(text, select=['customer.name', 'orders[*].total', ['orders', 1, 'items', 2]])
+    assert isinstance(doc, ProjDoc)
+    assert isinstance(doc.customer, ProjCustomer)
+    assert doc.customer.name == "Ada"
+    # Decoders on the path see the raw values of the other fields.
+    assert doc.customer.address == raw["customer"]["address"]
+    assert [o.total for o in doc.orders] == [0, 10, 20, 30]
+    assert doc.orders[0].items == raw["orders"][0]["items"]
+    assert doc.orders[1].items[:2] == raw["orders"][1]["items"][:2]
+    assert isinstance(doc.orders[1].items[2], ProjItem)
+    assert doc.extra == raw["extra"]
+
+
+def test_full_selections_match_a_plain_decode():
+    text = JSONCodec.encode(sample(), columnar=True).replace("ProjExploding", "Unknown")
+    expected = JSONCodec.encode(JSONCodec.decode(text))
+    for select in [[''], [[]], ['customer', 'orders', 'extra'], ['*'], ['orders[0]', 'orders', '*.n', '*']]:
+        assert JSONCodec.encode(JSONCodec.decode(text, select=select)) == expected
+    doc = JSONCodec.decode(text, select=['orders[*].items[0].price'])
+    assert [o.items[0].price for o in doc.orders] == [0.5] * 4
+    assert doc.orders[0].items[1] == {"__type__": "ProjItem", "sku": "s01", "price": 1.5}
+
+
+def test_references_on_selected_paths():
+    shared = ProjAddress("Paris")
+    doc = ProjDoc(ProjCustomer("Bo", shared), [shared, shared], None)
+    text = JSONCodec.encode(doc, references=True)
+    decoded = JSONCodec.decode(text, select=['customer.address', 'orders'])
+    assert decoded.orders[0] is decoded.orders[1] is decoded.customer.address
+    with pytest.raises(DecodingError):
+        JSONCodec.decode(text, select=['orders'])
+
+
+def test_key_paths_and_bad_arguments():
+    assert parse_keypath('orders[*].items[10].price') == ['orders', '*', 'items', 10, 'price']
+    assert parse_keypath(KeyPath.from_list(['a', 0])) == ['a', 0]
+    for bad in ['.a', 'a..b', 'a.', 'a[0]b', 'a[x]']:
+        with pytest.raises(ValueError):
+            JSONCodec.decode('[]', select=[bad])
+    with pytest.raises(TypeError):
+        JSONCodec.decode('[]', select='orders')
+    with pytest.raises(ValueError):
+        JSONCodec.decode('[]', schema=list, select=['a'])
+    with pytest.raises(ValueError):
+        JSONCodec.decode('[]', iterative=True, select=['a'])
+    with pytest.raises(DecodingError):
+        JSONCodec.decode('{"__type__": "NoSuchClass"}', select=['a'])
@@ -0,0 +1,123 @@
+import io
+import json
+import pytest
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.formats.jsonl import JSONLinesCodec
+from codable.serialization import AutoCodable, Codable, DecodingError
+
+
+class RefCustomer(AutoCodable):
+    def __init__(self, name):
+        self.name = name
+
+
+class RefOrder(AutoCodable):
+    def __init__(self, number, customer):
+        self.number = number
+        self.customer = customer
+
+
+class RefLedger(AutoCodable):
+    def __init__(self, orders):
+        self.orders = orders
+
+
+class RefNode(AutoCodable):
+    def __init__(self, value, children=()):
+        self.value = value
+        self.parent = None
+        self.children = list(children)
+        for child in self.children:
+            child.parent = self
+
+
+class RefBox(Codable):
+    def __init__(self, item):
+        self.item = item
+
+    def encode(self, container):
+        container.encode("item", self.item)
+
+    @classmethod
+    def decode(cls, container):
+        return cls(container.decode("item"))
+
+
+def ledger():
+    ada, bob = RefCustomer("Ada"), RefCustomer("Bob")
+    return RefLedger([RefOrder(i, ada if i % 3 else bob) for i in range(30)])
+
+
+def round_trips(obj):
+    yield JSONCodec.decode(JSONCodec.encode(obj, references=True))
+    yield JSONCodec.decode(''.join(JSONCodec.iterencode(obj, references=True)))
+    yield BinaryCodec.decode(BinaryCodec.encode(obj, references=True))
+    yield JSONCodec.iterdecode(io.StringIO(JSONCodec.encode(obj, references=True))).__next__()
+
+
+def test_shared_objects_are_written_once():
+    data = json.loads(JSONCodec.encode(ledger(), references=True))
+    assert data["__id__"] == 0
+    assert data["orders"][0]["customer"] == {"__id__": 2, "name": "Bob", "__type__": "RefCustomer"}
+    assert data["orders"][3]["customer"] == {"__ref__": 2}
+    assert len(JSONCodec.encode(ledger(), references=True)) < len(JSONCodec.encode(ledger()))
+
+
+def test_sharing_is_rebuilt():
+    for decoded in round_trips(ledger()):
+        assert decoded == ledger()
+        customers = {id(order.customer) for order in decoded.orders}
+        assert len(customers) == 2
+        assert decoded.orders[1].customer is decoded.orders[2].customer
+
+
+def test_cycles_are_rebuilt():
+    root = RefNode(0, [RefNode(1), RefNode(2, [RefNode(3)])])
+    for decoded in round_trips(root):
+        assert decoded.parent is None
+        assert decoded.children[0].parent is decoded
+        assert decoded.children[1].children[0].parent is decoded.children[1]
+        assert decoded.children[1].children[0].value == 3
+
+
+def test_jsonl_scopes_ids_per_record():
+    customer = RefCustomer("Ada")
+    orders = [RefOrder(1, customer), RefOrder(2, customer)]
+    decoded = JSONLinesCodec.decode(JSONLinesCodec.encode(orders, references=True))
+    assert decoded == orders
+    assert decoded[0].customer is not decoded[1].customer
+
+
+def test_custom_decode_classes():
+    shared = RefCustomer("Ada")
+    decoded = JSONCodec.decode(JSONCodec.encode(RefBox([shared, RefBox(shared)]), references=True))
+    assert decoded.item[0] is decoded.item[1].item
+    box = RefBox(None)
+    box.item = [box]
+    with pytest.raises(DecodingError, match="not decoded yet"):
+        JSONCodec.decode(JSONCodec.encode(box, references=True))
+
+
+def test_malformed_references():
+    with pytest.raises(DecodingError, match="unknown"):
+        JSONCodec.decode('{"name": {"__ref__": 5}, "__type__": "RefCustomer"}')
+    with pytest.raises(DecodingError, match="Malformed reference"):
+        JSONCodec.decode('{"name": {"__ref__": "x"}, "__type__": "RefCustomer"}')
+    with pytest.raises(ValueError):
+        JSONCodec.encode(ledger(), columnar=True, references=True)
+
+
+def test_without_references_sharing_is_duplicated():
+    decoded = JSONCodec.decode(JSONCodec.encode(ledger()))
+    assert decoded.orders[1].customer is not decoded.orders[2].customer
+
+
+@pytest.mark.parametrize("references", [False, True])
+def test_user_dicts_with_a_ref_key_round_trip(references):
+    customer = RefCustomer({"__ref__": "abc", "n": [{"__ref__": 1}]})
+    text = JSONCodec.encode(customer, references=references)
+    assert JSONCodec.decode(text).name == customer.name
+    assert JSONCodec.decode(text, iterative=True).name == customer.name
+    assert JSONCodec.decode(''.join(JSONCodec.iterencode(customer, references=references))).name == customer.name
+    assert BinaryCodec.decode(BinaryCodec.encode(customer, references=references)).name == customer.name
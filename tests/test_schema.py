@@ -0,0 +1,106 @@
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Union
+
+import pytest
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.formats.jsonl import JSONLinesCodec
+from codable.serialization import AutoCodable, DecodingError, custom_type_registry
+
+
+class SchemaPoint(AutoCodable):
+    x: int
+    y: float
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class SchemaRoute(AutoCodable):
+    name: str
+    stops: list[SchemaPoint]
+    by_label: Dict[str, SchemaPoint]
+    note: Optional[str]
+    next: Optional["SchemaRoute"]
+    extra: Any
+    size: Union[int, str]
+    visible: bool = True
+
+    def __init__(self, name, stops, by_label, note=None, next=None, extra=None, size=0):
+        self.name = name
+        self.stops = stops
+        self.by_label = by_label
+        self.note = note
+        self.next = next
+        self.extra = extra
+        self.size = size
+
+
+@dataclass
+class SchemaTrip:
+    day: date
+    legs: List[SchemaPoint] = field(default_factory=list)
+    span: tuple[int, int] = (0, 0)
+
+
+@pytest.fixture(autouse=True)
+def registered_date():
+    custom_type_registry.register(
+        date,
+        encoder=lambda value, container: container.encode('iso', value.isoformat()),
+        decoder=lambda container: date.fromisoformat(container.decode('iso')))
+    yield
+    custom_type_registry.unregister(date)
+
+
+def route():
+    return SchemaRoute("r", [SchemaPoint(1, 2.0), SchemaPoint(3, 4.5)], {"home": SchemaPoint(0, 0.0)},
+                       next=SchemaRoute("inner", [], {}, note="n", size="big"), extra={"free": [1]})
+
+
+def test_untagged_round_trip():
+    text = JSONCodec.encode(route(), type_tags='none')
+    assert "__type__" not in text
+    assert JSONCodec.decode(text, schema=SchemaRoute) == route()
+    assert BinaryCodec.decode(BinaryCodec.encode(route(), type_tags='none'), schema=SchemaRoute) == route()
+
+
+def test_values_are_converted_and_defaults_applied():
+    data = {"name": "r", "stops": [{"x": 1, "y": 2}], "by_label": {}, "size": 3}
+    decoded = JSONCodec.decode_object(data, schema=SchemaRoute)
+    assert type(decoded.stops[0].y) is float
+    assert decoded.note is None and decoded.next is None
+    assert decoded.visible is True
+
+
+def test_dataclass_fields_tuples_and_registered_types():
+    trip = JSONCodec.decode('{"day": {"iso": "2024-02-29"}, "span": [1, 2]}', schema=SchemaTrip)
+    assert trip == SchemaTrip(date(2024, 2, 29), [], (1, 2))
+
+
+def test_type_expressions_as_schema():
+    assert JSONCodec.decode('[{"x": 1, "y": 1}]', schema=list[SchemaPoint]) == [SchemaPoint(1, 1.0)]
+    stream = io.StringIO('[{"x": 1, "y": 1}, {"x": 2, "y": 2}]')
+    assert list(JSONCodec.iterdecode(stream, schema=SchemaPoint)) == [SchemaPoint(1, 1.0), SchemaPoint(2, 2.0)]
+    lines = JSONLinesCodec.encode([SchemaPoint(5, 5.0)], type_tags='none')
+    assert JSONLinesCodec.decode(lines, schema=SchemaPoint) == [SchemaPoint(5, 5.0)]
+
+
+@pytest.mark.parametrize("data, keypath, message", [
+    ({"name": 1, "stops": [], "by_label": {}}, ["name"], "Expected str, got int"),
+    ({"name": "r", "stops": [{"x": "1", "y": 2}], "by_label": {}}, ["stops", 0, "x"], "Expected int"),
+    ({"name": "r", "stops": [{"x": True, "y": 2}], "by_label": {}}, ["stops", 0, "x"], "Expected int, got bool"),
+    ({"name": "r", "stops": {}, "by_label": {}}, ["stops"], "Expected list"),
+    ({"name": "r", "stops": [], "by_label": {"a": {"x": 1}}}, ["by_label", "a"], "Missing field 'y'"),
+    ({"name": "r", "stops": [], "by_label": {}, "size": 1.5}, ["size"], "Expected"),
+    ({"name": "r", "by_label": {}}, [], "Missing field 'stops'"),
+])
+def test_validation_errors_carry_keypaths(data, keypath, message):
+    with pytest.raises(DecodingError) as exc_info:
+        JSONCodec.decode(json.dumps(data), schema=SchemaRoute)
+    assert exc_info.value.keypath == keypath
+    assert message in exc_info.value.message
@@ -0,0 +1,65 @@
+import json
+import pytest
+from codable.formats.json import JSONCodec, JSONKeyedEncodingContainer, JSONUnkeyedEncodingContainer
+from codable.serialization import AutoEncodable, AutoDecodable
+
+
+class SinglePassLeaf(AutoEncodable, AutoDecodable):
+    def __init__(self, label):
+        self.label = label
+
+
+class SinglePassTree(AutoEncodable, AutoDecodable):
+    def __init__(self, leaves, lookup):
+        self.leaves = leaves
+        self.lookup = lookup
+
+
+def test_containers_hold_plain_values():
+    container = JSONKeyedEncodingContainer()
+    container.encode("n", 1)
+    container.encode("leaf", SinglePassLeaf("a"))
+    container.encode("items", [1, [2, 3], {"k": SinglePassLeaf("b")}])
+    assert container.data == {
+        "n": 1,
+        "leaf": {"label": "a", "__type__": "SinglePassLeaf"},
+        "items": [1, [2, 3], {"k": {"label": "b", "__type__": "SinglePassLeaf"}}],
+    }
+
+
+def test_unkeyed_container_holds_plain_values():
+    container = JSONUnkeyedEncodingContainer()
+    container.encode("x")
+    container.encode(SinglePassLeaf("a"))
+    assert container.data == ["x", {"label": "a", "__type__": "SinglePassLeaf"}]
+
+
+def test_list_elements_are_tagged_and_round_trip():
+    tree = SinglePassTree([SinglePassLeaf("a"), SinglePassLeaf("b")], {"c": SinglePassLeaf("c")})
+    encoded = JSONCodec.encode(tree)
+    assert json.loads(encoded)["leaves"][0] == {"label": "a", "__type__": "SinglePassLeaf"}
+    decoded = JSONCodec.decode(encoded)
+    assert decoded.leaves == tree.leaves
+    assert decoded.lookup == tree.lookup
+
+
+def test_tuples_encode_as_lists():
+    assert JSONCodec.encode_object(SinglePassLeaf((1, SinglePassLeaf(2)))) == {
+        "label": [1, {"label": 2, "__type__": "SinglePassLeaf"}],
+        "__type__": "SinglePassLeaf",
+    }
+
+
+def test_encode_object_and_decode_object():
+    data = JSONCodec.encode_object(SinglePassLeaf("a"))
+    assert data == {"label": "a", "__type__": "SinglePassLeaf"}
+    assert JSONCodec.decode_object(data) == SinglePassLeaf("a")
+
+
+def test_encode_object_rejects_non_encodables():
+    with pytest.raises(TypeError):
+        JSONCodec.encode_object({"not": "encodable"})
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
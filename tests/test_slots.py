@@ -0,0 +1,94 @@
+import pickle
+import sys
+import pytest
+from codable.decorators import auto_codable
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec, JSONKeyedEncodingContainer, JSONUnkeyedDecodingContainer
+from codable.serialization import AutoCodable, AutoEncodable, AutoDecodable
+
+
+class SlotBase(AutoCodable):
+    __slots__ = ('id',)
+
+
+class SlotRecord(SlotBase):
+    __slots__ = ('name', 'tags', '_cache')
+
+    def __init__(self, id, name, tags):
+        self.id = id
+        self.name = name
+        self.tags = tags
+        self._cache = None
+
+
+class SlotWithDict(SlotBase):
+    # No __slots__ here, so instances also get a __dict__.
+    def __init__(self, id, extra):
+        self.id = id
+        self.extra = extra
+
+
+@auto_codable
+class DecoratedSlots:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def test_slotted_instances_have_no_dict():
+    assert not hasattr(SlotRecord(1, "a", []), "__dict__")
+    assert not hasattr(DecoratedSlots(1, 2), "__dict__")
+
+
+def test_inherited_slots_round_trip():
+    record = SlotRecord(1, "a", [SlotRecord(2, "b", [])])
+    data = JSONCodec.encode_object(record)
+    assert list(data) == ["id", "name", "tags", "__type__"]
+    decoded = JSONCodec.decode(JSONCodec.encode(record))
+    assert decoded == record
+    assert isinstance(decoded.tags[0], SlotRecord)
+    assert BinaryCodec.decode(BinaryCodec.encode(record)) == record
+    assert ''.join(JSONCodec.iterencode(record)) == JSONCodec.encode(record)
+
+
+def test_unset_slots_are_left_out():
+    record = SlotRecord.__new__(SlotRecord)
+    record.id = 5
+    assert JSONCodec.encode_object(record) == {"id": 5, "__type__": "SlotRecord"}
+    record.name = "late"
+    assert JSONCodec.encode_object(record)["name"] == "late"
+
+
+def test_slots_and_dict_together():
+    obj = SlotWithDict(3, {"k": 1})
+    assert JSONCodec.encode_object(obj) == {"id": 3, "extra": {"k": 1}, "__type__": "SlotWithDict"}
+    assert JSONCodec.decode(JSONCodec.encode(obj)) == obj
+
+
+def test_decorated_slotted_class():
+    point = DecoratedSlots(1, [2])
+    assert JSONCodec.decode(JSONCodec.encode(point)).y == [2]
+    assert pickle.loads(pickle.dumps(point)) == point
+    assert hash(DecoratedSlots(1, 2)) == hash(DecoratedSlots(1, 2))
+
+
+def test_containers_use_slots():
+    container = JSONKeyedEncodingContainer()
+    assert not hasattr(container, "__dict__")
+    assert not hasattr(JSONUnkeyedDecodingContainer([]), "__dict__")
+    with pytest.raises(AttributeError):
+        container.extra = 1
+
+
+def test_slotted_records_are_smaller():
+    class DictRecord(AutoEncodable, AutoDecodable):
+        def __init__(self, id, name, tags):
+            self.id = id
+            self.name = name
+            self.tags = tags
+
+    slotted = SlotRecord(1, "a", [])
+    plain = DictRecord(1, "a", [])
+    assert sys.getsizeof(slotted) < sys.getsizeof(plain) + sys.getsizeof(plain.__dict__)
@@ -0,0 +1,113 @@
+import io
+import json
+import pytest
+from codable.formats.json import JSONCodec, _JSONArrayStreamParser
+from codable.serialization import AutoEncodable, AutoDecodable, DecodingError
+
+
+class StreamRecord(AutoEncodable, AutoDecodable):
+    def __init__(self, seq, text, payload):
+        self.seq = seq
+        self.text = text
+        self.payload = payload
+
+
+def records(count):
+    return [StreamRecord(i, f"récord ☃ {i}", {"values": [i, i * 1.5, -i], "ok": i % 2 == 0}) for i in range(count)]
+
+
+def document(count):
+    return "[" + ", ".join(JSONCodec.encode(r) for r in records(count)) + "]"
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 65536])
+def test_iterdecode_matches_decode(chunk_size):
+    text = document(20)
+    decoded = list(JSONCodec.iterdecode(io.StringIO(text), chunk_size=chunk_size))
+    assert decoded == JSONCodec.decode(text)
+    assert decoded == records(20)
+    numbers = [i / 7 for i in range(300)] + [1.5e-300, -2e300, -0.0, 12345678901234567890, 1e5]
+    text = json.dumps(numbers)
+    assert list(JSONCodec.iterdecode(io.StringIO(text), chunk_size=chunk_size)) == numbers
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 4096])
+def test_iterdecode_binary_stream(chunk_size):
+    text = document(5)
+    decoded = list(JSONCodec.iterdecode(io.BytesIO(text.encode("utf-8")), chunk_size=chunk_size))
+    assert decoded == records(5)
+
+
+def test_mixed_elements_and_whitespace():
+    text = ' \n[ 1 , 22.5e1,"s" ,null,true,[1,[2]], {"a": {"b": 1}} ,\n' + JSONCodec.encode(records(1)[0]) + ' ]\n '
+    decoded = list(JSONCodec.iterdecode(io.StringIO(text), chunk_size=2))
+    assert decoded == [1, 225.0, "s", None, True, [1, [2]], {"a": {"b": 1}}, records(1)[0]]
+
+
+def test_empty_array():
+    assert list(JSONCodec.iterdecode(io.StringIO(" [ ] "))) == []
+
+
+def test_single_document_is_yielded_once():
+    record = records(1)[0]
+    assert list(JSONCodec.iterdecode(io.StringIO(JSONCodec.encode(record)), chunk_size=4)) == [record]
+
+
+def test_elements_are_yielded_before_the_stream_ends():
+    reader = CountingReader(document(200))
+    iterator = JSONCodec.iterdecode(reader, chunk_size=256)
+    first = next(iterator)
+    assert first == records(1)[0]
+    assert reader.reads < 5
+
+
+def test_large_element_is_joined_and_parsed_a_bounded_number_of_times(monkeypatch):
+    # One 8 MB element in 4 KB chunks: re-copying or re-parsing the pending
+    # text on every chunk would be quadratic.
+    element = {"values": list(range(1_000_000)), "text": "x" * 1_000_000}
+    text = json.dumps([element, 1])
+    calls = []
+    raw_decode = json.JSONDecoder.raw_decode
+    monkeypatch.setattr(json.JSONDecoder, "raw_decode", lambda self, s, idx=0: calls.append(len(s)) or raw_decode(self, s, idx))
+    parser = _JSONArrayStreamParser()
+    elements = []
+    joins = 0
+    for start in range(0, len(text), 4096):
+        buffer = parser._buffer
+        elements += parser.feed(text[start:start + 4096])
+        joins += parser._buffer is not buffer
+    elements += parser.close()
+    assert elements == [element, 1]
+    assert joins < 30
+    assert len(calls) < 30
+    assert sum(calls) < 4 * len(text)
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[1 2]", "[1,]", "[1] x", '[{"a": ]'])
+def test_invalid_documents_raise(text):
+    with pytest.raises(DecodingError):
+        list(JSONCodec.iterdecode(io.StringIO(text), chunk_size=2))
+
+
+def test_element_errors_report_index():
+    text = '[1, {"seq": 1, "__type__": "StreamRecord"}, {"x": ]'
+    iterator = JSONCodec.iterdecode(io.StringIO(text))
+    assert next(iterator) == 1
+    next(iterator)
+    with pytest.raises(DecodingError) as info:
+        next(iterator)
+    assert info.value.keypath == [2]
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
@@ -0,0 +1,88 @@
+import io
+import json
+import pytest
+from codable.formats import json as json_format
+from codable.formats.json import JSONCodec
+from codable.serialization import AutoEncodable, AutoDecodable, EncodingError
+
+
+class StreamLeaf(AutoEncodable, AutoDecodable):
+    def __init__(self, label, score):
+        self.label = label
+        self.score = score
+
+
+class StreamTree(AutoEncodable, AutoDecodable):
+    def __init__(self, leaves, meta):
+        self.leaves = leaves
+        self.meta = meta
+
+
+def sample_tree(count=3):
+    leaves = [StreamLeaf(f"leaf-{i}", i * 0.5) for i in range(count)]
+    meta = {
+        "unicode": "café ☃",
+        "escapes": 'quote " backslash \\ newline \n',
+        "numbers": [1, -2, 3.25, 1e100, float("inf"), float("-inf")],
+        "flags": (True, False, None),
+        "empty": {"list": [], "dict": {}},
+        1: "int key",
+        2.5: "float key",
+        None: "none key",
+        True: "bool key",
+        "nested": {"leaf": StreamLeaf("inner", 0)},
+    }
+    return StreamTree(leaves, meta)
+
+
+def test_iterencode_matches_encode():
+    tree = sample_tree()
+    assert "".join(JSONCodec.iterencode(tree)) == JSONCodec.encode(tree)
+
+
+def test_nan_matches_encode():
+    leaf = StreamLeaf("nan", float("nan"))
+    assert "".join(JSONCodec.iterencode(leaf)) == JSONCodec.encode(leaf)
+
+
+def test_iterencode_yields_several_chunks(monkeypatch):
+    monkeypatch.setattr(json_format, "STREAM_FLUSH_FRAGMENTS", 16)
+    tree = sample_tree(50)
+    chunks = list(JSONCodec.iterencode(tree))
+    assert len(chunks) > 5
+    assert "".join(chunks) == JSONCodec.encode(tree)
+
+
+def test_dump_to_text_and_binary_streams():
+    tree = sample_tree()
+    text = io.StringIO()
+    JSONCodec.dump(tree, text)
+    binary = io.BytesIO()
+    JSONCodec.dump(tree, binary)
+    assert text.getvalue() == JSONCodec.encode(tree)
+    assert binary.getvalue() == JSONCodec.encode(tree).encode("ascii")
+
+
+def test_dumped_document_decodes():
+    tree = StreamTree([StreamLeaf("a", 1)], {"k": StreamLeaf("b", 2)})
+    out = io.StringIO()
+    JSONCodec.dump(tree, out)
+    decoded = JSONCodec.decode(out.getvalue())
+    assert decoded.leaves == tree.leaves
+    assert decoded.meta == tree.meta
+
+
+def test_unsupported_values_report_path():
+    tree = StreamTree([StreamLeaf("a", {1, 2})], {})
+    with pytest.raises(EncodingError) as info:
+        "".join(JSONCodec.iterencode(tree))
+    assert info.value.keypath == ["leaves", 0, "score"]
+
+
+def test_iterencode_rejects_non_encodables():
+    with pytest.raises(TypeError):
+        list(JSONCodec.iterencode({"a": 1}))
+
+
+if __name__ == '__main__':
+    pytest.main(["-s"])
@@ -0,0 +1,116 @@
+import json
+import pickle
+import pytest
+from codable.decorators import auto_codable
+from codable.formats.binary import BinaryCodec
+from codable.formats.json import JSONCodec
+from codable.serialization import (
+    AutoEncodable,
+    AutoDecodable,
+    TypeTagCollisionWarning,
+    custom_type_registry,
+    qualified_name,
+)
+
+
+class TaggedPoint(AutoEncodable, AutoDecodable):
+    __type_id__ = 9001
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class TaggedPolygon(AutoEncodable, AutoDecodable):
+    __type_id__ = 9002
+
+    def __init__(self, points, label):
+        self.points = points
+        self.label = label
+
+
+class UntaggedNote(AutoEncodable, AutoDecodable):
+    def __init__(self, text):
+        self.text = text
+
+
+@auto_codable
+class DecoratedPoint:
+    def __init__(self, x):
+        self.x = x
+
+
+def polygon():
+    return TaggedPolygon([TaggedPoint(i, -i) for i in range(3)], UntaggedNote("hi"))
+
+
+def test_id_tags_round_trip_and_shrink_payloads():
+    compact = JSONCodec.encode(polygon(), type_tags='id')
+    data = json.loads(compact)
+    assert data["__type__"] == 9002
+    assert data["points"][0]["__type__"] == 9001
+    assert data["label"]["__type__"] == qualified_name(UntaggedNote)
+    assert JSONCodec.decode(compact) == polygon()
+    assert len(compact) < len(JSONCodec.encode(polygon(), type_tags='qualified'))
+    assert BinaryCodec.decode(BinaryCodec.encode(polygon(), type_tags='id')) == polygon()
+
+
+def test_qualified_tags_round_trip():
+    data = json.loads(JSONCodec.encode(polygon(), type_tags='qualified'))
+    assert data["__type__"] == "tests.test_type_registry.TaggedPolygon"
+    assert JSONCodec.decode(json.dumps(data)) == polygon()
+    assert ''.join(JSONCodec.iterencode(polygon(), type_tags='id')) == JSONCodec.encode(polygon(), type_tags='id')
+
+
+def test_unknown_tag_style_is_rejected():
+    with pytest.raises(ValueError):
+        JSONCodec.encode(polygon(), type_tags='short')
+
+
+def test_type_id_collision_is_detected_at_registration():
+    with pytest.raises(ValueError, match="9001"):
+        class OtherPoint(AutoEncodable, AutoDecodable):
+            __type_id__ = 9001
+    assert custom_type_registry.get_class(9001) is TaggedPoint
+
+
+def test_short_name_collision_warns_and_keeps_both_reachable():
+    def define(module):
+        return type(AutoEncodable)("Clash", (AutoEncodable, AutoDecodable), {"__module__": module})
+
+    first = define("tests.clash_a")
+    with pytest.warns(TypeTagCollisionWarning):
+        second = define("tests.clash_b")
+    assert custom_type_registry.get_class("Clash") is second
+    assert custom_type_registry.get_class("tests.clash_a.Clash") is first
+    obj = first()
+    obj.value = 1
+    assert type(JSONCodec.decode(JSONCodec.encode(obj, type_tags='qualified'))) is first
+
+
+def test_decorated_classes_register_under_their_own_name():
+    assert DecoratedPoint.__name__ == "DecoratedPoint"
+    assert custom_type_registry.get_class("tests.test_type_registry.DecoratedPoint") is DecoratedPoint
+    assert JSONCodec.decode(JSONCodec.encode(DecoratedPoint(3))).x == 3
+    assert pickle.loads(pickle.dumps(DecoratedPoint(4))).x == 4
+
+
+def test_lazy_registration_runs_on_first_use():
+    class Meters(float):
+        pass
+
+    Meters.__module__, Meters.__qualname__ = "tests.lazy_units", "Meters"
+    calls = []
+
+    def load():
+        calls.append(1)
+        custom_type_registry.register(
+            Meters,
+            encoder=lambda value, container: container.encode("m", float(value)),
+            decoder=lambda container: Meters(container.decode("m")))
+
+    custom_type_registry.register_lazy("tests.lazy_units.Meters", load)
+    data = JSONCodec.encode(DecoratedPoint(Meters(2.5)))
+    assert calls == [1]
+    assert json.loads(data)["x"] == {"m": 2.5, "__type__": "Meters"}
+    assert type(JSONCodec.decode(data).x) is Meters